@@ -3,38 +3,76 @@ SoF Event Extractor Backend API
 FastAPI application for processing maritime Statement of Facts documents with authentication
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends, Form, Query
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form, Query, Header, Response, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 import uvicorn
+import asyncio
+import aiofiles
+import hashlib
 import os
 import uuid
 import json
 import logging
+import shutil
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import pandas as pd
 from pathlib import Path
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.logging_config import configure_logging
+
+# Configure logging before the pipeline modules log anything
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Import our new integrated modules
 try:
     from utils.sof_pipeline import (
-        process_uploaded_files, 
-        extract_events_and_summary,
         calculate_laytime,
-        process_clicked_pdf_enhanced,
+        calculate_laytime_batch,
+        refresh_edited_events,
         LaytimeResult as SofLaytimeResult
     )
-    print("✅ SoF Pipeline modules imported successfully")
+    from utils.pipeline_worker import (
+        pipeline_executor, reset_pipeline_executor, shutdown_pipeline_executor, run_pipeline
+    )
+    logger.info("✅ SoF Pipeline modules imported successfully")
 except ImportError as e:
-    print(f"⚠️ Warning: SoF Pipeline modules failed to import: {e}")
-    process_uploaded_files = None
-    extract_events_and_summary = None
+    logger.warning(f"⚠️ SoF Pipeline modules failed to import: {e}")
     calculate_laytime = None
-    process_clicked_pdf_enhanced = None
+    calculate_laytime_batch = None
+    refresh_edited_events = None
     SofLaytimeResult = None
+    pipeline_executor = reset_pipeline_executor = shutdown_pipeline_executor = run_pipeline = None
+
+from utils.laytime_session import LaytimeSession
+from utils.event_patches import (
+    validate_operations, assign_event_ids, materialize_events, edited_event_ids, VersionedCache
+)
+from utils.exports import EXPORT_MEDIA_TYPES, export_key, export_frame, iter_export, export_cache
+from utils.result_store import PARQUET_AVAILABLE, load_events, scan_events
+from utils.job_store import JobStore
+from utils.job_queue import JobQueue, QueueFull, QueuedTask, consume, QUEUE_RETRY_DELAY
+from utils.cost_model import estimate_job_cost
+from utils.job_progress import ProgressReporter
+from utils.tracing import aggregate_traces, process_totals
+from utils.profiling import PROFILE_FILES
+from utils.upload_sessions import (
+    RESUMABLE_MAX_FILE_SIZE, OffsetMismatch, ChunkConflict, UploadTooLarge, ChecksumMismatch,
+    received_bytes, append_chunk, complete_file
+)
+from utils.metrics import (
+    PROMETHEUS_AVAILABLE, CONTENT_TYPE_LATEST, render_metrics, observe_trace, HTTP_REQUEST_SECONDS,
+    UPLOAD_BYTES, JOBS_TOTAL, JOBS_IN_PROGRESS, QUEUE_DEPTH, QUEUE_RUNNING
+)
 
 # Import authentication modules
 from utils.auth import (
@@ -48,17 +86,14 @@ from utils.user_models import (
 )
 from models.sof_models import (
     UploadRequest, EventData, VoyageSummary, LaytimeCalculation,
-    LaytimeResult, ProcessingResult, JobStatus as JobStatusModel
+    BatchLaytimeCalculation, EventPatchRequest, LaytimeResult, ProcessingResult, JobStatus as JobStatusModel,
+    UploadSessionRequest
 )
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 # Pydantic models for API requests
 class ExportRequest(BaseModel):
     events: List[Dict] = []
@@ -100,9 +135,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Request latency per route template (so /api/result/{job_id} is one series)."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(
+            time.perf_counter() - start
+        )
+
 # Create necessary directories
 # Directories (allow override via environment variables for deployment)
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))  # default 10MB
+# Uploads are streamed to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.doc', '.txt', '.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.webp'}
+# Files of a resumable upload are handed to the pipeline as they complete, not after the last one
+RESUMABLE_EARLY_START = os.getenv("RESUMABLE_EARLY_START", "false").lower() in ("1", "true", "yes")
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
 RESULTS_DIR = Path(os.getenv("RESULTS_DIR", "results"))
 # Ensure dirs exist (create parent directories when deploying with mounted volumes)
@@ -110,16 +165,58 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
 # No longer need these old processors - using integrated SoF pipeline
-print("🚀 Using integrated SoF Pipeline for document processing")
+logger.info("🚀 Using integrated SoF Pipeline for document processing")
+
+# Job storage shared by all workers and kept across restarts (SQLite in WAL mode on the data disk)
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", RESULTS_DIR.parent / "jobs.db"))
+job_store = JobStore(JOB_DB_PATH)
+
+# Durable queue of uploaded jobs in the same database, drained by worker.py processes and/or
+# consumers embedded in this app (EMBEDDED_QUEUE_CONSUMERS jobs at a time; 0 leaves it to worker.py)
+job_queue = JobQueue(JOB_DB_PATH)
+EMBEDDED_QUEUE_CONSUMERS = int(os.getenv("EMBEDDED_QUEUE_CONSUMERS", os.getenv("PIPELINE_WORKERS", 2)))
+QUEUE_RETRY_AFTER = int(os.getenv("QUEUE_RETRY_AFTER", 30))
+# Jobs processed at once across all consumers, for ETAs; batch uploads get a lower scheduling weight
+QUEUE_PARALLELISM = max(1, int(os.getenv("QUEUE_PARALLELISM", EMBEDDED_QUEUE_CONSUMERS or 1)))
+BATCH_QUEUE_WEIGHT = float(os.getenv("BATCH_QUEUE_WEIGHT", 0.5))
 
-# In-memory job storage (use database in production)
-jobs = {}
+# How often a progress stream checks its job, and how often it sends a keep-alive comment
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", 0.5))
+PROGRESS_KEEPALIVE = float(os.getenv("PROGRESS_KEEPALIVE", 15))
+
+# This worker's live laytime sessions, keyed by job id, with the number of patches they have applied
+laytime_sessions: Dict[str, Tuple[LaytimeSession, int]] = {}
+# One lock per job, so concurrent requests never replay the same patches into a session twice
+laytime_session_locks: Dict[str, threading.Lock] = {}
+_laytime_session_locks_guard = threading.Lock()
+
+# Patched event views and their laytime results, cached per job and patch version (LRU)
+materialized_events = VersionedCache()
+materialized_laytime = VersionedCache()
 
 class JobStatus:
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
 
+@app.on_event("startup")
+async def start_queue_consumers():
+    """Start pulling queued jobs in this process unless standalone workers handle them."""
+    if EMBEDDED_QUEUE_CONSUMERS > 0 and run_pipeline:
+        app.state.queue_stop = asyncio.Event()
+        app.state.queue_consumer = asyncio.create_task(
+            consume(job_queue, process_queued_job, EMBEDDED_QUEUE_CONSUMERS, app.state.queue_stop)
+        )
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """Stop claiming jobs, let running pipeline jobs finish and stop the worker processes."""
+    if getattr(app.state, "queue_consumer", None):
+        app.state.queue_stop.set()
+        await app.state.queue_consumer
+    if shutdown_pipeline_executor:
+        shutdown_pipeline_executor()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -130,6 +227,43 @@ async def health():
     """Health check endpoint for Render"""
     return {"status": "healthy", "service": "sof-event-extractor-backend"}
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: the job database answers and the queue accepts uploads (503 otherwise).
+    Also reports whether Tesseract OCR is available and how saturated the workers are.
+    """
+    try:
+        depth, running = await run_in_threadpool(lambda: (job_queue.depth(), job_queue.running()))
+        database = "ok"
+    except Exception as e:
+        depth = running = None
+        database = f"error: {e}"
+    consumers = getattr(app.state, "queue_consumer", None)
+    checks = {
+        "database": database,
+        "tesseract": shutil.which("tesseract") is not None,
+        "gemini_configured": bool(os.getenv("GOOGLE_API_KEY")),
+        "queue_depth": depth,
+        "queue_max_depth": job_queue.max_depth,
+        "queue_running": running,
+        "queue_parallelism": QUEUE_PARALLELISM,
+        "worker_saturation": round(running / QUEUE_PARALLELISM, 2) if running is not None else None,
+        "embedded_consumers": EMBEDDED_QUEUE_CONSUMERS if consumers is not None and not consumers.done() else 0,
+    }
+    is_ready = database == "ok" and not (job_queue.max_depth and depth >= job_queue.max_depth)
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, **checks})
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (requires prometheus_client)."""
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Metrics require prometheus_client (pip install prometheus-client)")
+    depth, running = await run_in_threadpool(lambda: (job_queue.depth(), job_queue.running()))
+    QUEUE_DEPTH.set(depth)
+    QUEUE_RUNNING.set(running)
+    return Response(content=await run_in_threadpool(render_metrics), media_type=CONTENT_TYPE_LATEST)
+
 # Authentication endpoints
 @app.post("/api/auth/register", response_model=UserResponse)
 async def register(user_create: UserCreate):
@@ -303,245 +437,193 @@ class JobStatus:
     COMPLETED = "completed"
     FAILED = "failed"
 
-# Create a simple file-like object from upload
-class FileUpload:
-    def __init__(self, content: bytes, name: str):
-        self.content = content
-        self.name = name
-        
-    def read(self):
-        return self.content
+async def process_documents_with_sof_pipeline(job_id: str, file_paths_and_names: List[tuple], use_enhanced_processing: bool = False,
+                                              profile: bool = False):
+    """
+    Process multiple documents using the new integrated SoF pipeline.
+    The pipeline runs in the pipeline executor (worker processes by default) so the
+    event loop keeps serving requests; its outcome is recorded in the job store here.
+    Progress is published on the job as the pipeline goes (see /api/progress/{job_id}).
+    Failures are raised for the queue consumer to retry or record. With profile, the run
+    is profiled and its reports can be downloaded from /api/profile/{job_id}.
+    """
+    loop = asyncio.get_running_loop()
+    file_paths_and_names = [(str(file_path), filename) for file_path, filename in file_paths_and_names]
+    progress = ProgressReporter(job_store, job_id, len(file_paths_and_names))
+    # Partial results of an earlier attempt are replaced as this one's files finish
+    await run_in_threadpool(job_store.update, job_id, {"events": [], "file_status": []})
+    await run_in_threadpool(progress, "started", files=len(file_paths_and_names))
+    try:
+        outcome = await loop.run_in_executor(
+            pipeline_executor(), run_pipeline,
+            job_id, file_paths_and_names, use_enhanced_processing, str(RESULTS_DIR), str(JOB_DB_PATH), profile
+        )
+    except BrokenProcessPool:
+        # A worker process died (e.g. out of memory); start a fresh pool for later jobs
+        reset_pipeline_executor()
+        raise
     
-    def getvalue(self):
-        return self.content
+    # Update job status
+    await run_in_threadpool(job_store.update, job_id, {
+        "status": JobStatus.COMPLETED,
+        **outcome,
+        "processed_at": datetime.now().isoformat()
+    })
+    observe_trace(outcome.get("trace"), [filename for _, filename in file_paths_and_names])
 
-async def process_documents_with_sof_pipeline(job_id: str, file_paths_and_names: List[tuple], use_enhanced_processing: bool = False):
+async def process_queued_job(task: QueuedTask):
     """
-    Process multiple documents using the new integrated SoF pipeline
+    Run one job claimed from the queue. A failed attempt is retried after a backoff
+    until the queue's max attempts are used up; the job is then marked failed.
     """
-    try:
-        logger.info(f"🚀 Processing {len(file_paths_and_names)} documents with SoF Pipeline (enhanced: {use_enhanced_processing})")
-        
-        # Get API key for Gemini
-        gemini_api_key = os.getenv("GOOGLE_API_KEY", "")
-        if not gemini_api_key:
-            logger.warning("⚠️ No Google API key found, processing will be limited")
-        
-        all_file_uploads = []
-        all_events_list = []
-        all_summaries = []
-        processed_filenames = []
-        
-        # Process each file
-        for file_path, filename in file_paths_and_names:
-            try:
-                logger.info(f"📄 Processing file: {filename}")
-                
-                # Read file content
-                with open(file_path, 'rb') as f:
-                    file_content = f.read()
-                
-                # Create file upload object
-                file_upload = FileUpload(file_content, filename)
-                
-                # Determine file type and process accordingly
-                file_extension = filename.lower().split('.')[-1]
-                
-                if use_enhanced_processing and file_extension == 'pdf' and len(file_paths_and_names) == 1:
-                    # Use specialized clicked PDF processing (only for single PDF files)
-                    logger.info("🎯 Using enhanced clicked PDF processing")
-                    
-                    if not gemini_api_key:
-                        raise Exception("Enhanced processing requires Google API key")
-                    
-                    events_df, summary_data = process_clicked_pdf_enhanced(file_content, filename, gemini_api_key)
-                    
-                else:
-                    # Collect files for batch processing
-                    all_file_uploads.append(file_upload)
-                    continue
-                
-                # Process individual enhanced PDF result
-                if not events_df.empty:
-                    events_list = events_df.to_dict('records')
-                    # Convert any Timestamp objects to strings
-                    for event in events_list:
-                        for key, value in event.items():
-                            if pd.isna(value):
-                                event[key] = None
-                            elif hasattr(value, 'isoformat'):
-                                event[key] = value.isoformat()
-                            else:
-                                event[key] = str(value) if value is not None else None
-                    all_events_list.extend(events_list)
-                
-                if summary_data:
-                    all_summaries.append({**summary_data, "source_file": filename})
-                
-                processed_filenames.append(filename)
-                
-            except Exception as file_error:
-                logger.error(f"❌ Failed to process {filename}: {file_error}")
-                # Continue processing other files
-                continue
-        
-        # Process remaining files using standard pipeline (batch processing)
-        if all_file_uploads:
-            try:
-                logger.info(f"📄 Using standard SoF pipeline processing for {len(all_file_uploads)} files")
-                
-                # Process uploaded files in batch
-                docs = process_uploaded_files(all_file_uploads)
-                
-                if docs:
-                    # Extract events and summary
-                    if gemini_api_key:
-                        events_df, summary_data = extract_events_and_summary(docs, gemini_api_key)
-                        
-                        # Convert DataFrame to list of dictionaries for JSON serialization
-                        if not events_df.empty:
-                            events_list = events_df.to_dict('records')
-                            # Convert any Timestamp objects to strings
-                            for event in events_list:
-                                for key, value in event.items():
-                                    if pd.isna(value):
-                                        event[key] = None
-                                    elif hasattr(value, 'isoformat'):
-                                        event[key] = value.isoformat()
-                                    else:
-                                        event[key] = str(value) if value is not None else None
-                            all_events_list.extend(events_list)
-                        
-                        if summary_data:
-                            all_summaries.append({**summary_data, "source_file": "batch_processed"})
-                    else:
-                        # Fallback without Gemini
-                        logger.warning("⚠️ No Gemini API key - using text extraction only")
-                
-                processed_filenames.extend([upload.name for upload in all_file_uploads])
-                
-            except Exception as batch_error:
-                logger.error(f"❌ Batch processing failed: {batch_error}")
-        
-        # Combine all summaries into one (prefer the first non-empty summary)
-        combined_summary = {}
-        for summary in all_summaries:
-            if summary and not combined_summary:
-                combined_summary = {k: v for k, v in summary.items() if k != "source_file"}
-                break
-        
-        if not all_events_list:
-            logger.warning("No events extracted from any document")
-        
-        # Save results
-        result_data = {
-            "events": all_events_list,
-            "summary": combined_summary,
-            "has_laytime_data": len(all_events_list) > 0 and any(event.get('laytime_counts') for event in all_events_list),
-            "processed_files": processed_filenames,
-            "total_files": len(file_paths_and_names),
-            "successful_files": len(processed_filenames)
-        }
-        
-        result_file = RESULTS_DIR / f"{job_id}_results.json"
-        with open(result_file, 'w') as f:
-            json.dump(result_data, f, indent=2, default=str)
-        
-        # Update job status
-        jobs[job_id].update({
-            "status": JobStatus.COMPLETED,
-            "events": all_events_list,
-            "summary": combined_summary,
-            "has_laytime_data": result_data["has_laytime_data"],
-            "processed_at": datetime.now().isoformat(),
-            "result_file": str(result_file),
-            "processed_files": processed_filenames,
-            "total_files": len(file_paths_and_names),
-            "successful_files": len(processed_filenames)
-        })
-        
-        logger.info(f"✅ Batch processing completed: {len(processed_filenames)}/{len(file_paths_and_names)} files, {len(all_events_list)} total events")
-        
-    except Exception as e:
-        logger.error(f"💥 Batch document processing failed: {e}")
-        jobs[job_id].update({
+    payload = task.payload
+    error = None
+    if task.attempts > job_queue.max_attempts:
+        # Every earlier attempt lost its lease, e.g. the worker died while processing
+        error = f"Processing was interrupted {task.attempts - 1} times"
+    else:
+        JOBS_IN_PROGRESS.inc()
+        try:
+            logger.info(f"📥 Processing queued job {task.job_id} (attempt {task.attempts}/{job_queue.max_attempts})")
+            await process_documents_with_sof_pipeline(
+                task.job_id,
+                [tuple(item) for item in payload["files"]],
+                payload.get("use_enhanced_processing", False),
+                payload.get("profile", False)
+            )
+            JOBS_TOTAL.labels("completed").inc()
+        except Exception as e:
+            if task.attempts < job_queue.max_attempts:
+                delay = QUEUE_RETRY_DELAY * 2 ** (task.attempts - 1)
+                logger.warning(f"⚠️ Job {task.job_id} failed on attempt {task.attempts}, retrying in {delay:.0f}s: {e}")
+                JOBS_TOTAL.labels("retried").inc()
+                await run_in_threadpool(job_store.update, task.job_id, {"last_error": str(e), "attempts": task.attempts})
+                await run_in_threadpool(job_queue.retry, task, delay)
+                return
+            error = str(e)
+        finally:
+            JOBS_IN_PROGRESS.dec()
+    
+    if error is not None:
+        JOBS_TOTAL.labels("failed").inc()
+        logger.error(f"💥 Batch document processing failed: {error}")
+        await run_in_threadpool(job_store.update, task.job_id, {
             "status": JobStatus.FAILED,
-            "error": str(e),
+            "error": error,
+            "attempts": task.attempts,
             "failed_at": datetime.now().isoformat()
         })
+    await run_in_threadpool(job_queue.ack, task)
+
+def _queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Processing queue is full, please retry in {QUEUE_RETRY_AFTER} seconds",
+        headers={"Retry-After": str(QUEUE_RETRY_AFTER)}
+    )
+
+def _queue_eta(job_id: str, estimated_seconds: float) -> Dict:
+    """Jobs ahead of a queued job and the seconds until it should finish (empty once it left the queue)."""
+    position = job_queue.position(job_id)
+    if position is None:
+        return {}
+    jobs_ahead, seconds_ahead = position
+    return {
+        "queue_position": jobs_ahead,
+        "eta_seconds": round(seconds_ahead / QUEUE_PARALLELISM + estimated_seconds, 1)
+    }
 
 @app.post("/api/upload")
 async def upload_documents(
-    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
-    use_enhanced_processing: bool = False
+    use_enhanced_processing: bool = False,
+    profile: bool = False
 ):
     """
     Upload and process multiple maritime documents using the integrated SoF pipeline
+    profile=true runs the job under the sampling profiler and tracemalloc (see /api/profile/{job_id}).
+    """
+    return await _queue_upload(files, use_enhanced_processing, profile=profile)
+
+async def _queue_upload(files: List[UploadFile], use_enhanced_processing: bool, weight: float = 1.0,
+                        profile: bool = False) -> Dict:
+    """
+    Save uploaded files, estimate their processing cost and queue the job.
+    The estimate orders the queue (weighted shortest-job-first) and gives the client an ETA.
     """
     try:
         if not files:
             raise HTTPException(status_code=400, detail="No files uploaded")
         
-        # Validate file types and sizes
-        allowed_extensions = {'.pdf', '.docx', '.doc', '.txt', '.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.webp'}
+        # Reject early when the queue is full (enqueueing below re-checks atomically)
+        if job_queue.max_depth and await run_in_threadpool(job_queue.depth) >= job_queue.max_depth:
+            raise _queue_full()
+        
+        # Validate file types before saving anything
+        for file in files:
+            _check_file_type(file.filename)
+        
         validated_files = []
         file_paths_and_names = []
+        uploads = []
         job_id = str(uuid.uuid4())
         
-        for i, file in enumerate(files):
-            file_extension = '.' + file.filename.lower().split('.')[-1]
-
-            if file_extension not in allowed_extensions:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Unsupported file type: {file_extension} in file '{file.filename}'. Supported types: {', '.join(allowed_extensions)}"
-                )
-
-            # Validate file size (limit configurable via MAX_FILE_SIZE)
-            content = await file.read()
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File '{file.filename}' exceeds the maximum allowed size ({MAX_FILE_SIZE} bytes)"
-                )
-
-            # Save uploaded file
-            file_path = UPLOAD_DIR / f"{job_id}_{i}_{file.filename}"
-
-            with open(file_path, 'wb') as f:
-                f.write(content)
-
-            validated_files.append(file.filename)
-            file_paths_and_names.append((file_path, file.filename))
+        try:
+            for i, file in enumerate(files):
+                # Stream to disk; the size limit (MAX_FILE_SIZE) is enforced as the file arrives
+                file_path = UPLOAD_DIR / f"{job_id}_{i}_{file.filename}"
+                file_paths_and_names.append((file_path, file.filename))
+                size, sha256 = await _save_upload(file, file_path)
+                
+                validated_files.append(file.filename)
+                uploads.append({"filename": file.filename, "size": size, "sha256": sha256})
+                UPLOAD_BYTES.labels(file.filename.lower().split('.')[-1]).observe(size)
+        except BaseException:
+            for file_path, _ in file_paths_and_names:
+                file_path.unlink(missing_ok=True)
+            raise
+        
+        # Estimate processing time from page counts, text layers and OCR work
+        estimate = await run_in_threadpool(estimate_job_cost, file_paths_and_names, use_enhanced_processing)
         
         # Create job entry
-        jobs[job_id] = {
+        await run_in_threadpool(job_store.create, {
             "job_id": job_id,
             "status": JobStatus.PROCESSING,
             "user": "demo",
             "filenames": validated_files,
+            "uploads": uploads,
             "total_files": len(validated_files),
             "use_enhanced_processing": use_enhanced_processing,
+            "estimated_seconds": estimate["estimated_seconds"],
+            "profile": profile,
             "created_at": datetime.now().isoformat()
-        }
+        })
         
-        # Start background processing
-        background_tasks.add_task(
-            process_documents_with_sof_pipeline, 
-            job_id, 
-            file_paths_and_names,
-            use_enhanced_processing
-        )
+        # Queue for processing; cheaper jobs are claimed first
+        try:
+            await run_in_threadpool(job_queue.enqueue, job_id, {
+                "files": [(str(file_path), filename) for file_path, filename in file_paths_and_names],
+                "use_enhanced_processing": use_enhanced_processing,
+                "profile": profile
+            }, estimate["estimated_seconds"], weight)
+        except QueueFull:
+            await run_in_threadpool(job_store.delete, job_id)
+            for file_path, _ in file_paths_and_names:
+                file_path.unlink(missing_ok=True)
+            raise _queue_full()
         
-        logger.info(f"📤 Batch document upload initiated: {len(validated_files)} files (enhanced: {use_enhanced_processing})")
+        logger.info(f"📤 Batch document upload initiated: {len(validated_files)} files (enhanced: {use_enhanced_processing}, estimated {estimate['estimated_seconds']}s)")
         
         return {
             "message": f"{len(validated_files)} file(s) uploaded successfully",
             "job_id": job_id,
             "filenames": validated_files,
+            "uploads": uploads,
             "total_files": len(validated_files),
-            "enhanced_processing": use_enhanced_processing
+            "enhanced_processing": use_enhanced_processing,
+            "estimate": estimate,
+            **await run_in_threadpool(_queue_eta, job_id, estimate["estimated_seconds"])
         }
         
     except HTTPException:
@@ -550,10 +632,36 @@ async def upload_documents(
         logger.error(f"Batch upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
 
+def _check_file_type(filename: str) -> None:
+    file_extension = '.' + filename.lower().split('.')[-1]
+    if file_extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file_extension} in file '{filename}'. Supported types: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+
+async def _save_upload(file: UploadFile, file_path: Path) -> Tuple[int, str]:
+    """
+    Write an upload to file_path in UPLOAD_CHUNK_SIZE chunks, so memory use does not grow
+    with the file. Returns its size and SHA-256; raises 400 once it passes MAX_FILE_SIZE.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(file_path, 'wb') as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File '{file.filename}' exceeds the maximum allowed size ({MAX_FILE_SIZE} bytes)"
+                )
+            digest.update(chunk)
+            await out.write(chunk)
+    return size, digest.hexdigest()
+
 # Legacy single file upload endpoint for backward compatibility
 @app.post("/api/upload-single")
 async def upload_single_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     use_enhanced_processing: bool = False
 ):
@@ -562,14 +670,12 @@ async def upload_single_document(
     """
     # Redirect to the new multi-file endpoint
     return await upload_documents(
-        background_tasks=background_tasks,
         files=[file],
         use_enhanced_processing=use_enhanced_processing
     )
 
 @app.post("/api/upload-batch")
 async def upload_batch_documents(
-    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     use_enhanced_processing: bool = False,
     batch_name: Optional[str] = Form(None)
@@ -584,17 +690,13 @@ async def upload_batch_documents(
         if len(files) > 10:  # Limit batch size
             raise HTTPException(status_code=400, detail="Maximum 10 files per batch")
         
-        # Use the existing upload_documents function but add batch metadata
-        result = await upload_documents(
-            background_tasks=background_tasks,
-            files=files,
-            use_enhanced_processing=use_enhanced_processing
-        )
+        # Queue like upload_documents, behind interactive uploads of similar size, and add batch metadata
+        result = await _queue_upload(files, use_enhanced_processing, weight=BATCH_QUEUE_WEIGHT)
         
         # Add batch metadata to the job
         job_id = result["job_id"]
         if batch_name:
-            jobs[job_id]["batch_name"] = batch_name
+            await run_in_threadpool(job_store.update, job_id, {"batch_name": batch_name})
         
         logger.info(f"📦 Batch upload '{batch_name}' initiated: {len(files)} files")
         
@@ -610,6 +712,225 @@ async def upload_batch_documents(
         logger.error(f"Batch upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
 
+# Resumable uploads: POST /api/uploads announces the files, PUT .../files/{index}?offset=N
+# appends a chunk (resumed from GET /api/uploads/{job_id} after a dropped connection),
+# and POST .../finalize checks that every file arrived (see utils/upload_sessions.py)
+
+def _session_file_path(job_id: str, index: int, filename: str) -> Path:
+    return UPLOAD_DIR / f"{job_id}_{index}_{filename}"
+
+def _upload_session(job_id: str) -> Dict:
+    job = job_store.get(job_id, with_events=False)
+    if job is None or "upload_session" not in job:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return job
+
+def _session_view(job_id: str, job: Dict) -> Dict:
+    files = []
+    for index, spec in enumerate(job["upload_session"]["files"]):
+        received = received_bytes(_session_file_path(job_id, index, spec["filename"]), spec["size"])
+        files.append({"index": index, "filename": spec["filename"], "size": spec["size"],
+                      "offset": received, "complete": received == spec["size"]})
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "files": files,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "queued": job["upload_session"]["queued"],
+        "uploads": job.get("uploads", [])
+    }
+
+def _claim_session(job_id: str) -> Optional[Dict]:
+    """Mark an upload's job as queued; returns its session, or None when it already was."""
+    with job_store.locked(job_id) as job:
+        if job["upload_session"]["queued"]:
+            return None
+        job["upload_session"]["queued"] = True
+        return {**job["upload_session"], "use_enhanced_processing": job.get("use_enhanced_processing", False)}
+
+def _release_session(job_id: str) -> None:
+    with job_store.locked(job_id) as job:
+        job["upload_session"]["queued"] = False
+
+def _record_session_upload(job_id: str, upload: Dict) -> None:
+    with job_store.locked(job_id) as job:
+        job["uploads"].append(upload)
+
+async def _queue_session(job_id: str) -> Optional[Dict]:
+    """
+    Queue an upload's job once (the first call wins across workers). Files still being
+    uploaded are waited for by the pipeline. Returns the cost estimate, or None when
+    the job was already queued.
+    """
+    session = await run_in_threadpool(_claim_session, job_id)
+    if session is None:
+        return None
+    specs = session["files"]
+    use_enhanced_processing = session["use_enhanced_processing"]
+    
+    file_paths_and_names = [(_session_file_path(job_id, index, spec["filename"]), spec["filename"])
+                            for index, spec in enumerate(specs)]
+    # Files not received yet are estimated from their declared size
+    estimate = await run_in_threadpool(estimate_job_cost, file_paths_and_names, use_enhanced_processing,
+                                       [spec["size"] for spec in specs])
+    try:
+        await run_in_threadpool(job_queue.enqueue, job_id, {
+            "files": [(str(file_path), filename) for file_path, filename in file_paths_and_names],
+            "use_enhanced_processing": use_enhanced_processing
+        }, estimate["estimated_seconds"])
+    except QueueFull:
+        await run_in_threadpool(_release_session, job_id)
+        raise _queue_full()
+    await run_in_threadpool(job_store.update, job_id, {
+        "status": JobStatus.PROCESSING,
+        "estimated_seconds": estimate["estimated_seconds"]
+    })
+    logger.info(f"📤 Resumable upload {job_id} queued ({len(specs)} files, estimated {estimate['estimated_seconds']}s)")
+    return estimate
+
+@app.post("/api/uploads")
+async def create_upload_session(session: UploadSessionRequest):
+    """
+    Start a resumable upload of one or more large files (up to RESUMABLE_MAX_FILE_SIZE each).
+    Returns the job id and each file's offset; send the bytes with PUT /api/uploads/{job_id}/files/{index}.
+    """
+    if not session.files:
+        raise HTTPException(status_code=400, detail="No files declared")
+    if len(session.files) > 10:  # Limit batch size
+        raise HTTPException(status_code=400, detail="Maximum 10 files per batch")
+    for spec in session.files:
+        _check_file_type(spec.filename)
+        if spec.size > RESUMABLE_MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File '{spec.filename}' exceeds the maximum allowed size ({RESUMABLE_MAX_FILE_SIZE} bytes)"
+            )
+        if "/" in spec.filename or "\\" in spec.filename:
+            raise HTTPException(status_code=400, detail=f"Invalid file name '{spec.filename}'")
+    
+    job_id = str(uuid.uuid4())
+    job = {
+        "job_id": job_id,
+        "status": JobStatus.PENDING,
+        "user": "demo",
+        "filenames": [spec.filename for spec in session.files],
+        "total_files": len(session.files),
+        "use_enhanced_processing": session.use_enhanced_processing,
+        "upload_session": {
+            "files": [spec.model_dump() for spec in session.files],
+            "queued": False
+        },
+        "uploads": [],
+        "created_at": datetime.now().isoformat()
+    }
+    if session.batch_name:
+        job["batch_name"] = session.batch_name
+    await run_in_threadpool(job_store.create, job)
+    
+    logger.info(f"📦 Resumable upload {job_id} started: {len(session.files)} files, {sum(spec.size for spec in session.files)} bytes")
+    return _session_view(job_id, job)
+
+@app.get("/api/uploads/{job_id}")
+async def get_upload_session(job_id: str):
+    """Received bytes (the offset to resume from) of each file of a resumable upload"""
+    job = await run_in_threadpool(_upload_session, job_id)
+    return await run_in_threadpool(_session_view, job_id, job)
+
+@app.put("/api/uploads/{job_id}/files/{index}")
+async def upload_chunk(job_id: str, index: int, request: Request, offset: int = Query(..., ge=0)):
+    """
+    Append the request body to a file of a resumable upload, at offset (the file's received
+    bytes, else 409 with the expected offset). A file is checked against its SHA-256 once
+    complete; with RESUMABLE_EARLY_START its job is then queued right away.
+    """
+    job = await run_in_threadpool(_upload_session, job_id)
+    specs = job["upload_session"]["files"]
+    if not 0 <= index < len(specs):
+        raise HTTPException(status_code=404, detail="File not found in this upload")
+    spec = specs[index]
+    file_path = _session_file_path(job_id, index, spec["filename"])
+    
+    if file_path.exists():
+        written = spec["size"]
+    else:
+        try:
+            written = await append_chunk(file_path, spec["size"], offset, request.stream())
+        except OffsetMismatch as e:
+            raise HTTPException(status_code=409, detail={"message": str(e), "offset": e.offset},
+                                headers={"Upload-Offset": str(e.offset)})
+        except ChunkConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        if written == spec["size"]:
+            try:
+                sha256 = await run_in_threadpool(complete_file, file_path, spec.get("sha256"))
+            except ChecksumMismatch as e:
+                raise HTTPException(status_code=422, detail=f"{e}; send the file again from offset 0")
+            except FileNotFoundError:
+                if not file_path.exists():  # completed by a concurrent request otherwise
+                    raise
+            else:
+                await run_in_threadpool(_record_session_upload, job_id, {
+                    "index": index, "filename": spec["filename"], "size": spec["size"], "sha256": sha256
+                })
+                UPLOAD_BYTES.labels(spec["filename"].lower().split('.')[-1]).observe(spec["size"])
+                logger.info(f"✅ Resumable upload {job_id}: {spec['filename']} complete ({spec['size']} bytes)")
+                if RESUMABLE_EARLY_START:
+                    await _queue_session(job_id)
+    
+    return {
+        "job_id": job_id,
+        "index": index,
+        "offset": written,
+        "complete": written == spec["size"]
+    }
+
+@app.post("/api/uploads/{job_id}/finalize")
+async def finalize_upload_session(job_id: str):
+    """
+    Finish a resumable upload: every file must be complete (409 lists the offsets otherwise).
+    The job is queued if it was not already; follow it with /api/status or /api/progress.
+    """
+    job = await run_in_threadpool(_upload_session, job_id)
+    view = await run_in_threadpool(_session_view, job_id, job)
+    incomplete = [f for f in view["files"] if not f["complete"]]
+    if incomplete:
+        raise HTTPException(status_code=409, detail={"message": "Upload is not complete", "files": incomplete})
+    
+    estimate = await _queue_session(job_id)
+    job = await run_in_threadpool(job_store.get, job_id, False)
+    return {
+        "message": f"{len(view['files'])} file(s) uploaded successfully",
+        "job_id": job_id,
+        "filenames": job["filenames"],
+        "uploads": job["uploads"],
+        "total_files": job["total_files"],
+        "enhanced_processing": job.get("use_enhanced_processing", False),
+        **({"estimate": estimate} if estimate else {}),
+        **await run_in_threadpool(_queue_eta, job_id, job.get("estimated_seconds") or 0.0)
+    }
+
+def _json_records(df: Optional[pd.DataFrame]) -> List[Dict]:
+    """DataFrame rows as JSON-safe dicts (NaN/NaT become null)."""
+    if df is None or df.empty:
+        return []
+    return jsonable_encoder(df.astype(object).where(df.notna(), None).to_dict('records'))
+
+def _laytime_response(laytime_result) -> Dict:
+    """API response body for a laytime calculation result."""
+    return {
+        "laytime_allowed_days": laytime_result.laytime_allowed_days,
+        "laytime_consumed_days": laytime_result.laytime_consumed_days,
+        "laytime_saved_days": laytime_result.laytime_saved_days,
+        "demurrage_due": laytime_result.demurrage_due,
+        "dispatch_due": laytime_result.dispatch_due,
+        "calculation_log": laytime_result.calculation_log,
+        "events_with_calculations": _json_records(laytime_result.events_df),
+        "event_attribution": _json_records(laytime_result.attribution_df)
+    }
+
 @app.post("/api/calculate-laytime")
 async def calculate_laytime_endpoint(
     laytime_data: LaytimeCalculation,
@@ -629,15 +950,7 @@ async def calculate_laytime_endpoint(
         laytime_result = calculate_laytime(laytime_data.summary, events_df)
         
         # Convert result to API response format
-        result = {
-            "laytime_allowed_days": laytime_result.laytime_allowed_days,
-            "laytime_consumed_days": laytime_result.laytime_consumed_days,
-            "laytime_saved_days": laytime_result.laytime_saved_days,
-            "demurrage_due": laytime_result.demurrage_due,
-            "dispatch_due": laytime_result.dispatch_due,
-            "calculation_log": laytime_result.calculation_log,
-            "events_with_calculations": laytime_result.events_df.to_dict('records') if not laytime_result.events_df.empty else []
-        }
+        result = _laytime_response(laytime_result)
         
         logger.info(f"💰 Laytime calculated: allowed={laytime_result.laytime_allowed_days:.4f}, consumed={laytime_result.laytime_consumed_days:.4f}")
         
@@ -647,31 +960,254 @@ async def calculate_laytime_endpoint(
         logger.error(f"Laytime calculation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Laytime calculation failed: {str(e)}")
 
+@app.post("/api/calculate-laytime/batch")
+async def calculate_laytime_batch_endpoint(
+    batch_data: BatchLaytimeCalculation,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Calculate laytime for many voyages in one request.
+    Streams one JSON line per voyage (application/x-ndjson) in request order;
+    a voyage that fails reports its error without affecting the others.
+    """
+    if not batch_data.voyages:
+        raise HTTPException(status_code=400, detail="No voyages provided for calculation")
+    
+    voyages = [(v.voyage_id, v.summary, pd.DataFrame(v.events)) for v in batch_data.voyages]
+    
+    def generate():
+        succeeded = 0
+        for voyage_id, outcome in calculate_laytime_batch(voyages):
+            if isinstance(outcome, Exception):
+                line = {"voyage_id": voyage_id, "status": "error", "error": str(outcome)}
+            else:
+                succeeded += 1
+                line = {"voyage_id": voyage_id, "status": "ok", **_laytime_response(outcome)}
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        logger.info(f"💰 Batch laytime calculated: {succeeded}/{len(voyages)} voyages")
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def _check_completed(job: Optional[Dict]) -> Dict:
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != JobStatus.COMPLETED:
+        raise HTTPException(status_code=400, detail="Job not completed yet")
+    return job
+
+def _completed_job(job_id: str) -> Dict:
+    """Look up a job that has finished processing (404/400 otherwise)."""
+    return _check_completed(job_store.get(job_id, with_events=False))
+
+def _base_events(job_id: str, job: Dict) -> List[Dict]:
+    """A job's extracted events, read from the store unless the job dict carries them."""
+    return job["events"] if "events" in job else job_store.events(job_id)
+
+def _job_events(job_id: str, job: Dict) -> List[Dict]:
+    """A job's extracted events with its patch log applied (cached per patch version)."""
+    version = job.get("patch_version", 0)
+    events = materialized_events.get(job_id, version)
+    if events is None:
+        events = materialize_events(_base_events(job_id, job), job.get("event_patches", []))
+        materialized_events.put(job_id, version, events)
+    return events
+
+def _job_events_frame(job_id: str, job: Dict) -> pd.DataFrame:
+    """
+    A job's current events as a DataFrame; unedited jobs load their typed Parquet events.
+    Edited and added events get Date, Duration, Laytime and a missing Raw Line derived
+    from their times, as the pipeline would have written them.
+    """
+    events_file = job.get("events_file")
+    patches = job.get("event_patches")
+    if not patches and events_file and Path(events_file).exists():
+        return load_events(events_file)
+    events = _job_events(job_id, job)
+    df = pd.DataFrame(events)
+    if patches and refresh_edited_events is not None:
+        edited = edited_event_ids(patches)
+        df = refresh_edited_events(df, [event["event_id"] in edited for event in events])
+    return df
+
+def _job_laytime(job_id: str, job: Dict):
+    """Laytime over a job's patched events (cached per patch version)."""
+    version = job.get("patch_version", 0)
+    laytime_result = materialized_laytime.get(job_id, version)
+    if laytime_result is None:
+        laytime_result = calculate_laytime(job.get("summary", {}), _job_events_frame(job_id, job))
+        materialized_laytime.put(job_id, version, laytime_result)
+    return laytime_result
+
+def _laytime_session(job_id: str, job: Dict, restart: bool = False) -> LaytimeSession:
+    """
+    This worker's laytime session for a job, built on first use and caught up with
+    edits recorded through other workers by replaying the rest of the patch log.
+    """
+    with _laytime_session_locks_guard:
+        lock = laytime_session_locks.setdefault(job_id, threading.Lock())
+    patches = job.get("event_patches", [])
+    with lock:
+        if restart or job_id not in laytime_sessions:
+            laytime_sessions[job_id] = (LaytimeSession(job.get("summary", {}), _job_events(job_id, job)), len(patches))
+        session, applied = laytime_sessions[job_id]
+        if len(patches) > applied:
+            session.apply(patches[applied:])
+            laytime_sessions[job_id] = (session, len(patches))
+    return session
+
+def _apply_event_patch(job_id: str, patch: EventPatchRequest) -> Tuple[List[str], Dict]:
+    """
+    Validate and append edits to the job's patch log under the job store's write lock,
+    so edits arriving at different workers are never lost; keeps a live laytime session in step.
+    """
+    operations = [op.model_dump() for op in patch.operations]
+    with job_store.locked(job_id) as job:
+        _check_completed(job)
+        try:
+            validate_operations({event["event_id"] for event in _job_events(job_id, job)}, operations)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e).strip("'"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        next_event_id = job.get("next_event_id")
+        if next_event_id is None:
+            next_event_id = len(_base_events(job_id, job))
+        stored, next_id = assign_event_ids(operations, next_event_id)
+        job.setdefault("event_patches", []).extend(stored)
+        job["next_event_id"] = next_id
+        job["patch_version"] = job.get("patch_version", 0) + 1
+    
+    if job.get("laytime_session"):
+        _laytime_session(job_id, job)
+    return [op["event_id"] for op in stored], job
+
+@app.get("/api/events/{job_id}")
+async def get_events(job_id: str):
+    """
+    Current events of a job: the extracted events with manual edits applied
+    """
+    job = await run_in_threadpool(_completed_job, job_id)
+    return {
+        "job_id": job_id,
+        "patch_version": job.get("patch_version", 0),
+        "events": await run_in_threadpool(_job_events, job_id, job)
+    }
+
+@app.patch("/api/events/{job_id}")
+async def patch_events(
+    job_id: str,
+    patch: EventPatchRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Record manual event edits (add/update/delete) against a job's extracted events
+    """
+    affected, job = await run_in_threadpool(_apply_event_patch, job_id, patch)
+    logger.info(f"✏️ Applied {len(affected)} event edits to {job_id} (patch version {job['patch_version']})")
+    session = await run_in_threadpool(_laytime_session, job_id, job) if job.get("laytime_session") else None
+    return {
+        "job_id": job_id,
+        "patch_version": job["patch_version"],
+        "event_ids": affected,
+        "laytime": session.totals() if session else None
+    }
+
+@app.get("/api/events/{job_id}/laytime")
+async def get_events_laytime(job_id: str, current_user: str = Depends(get_current_user)):
+    """
+    Laytime over the job's current (patched) events
+    """
+    job = await run_in_threadpool(_completed_job, job_id)
+    try:
+        laytime_result = await run_in_threadpool(_job_laytime, job_id, job)
+    except Exception as e:
+        logger.error(f"Laytime calculation failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Laytime calculation failed: {str(e)}")
+    return {"patch_version": job.get("patch_version", 0), **_laytime_response(laytime_result)}
+
+@app.post("/api/laytime-session/{job_id}")
+async def create_laytime_session(job_id: str, current_user: str = Depends(get_current_user)):
+    """
+    Start (or restart) an incremental laytime session from a job's extracted events.
+    Later edits go through PATCH and only update the affected intervals.
+    """
+    job = await run_in_threadpool(_completed_job, job_id)
+    session = await run_in_threadpool(_laytime_session, job_id, job, True)
+    # Other workers build their own copy of the session from the job's events on first use
+    await run_in_threadpool(job_store.update, job_id, {"laytime_session": True})
+    logger.info(f"🧮 Laytime session started for {job_id} with {len(session.events())} events")
+    return {**session.totals(), "events": session.events()}
+
+@app.patch("/api/laytime-session/{job_id}")
+async def patch_laytime_session(
+    job_id: str,
+    patch: EventPatchRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Apply add/update/delete edits to a laytime session and return the updated totals.
+    The edits are recorded in the job's patch log like PATCH /api/events/{job_id}.
+    """
+    if not (await run_in_threadpool(_completed_job, job_id)).get("laytime_session"):
+        raise HTTPException(status_code=404, detail="No laytime session for this job")
+    affected, job = await run_in_threadpool(_apply_event_patch, job_id, patch)
+    session = await run_in_threadpool(_laytime_session, job_id, job)
+    return {**session.totals(), "event_ids": affected}
+
+@app.get("/api/laytime-session/{job_id}")
+async def get_laytime_session(job_id: str, current_user: str = Depends(get_current_user)):
+    """
+    Current laytime totals and events of a session
+    """
+    job = await run_in_threadpool(_completed_job, job_id)
+    if not job.get("laytime_session"):
+        raise HTTPException(status_code=404, detail="No laytime session for this job")
+    session = await run_in_threadpool(_laytime_session, job_id, job)
+    return {**session.totals(), "events": session.events()}
+
 @app.get("/api/result/{job_id}")
 async def get_result(job_id: str):
     """
     Get processing results for a specific job (user can only access their own jobs)
     """
-    if job_id not in jobs:
+    job = await run_in_threadpool(job_store.get, job_id, False)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    
     # Allow access to all results in demo mode
-    
-    if job["status"] == JobStatus.PROCESSING:
+    return await run_in_threadpool(_result_body, job_id, job)
+
+def _result_body(job_id: str, job: Dict) -> Dict:
+    """Response body of /api/result for a job in its current state."""
+    if job["status"] == JobStatus.PENDING:
+        # A resumable upload whose job is not queued yet
+        return {
+            "job_id": job_id,
+            "status": JobStatus.PENDING,
+            "message": "Waiting for the upload to finish",
+            "total_files": job.get("total_files", 1),
+            "filenames": job.get("filenames", []),
+            "file_status": [],
+            "events": []
+        }
+    elif job["status"] == JobStatus.PROCESSING:
+        # Files that already finished have their events here (see file_status)
         return {
             "job_id": job_id,
             "status": JobStatus.PROCESSING,
             "message": "Document(s) still being processed",
             "total_files": job.get("total_files", 1),
-            "filenames": job.get("filenames", [job.get("filename", "")])
+            "filenames": job.get("filenames", [job.get("filename", "")]),
+            "file_status": job.get("file_status", []),
+            "events": job_store.events(job_id)
         }
     elif job["status"] == JobStatus.FAILED:
         return {
             "job_id": job_id,
             "status": JobStatus.FAILED,
             "error": job["error"],
+            "file_status": job.get("file_status", []),
             "total_files": job.get("total_files", 1),
             "filenames": job.get("filenames", [job.get("filename", "")])
         }
@@ -685,26 +1221,102 @@ async def get_result(job_id: str):
             "total_files": job.get("total_files", len(filenames)),
             "processed_files": job.get("processed_files", filenames),
             "successful_files": job.get("successful_files", len(filenames)),
-            "events": job["events"],
+            "file_status": job.get("file_status", []),
+            "events": _job_events(job_id, job),
             "summary": job.get("summary", {}),
             "has_laytime_data": job.get("has_laytime_data", False),
             "processed_at": job["processed_at"]
         }
 
+def _sse(event: str, data) -> str:
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@app.get("/api/progress/{job_id}")
+async def stream_progress(job_id: str, request: Request):
+    """
+    Server-sent events for a job until it finishes: "progress" with each stage change
+    (ingest, OCR page k of N, LLM, linking, done), "file" with each document's status
+    and events as it completes, then "result" with the /api/result body, or "failed".
+    The stream watches the job store, so it follows jobs processed by any worker.
+    """
+    if await run_in_threadpool(job_store.get, job_id, False) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last_progress, files_sent = None, 0
+        last_sent = asyncio.get_running_loop().time()
+        while True:
+            job = await run_in_threadpool(job_store.get, job_id, False)
+            if job is None:
+                yield _sse("failed", {"job_id": job_id, "error": "Job was deleted"})
+                return
+            
+            progress = job.get("progress")
+            if progress and progress != last_progress:
+                files_done = progress.get("files_done", [])
+                if len(files_done) < files_sent:
+                    files_sent = 0  # a retried attempt starts over
+                if files_done[files_sent:]:
+                    partial_events = await run_in_threadpool(job_store.events, job_id)
+                for file_done in files_done[files_sent:]:
+                    yield _sse("file", {
+                        **file_done,
+                        "total_files": progress.get("total_files"),
+                        "events": [event for event in partial_events if event.get("Filename") == file_done.get("file")]
+                    })
+                files_sent = len(files_done)
+                yield _sse("progress", {
+                    **{k: v for k, v in progress.items() if k != "files_done"},
+                    "files_completed": files_sent,
+                    "status": job["status"]
+                })
+                last_progress = progress
+                last_sent = asyncio.get_running_loop().time()
+            elif last_progress is None and job["status"] == JobStatus.PROCESSING:
+                # Still waiting in the queue
+                queue_eta = await run_in_threadpool(_queue_eta, job_id, job.get("estimated_seconds") or 0.0)
+                yield _sse("progress", {"stage": "queued", "status": job["status"], **queue_eta})
+                last_progress = {}
+                last_sent = asyncio.get_running_loop().time()
+            
+            if job["status"] == JobStatus.COMPLETED:
+                body = await run_in_threadpool(_result_body, job_id, job)
+                yield _sse("result", body)
+                return
+            if job["status"] == JobStatus.FAILED:
+                yield _sse("failed", _result_body(job_id, job))
+                return
+            
+            if await request.is_disconnected():
+                return
+            if asyncio.get_running_loop().time() - last_sent >= PROGRESS_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                last_sent = asyncio.get_running_loop().time()
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # let proxies pass events through unbuffered
+    })
+
 @app.get("/api/status/{job_id}")
-async def get_status(job_id: str):
+async def get_status(job_id: str, spans: bool = False):
     """
     Get processing status for a specific job (user can only access their own jobs)
+    A processed job includes its timings per pipeline stage; spans=true adds every span.
     """
-    if job_id not in jobs:
+    job = await run_in_threadpool(job_store.get, job_id, False)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    
     # Allow access to all jobs in demo mode
     
     # Handle both single file (legacy) and multiple file responses
     filenames = job.get("filenames") or [job.get("filename", "")]
+    queue_eta = {}
+    if job["status"] == JobStatus.PROCESSING:
+        queue_eta = await run_in_threadpool(_queue_eta, job_id, job.get("estimated_seconds") or 0.0)
     
     return {
         "job_id": job_id,
@@ -712,148 +1324,226 @@ async def get_status(job_id: str):
         "filenames": filenames,
         "total_files": job.get("total_files", len(filenames)),
         "successful_files": job.get("successful_files", 0) if job["status"] == JobStatus.COMPLETED else 0,
-        "created_at": job["created_at"]
+        "created_at": job["created_at"],
+        "estimated_seconds": job.get("estimated_seconds"),
+        **queue_eta,
+        "timings": _trace_view(job.get("trace"), spans),
+        "profiled": bool(job.get("profile"))
     }
 
+def _trace_view(trace: Optional[Dict], with_spans: bool) -> Optional[Dict]:
+    if not trace or with_spans:
+        return trace
+    return {k: v for k, v in trace.items() if k not in ("spans", "dropped_spans")}
+
+@app.post("/api/jobs/{job_id}/profile")
+async def profile_job_rerun(job_id: str, current_user: str = Depends(get_current_user)):
+    """
+    Re-run a job's uploaded files as a new, profiled job (admin endpoint).
+    The original job and its results are left as they are.
+    """
+    # In production, add admin role check here
+    job = await run_in_threadpool(job_store.get, job_id, False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    filenames = job.get("filenames") or []
+    file_paths_and_names = [(UPLOAD_DIR / f"{job_id}_{i}_{filename}", filename) for i, filename in enumerate(filenames)]
+    if not file_paths_and_names or not all(file_path.exists() for file_path, _ in file_paths_and_names):
+        raise HTTPException(status_code=409, detail="The job's uploaded files are no longer available")
+    
+    profile_id = str(uuid.uuid4())
+    await run_in_threadpool(job_store.create, {
+        "job_id": profile_id,
+        "status": JobStatus.PROCESSING,
+        "user": current_user,
+        "filenames": filenames,
+        "total_files": len(filenames),
+        "use_enhanced_processing": job.get("use_enhanced_processing", False),
+        "estimated_seconds": job.get("estimated_seconds"),
+        "profile": True,
+        "profile_of": job_id,
+        "created_at": datetime.now().isoformat()
+    })
+    try:
+        await run_in_threadpool(job_queue.enqueue, profile_id, {
+            "files": [(str(file_path), filename) for file_path, filename in file_paths_and_names],
+            "use_enhanced_processing": job.get("use_enhanced_processing", False),
+            "profile": True
+        }, job.get("estimated_seconds") or 0.0)
+    except QueueFull:
+        await run_in_threadpool(job_store.delete, profile_id)
+        raise _queue_full()
+    
+    logger.info(f"🔬 Profiling job {job_id} as {profile_id} (requested by {current_user})")
+    return {
+        "job_id": profile_id,
+        "profile_of": job_id,
+        **await run_in_threadpool(_queue_eta, profile_id, job.get("estimated_seconds") or 0.0)
+    }
+
+@app.get("/api/profile/{job_id}")
+async def get_profile(job_id: str, kind: str = Query("report", description="report, folded or allocations")):
+    """
+    Download a profiled job's report: "report" (functions by own and total time),
+    "folded" (collapsed stacks for flamegraph tools) or "allocations" (tracemalloc peak and top sites).
+    """
+    if kind not in PROFILE_FILES:
+        raise HTTPException(status_code=400, detail=f"Unknown profile kind '{kind}'. Supported: {', '.join(PROFILE_FILES)}")
+    job = await run_in_threadpool(job_store.get, job_id, False)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.get("profile"):
+        raise HTTPException(status_code=404, detail="Job was not profiled")
+    
+    profile_file = RESULTS_DIR / PROFILE_FILES[kind].format(job_id=job_id)
+    if not profile_file.exists():
+        raise HTTPException(status_code=409, detail="Profile is not available yet")
+    return FileResponse(profile_file, media_type="text/plain", filename=profile_file.name)
+
+@app.get("/api/stats/pipeline")
+async def pipeline_stats(limit: int = Query(200, ge=1, le=5000)):
+    """
+    Where processing time goes: job and per-stage timings (OCR methods, Gemini calls,
+    linking) aggregated over the most recent processed jobs, plus the spans recorded
+    in this API process itself (laytime calculations; pipeline runs with PIPELINE_EXECUTOR=thread).
+    """
+    jobs = await run_in_threadpool(job_store.list, None, JobStatus.COMPLETED, limit, True)
+    return {
+        **aggregate_traces([job.get("trace") for job in jobs]),
+        "api_process": process_totals.to_dict()
+    }
+
+def _export_events_frame(job_id: str, job: Dict, request_events: Optional[List[Dict]], export_format: str) -> pd.DataFrame:
+    """
+    The events to export, with calculated laytime when the job has a summary: the posted
+    events, or the job's events with recorded edits applied (their laytime is cached).
+    """
+    summary = job.get("summary", {})
+    # Job events get their edited rows' derived columns
+    events_df = pd.DataFrame(request_events) if request_events is not None else _job_events_frame(job_id, job)
+    
+    # Calculate laytime for all events if summary data is available
+    if summary and not events_df.empty:
+        logger.info(f"🧮 Calculating laytime for export with {len(events_df)} events")
+        try:
+            # Calculate laytime with summary data (cached per patch version for job events)
+            if request_events is not None:
+                laytime_result = calculate_laytime(summary, events_df)
+            else:
+                laytime_result = _job_laytime(job_id, job)
+            
+            # Use the calculated events dataframe with laytime information
+            events_df = laytime_result.events_df
+            
+            logger.info(f"🧮 Laytime calculated for export: consumed={laytime_result.laytime_consumed_days:.4f} days")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not calculate laytime for export: {e}")
+            # Continue with original events if laytime calculation fails
+    
+    # Only standard backend format columns are exported; this drops laytime_counts,
+    # computed helper columns and duplicates from mixed frontend/backend field naming
+    events_df = export_frame(events_df, typed=export_format == "parquet")
+    logger.info(f"📋 Final export columns: {list(events_df.columns)}")
+    return events_df
+
+@app.get("/api/export/{job_id}")
 @app.post("/api/export/{job_id}")
 async def export_data(
     job_id: str, 
-    export_request: ExportRequest,
-    export_format: str = Query("csv", alias="type", description="Export format: csv or json")
+    export_request: Optional[ExportRequest] = None,
+    export_format: str = Query("csv", alias="type", description="Export format: csv, json or parquet"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
-    Export processed events as CSV or JSON with calculated laytime
-    Accepts events in request body to include manually added events
+    Export processed events as CSV, JSON or Parquet with calculated laytime
+    Uses the job's events with recorded edits (PATCH /api/events/{job_id}) applied;
+    an event list in the request body still takes precedence for older clients.
+    The export is streamed and cached by content hash, which is also its ETag.
     """
-    if job_id not in jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
+    export_format = export_format.lower()
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid export format. Use 'csv', 'json' or 'parquet'")
+    if export_format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow on the server")
     
-    job = jobs[job_id]
-    
-    if job["status"] != JobStatus.COMPLETED:
-        raise HTTPException(status_code=400, detail="Job not completed yet")
+    job = await run_in_threadpool(_completed_job, job_id)
     
-    # Use events from request body if provided, otherwise fall back to job events
-    if export_request.events:
+    # Use events from request body if provided, otherwise the job's patched events
+    from_request = bool(export_request and export_request.events)
+    if from_request:
         events = export_request.events
         logger.info(f"📋 Using {len(events)} events from request body for export (includes manual events)")
     else:
-        events = job["events"]
-        logger.info(f"📋 Using {len(events)} events from job data for export")
+        events = await run_in_threadpool(_job_events, job_id, job)
+        logger.info(f"📋 Using {len(events)} events from job data for export (patch version {job.get('patch_version', 0)})")
     
     summary = job.get("summary", {})
     
     if not events:
         raise HTTPException(status_code=404, detail="No events found")
+    
+    key = await run_in_threadpool(export_key, events, summary, export_format)
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="sof_events_{job_id[:8]}.{export_format}"'
+    }
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    
+    if if_none_match and any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": headers["Cache-Control"]})
+    
+    cached = export_cache.get(key)
+    if cached is not None:
+        logger.info(f"📦 Serving cached {export_format.upper()} export for {job_id}")
+        return Response(content=cached, media_type=media_type, headers=headers)
 
     try:
-        # Convert events to DataFrame
-        events_df = pd.DataFrame(events)
-        
-        # Calculate laytime for all events if summary data is available
-        if summary and not events_df.empty:
-            logger.info(f"� Calculating laytime for export with {len(events_df)} events")
-            try:
-                # Import the calculate_laytime function
-                from utils.sof_pipeline import calculate_laytime
-                
-                # Calculate laytime with summary data
-                laytime_result = calculate_laytime(summary, events_df)
-                
-                # Use the calculated events dataframe with laytime information
-                events_df = laytime_result.events_df
-                
-                logger.info(f"� Laytime calculated for export: consumed={laytime_result.laytime_consumed_days:.4f} days")
-            except Exception as e:
-                logger.warning(f"⚠️ Could not calculate laytime for export: {e}")
-                # Continue with original events if laytime calculation fails
-        
-        # Remove the laytime_counts column from export as requested
-        if 'laytime_counts' in events_df.columns:
-            events_df = events_df.drop('laytime_counts', axis=1)
-            logger.info("�️ Removed 'laytime_counts' column from export")
-            
-        # Remove additional unwanted columns from export
-        columns_to_remove = ['start', 'end', 'duration', 'laytime_utilization_%', 'event', 'date', 'description', 'raw_line', 'filename']
-        for col in columns_to_remove:
-            if col in events_df.columns:
-                events_df = events_df.drop(col, axis=1)
-                logger.info(f"🗑️ Removed duplicate/unwanted '{col}' column from export")
-        
-        # Ensure only standard backend format columns are included in export
-        # This prevents any duplicate columns from mixed frontend/backend field naming
-        preferred_columns = ['Event', 'start_time_iso', 'end_time_iso', 'Date', 'Duration', 'Laytime', 'Raw Line', 'Filename']
-        final_columns = [col for col in preferred_columns if col in events_df.columns]
-        events_df = events_df[final_columns]
-        logger.info(f"📋 Final export columns: {final_columns}")
-        
-        if export_format.lower() == "csv":
-            # Export as CSV
-            csv_file = RESULTS_DIR / f"{job_id}_export.csv"
-            events_df.to_csv(csv_file, index=False)
-            
-            return FileResponse(
-                csv_file,
-                media_type='text/csv',
-                filename=f"sof_events_{job_id[:8]}.csv"
-            )
-        
-        elif export_format.lower() == "json":
-            # Export as JSON with proper datetime handling
-            import json
-            
-            class DateTimeEncoder(json.JSONEncoder):
-                def default(self, obj):
-                    if pd.isna(obj):
-                        return None
-                    if hasattr(obj, 'isoformat'):
-                        return obj.isoformat()
-                    return super().default(obj)
-            
-            # Convert DataFrame to clean records for JSON export
-            logger.info(f"📄 Creating JSON export for {len(events_df)} events")
-            
-            # Convert DataFrame to dictionary records and clean data
-            clean_events = []
-            for _, row in events_df.iterrows():
-                clean_event = {}
-                for key, value in row.items():
-                    if pd.isna(value) or value is None or value == '':
-                        clean_event[key] = None
-                    elif isinstance(value, pd.Timestamp):
-                        clean_event[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                    elif isinstance(value, datetime):
-                        clean_event[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                    elif hasattr(value, 'isoformat'):
-                        clean_event[key] = value.isoformat()
-                    else:
-                        clean_event[key] = str(value)
-                clean_events.append(clean_event)
-            
-            json_file = RESULTS_DIR / f"{job_id}_export.json"
-            
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(clean_events, f, indent=2, cls=DateTimeEncoder, ensure_ascii=False)
-            
-            return FileResponse(
-                json_file,
-                media_type='application/json',
-                filename=f"sof_events_{job_id[:8]}.json"
-            )
-        
-        else:
-            raise HTTPException(status_code=400, detail="Invalid export format. Use 'csv' or 'json'")
-            
+        events_df = await run_in_threadpool(
+            _export_events_frame, job_id, job, events if from_request else None, export_format
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+    
+    logger.info(f"📄 Streaming {export_format.upper()} export for {len(events_df)} events")
+    return StreamingResponse(
+        export_cache.stream_and_store(key, iter_export(events_df, export_format)),
+        media_type=media_type,
+        headers=headers
+    )
+
+@app.get("/api/analytics/events")
+async def event_analytics(current_user: str = Depends(get_current_user)):
+    """
+    Per-job event statistics read straight from the typed Parquet result store
+    """
+    return {"jobs": await run_in_threadpool(_event_stats)}
+
+def _event_stats() -> List[Dict]:
+    df = scan_events(RESULTS_DIR, ['start_time_iso', 'end_time_iso', 'laytime_counts'])
+    if df.empty:
+        return []
+    
+    hours = (df['end_time_iso'] - df['start_time_iso']).dt.total_seconds().clip(lower=0) / 3600
+    df = df.assign(laytime_hours=hours.where(df['laytime_counts'], 0).fillna(0))
+    stats = df.groupby('job_id').agg(
+        events=('job_id', 'size'),
+        laytime_events=('laytime_counts', 'sum'),
+        first_start=('start_time_iso', 'min'),
+        last_end=('end_time_iso', 'max'),
+        laytime_hours=('laytime_hours', 'sum'),
+    ).reset_index()
+    return _json_records(stats)
 
 @app.get("/api/jobs")
-async def list_jobs():
+async def list_jobs(status: Optional[str] = Query(None, description="Only jobs with this status")):
     """
     List all processing jobs (demo mode - no user filtering)
     """
     user_jobs = []
-    for job_id, job in jobs.items():
+    for job in await run_in_threadpool(job_store.list, None, status):
+        job_id = job["job_id"]
         # Show all jobs in demo mode
         # Handle both single file (legacy) and multiple file responses
         filenames = job.get("filenames") or [job.get("filename", "")]
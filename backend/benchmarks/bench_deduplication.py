@@ -0,0 +1,98 @@
+"""
+Benchmark: clicked-PDF event deduplication.
+
+Compares the previous all-pairs signature scan with the time-bucketed
+_deduplicate_events and checks both keep exactly the same events. Each size is run
+with realistic events (3% without a start time) and with events that have no start
+time at all, which all share one time signature.
+
+    python -m benchmarks.bench_deduplication [n_events ...]
+"""
+
+import contextlib
+import io
+import random
+import sys
+import time
+
+from utils.sof_pipeline import _deduplicate_events
+
+EVENTS = [
+    "Arrived at anchorage", "Arrived anchorage", "Pilot on board", "Pilot boarded", "All fast alongside",
+    "Commenced discharge", "Discharge commenced", "Completed discharge", "NOR tendered", "NOR accepted",
+    "Rain stopped cargo operations", "Hatch 1 opened", "Hatch 2 opened", "Customs clearance",
+    "Free pratique granted", "Preparing cargo", "Shifting to berth 4", "Gangway rigged",
+]
+
+
+def _make_events(n: int, n_files: int = 20, seed: int = 3, untimed: float = 0.03) -> list:
+    """Synthetic events with cross-page and cross-file repeats of the same facts."""
+    rng = random.Random(seed)
+    events = []
+    for k in range(n):
+        day = 1 + rng.randrange(28)
+        hour = rng.randrange(24)
+        name = rng.choice(EVENTS)
+        if rng.random() < 0.3:
+            name = f"{name} #{k % 500}"
+        events.append({
+            "Event": name,
+            "start_time_iso": f"2024-08-{day:02d}T{hour:02d}:{rng.randrange(60):02d}:00" if rng.random() >= untimed else None,
+            "Filename": f"sof_{rng.randrange(n_files)}.pdf",
+        })
+    return events
+
+
+def legacy_dedup(events):
+    """The previous all-pairs scan; events without an hour only match on their exact name."""
+    unique_events = []
+    seen_signatures = set()
+    for event in events:
+        event_name = event.get("Event", "").lower().strip()
+        start_time = event.get("start_time_iso", "")
+        clean_name = event_name.replace("at", "").replace("the", "").replace("and", "")
+        clean_name = " ".join(clean_name.split())
+        time_signature = ""
+        if start_time:
+            time_signature = start_time[:13]
+        signature = f"{clean_name}_{time_signature}"
+        is_duplicate = False
+        for seen_sig in seen_signatures:
+            seen_name = seen_sig.split("_")[0]
+            if len(time_signature) < 13:
+                matches = clean_name == seen_name
+            else:
+                matches = clean_name in seen_name or seen_name in clean_name
+            if (len(clean_name) > 0 and len(seen_name) > 0 and matches and
+                    time_signature == seen_sig.split("_")[1]):
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            unique_events.append(event)
+            seen_signatures.add(signature)
+    return unique_events
+
+
+def _time(fn, events):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(list(events))
+    return time.perf_counter() - t0, result
+
+
+def main(sizes, legacy_limit: int = 20000):
+    for n in sizes:
+        for untimed in (0.03, 1.0):
+            events = _make_events(n, untimed=untimed)
+            new_s, new_events = _time(_deduplicate_events, events)
+            if n <= legacy_limit:
+                old_s, old_events = _time(legacy_dedup, events)
+                legacy = (f"legacy: {old_s * 1e3:9.1f} ms | speedup x{old_s / new_s:7.1f} | "
+                          f"identical: {old_events == new_events}")
+            else:
+                legacy = "legacy: skipped (quadratic)"
+            print(f"{n:>7} events ({untimed:4.0%} untimed) → {len(new_events):>6} unique | bucketed: {new_s * 1e3:8.1f} ms | {legacy}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 50000])
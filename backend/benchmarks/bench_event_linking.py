@@ -0,0 +1,108 @@
+"""
+Benchmark: start/end event linking.
+
+Compares the previous nested-iterrows linker with the single-pass indexed
+_link_start_end_events and checks both produce the same pairings.
+
+    python -m benchmarks.bench_event_linking [n_events ...]
+"""
+
+import contextlib
+import io
+import random
+import sys
+import time
+
+import pandas as pd
+
+from utils.sof_pipeline import _link_start_end_events
+
+OBJECTS = ["loading", "discharge", "hose", "hatch 1", "hatch 2", "bunkering", "ballast pump", "crane 3", "cargo"]
+STARTS = ["commenced", "started", "began", "connected", "opened"]
+ENDS = ["completed", "finished", "ended", "disconnected", "closed"]
+OTHERS = ["pilot on board", "all fast", "nor tendered", "rain stopped work", "suspended loading"]
+
+
+def _make_events(n: int, n_files: int, seed: int = 11) -> pd.DataFrame:
+    rng = random.Random(seed)
+    rows = []
+    base = pd.Timestamp("2024-08-22")
+    for k in range(n):
+        kind = rng.random()
+        if kind < 0.4:
+            event = f"{rng.choice(STARTS)} {rng.choice(OBJECTS)}"
+        elif kind < 0.8:
+            event = f"{rng.choice(ENDS)} {rng.choice(OBJECTS)}"
+        else:
+            event = rng.choice(OTHERS)
+        start = base + pd.Timedelta(minutes=7 * k)
+        rows.append({
+            "filename": f"sof_{rng.randrange(n_files)}.pdf",
+            "event": event.title(),
+            "start_time_iso": start.isoformat(),
+            "end_time_iso": (start + pd.Timedelta(minutes=30)).isoformat() if rng.random() < 0.15 else None,
+            "laytime_counts": True,
+            "raw_line": event,
+        })
+    return pd.DataFrame(rows)
+
+
+def legacy_link(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or 'start_time_iso' not in df.columns:
+        return df
+    df['_dt'] = pd.to_datetime(df['start_time_iso'], errors='coerce')
+    df = df.sort_values(by=['filename', '_dt']).reset_index(drop=True)
+    patterns = {
+        'commenced': 'completed', 'started': 'finished', 'began': 'ended',
+        'connected': 'disconnected', 'opened': 'closed'
+    }
+    end_times = df['end_time_iso'].copy()
+    rows_to_drop = set()
+    for i, row in df.iterrows():
+        if i in rows_to_drop or pd.notna(row['end_time_iso']):
+            continue
+        event_lower = row['event'].lower()
+        for start_word, end_word in patterns.items():
+            if start_word in event_lower:
+                for j, future_row in df.loc[i+1:].iterrows():
+                    if j in rows_to_drop:
+                        continue
+                    if future_row['filename'] != row['filename']:
+                        break
+                    future_event_lower = future_row['event'].lower()
+                    if end_word in future_event_lower:
+                        event_words = set(event_lower.split()) - {start_word}
+                        future_words = set(future_event_lower.split()) - {end_word}
+                        if len(event_words.intersection(future_words)) > 0:
+                            end_times.iloc[i] = future_row['start_time_iso']
+                            rows_to_drop.add(j)
+                            break
+                break
+    df['end_time_iso'] = end_times
+    if rows_to_drop:
+        df = df.drop(index=list(rows_to_drop)).reset_index(drop=True)
+    return df.drop(columns=['_dt'], errors='ignore')
+
+
+def _time(fn, df):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(df.copy())
+    return time.perf_counter() - t0, result
+
+
+def main(sizes, legacy_limit: int = 5000):
+    for n in sizes:
+        df = _make_events(n, n_files=max(1, n // 2000))
+        new_s, new_df = _time(_link_start_end_events, df)
+        if n <= legacy_limit:
+            old_s, old_df = _time(legacy_link, df)
+            same = old_df.reset_index(drop=True).equals(new_df.reset_index(drop=True))
+            legacy = f"legacy: {old_s * 1e3:9.1f} ms | speedup x{old_s / new_s:7.1f} | identical: {same}"
+        else:
+            legacy = "legacy: skipped (quadratic)"
+        print(f"{n:>8} events | indexed: {new_s * 1e3:8.1f} ms ({new_s * 1e6 / n:5.1f} µs/event) | {legacy}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 5000, 50000, 200000])
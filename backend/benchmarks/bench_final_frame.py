@@ -0,0 +1,86 @@
+"""
+Benchmark: building the final events frame in extract_events_and_summary.
+
+Compares the previous row-wise construction (per-row strftime, a Duration apply
+that subtracted the timestamps four times, a Laytime apply calling pd.to_datetime
+four times per row) with the columnar _final_events_frame, and checks the frames match.
+
+    python -m benchmarks.bench_final_frame [n_events ...]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.sof_pipeline import _final_events_frame
+
+
+def _make_events(n: int, seed: int = 11) -> pd.DataFrame:
+    """Linked pipeline events as they reach the final stage (timestamps already parsed)."""
+    rng = np.random.default_rng(seed)
+    start = pd.Series(pd.Timestamp("2024-08-22") + pd.to_timedelta(rng.integers(0, 60 * 24 * 90, n), unit="min"))
+    end = start + pd.to_timedelta(rng.integers(-90, 3000, n), unit="min")
+    start[rng.random(n) < 0.05] = pd.NaT
+    end[rng.random(n) < 0.3] = pd.NaT
+    counts = pd.Series(rng.random(n) < 0.6, dtype=object)
+    counts[rng.random(n) < 0.02] = np.nan
+    return pd.DataFrame({
+        "event": [f"Event {i}" for i in range(n)],
+        "start_time_iso": start,
+        "end_time_iso": end,
+        "raw_line": [f"line {i}" for i in range(n)],
+        "filename": "sof.pdf",
+        "laytime_counts": counts,
+    })
+
+
+def legacy_final_frame(df: pd.DataFrame) -> pd.DataFrame:
+    final_df = pd.DataFrame()
+    final_df['Event'] = df['event']
+    final_df['start_time_iso'] = pd.to_datetime(df['start_time_iso'], errors='coerce')
+    final_df['end_time_iso'] = pd.to_datetime(df['end_time_iso'], errors='coerce')
+    final_df['Date'] = final_df['start_time_iso'].apply(lambda x:
+        x.strftime('%a, %d %b %Y') if pd.notna(x) else 'No Date'
+    )
+    final_df['Duration'] = final_df.apply(lambda row:
+        f"{int((row['end_time_iso'] - row['start_time_iso']).total_seconds() // 3600)}h {int(((row['end_time_iso'] - row['start_time_iso']).total_seconds() % 3600) // 60)}m"
+        if pd.notna(row['start_time_iso']) and pd.notna(row['end_time_iso'])
+        else "", axis=1
+    )
+    final_df['Laytime'] = df.apply(lambda row:
+        f"{(pd.to_datetime(row['end_time_iso'], errors='coerce') - pd.to_datetime(row['start_time_iso'], errors='coerce')).total_seconds() / 86400:.4f}"
+        if pd.notna(pd.to_datetime(row['start_time_iso'], errors='coerce')) and pd.notna(pd.to_datetime(row['end_time_iso'], errors='coerce')) and row.get('laytime_counts', False)
+        else "0.0000", axis=1
+    )
+    final_df['Raw Line'] = df['raw_line']
+    final_df['Filename'] = df['filename']
+    final_df['laytime_counts'] = df['laytime_counts']
+    return final_df
+
+
+def _same(old: pd.DataFrame, new: pd.DataFrame) -> bool:
+    if list(old.columns) != list(new.columns):
+        return False
+    return all(old[col].astype(object).equals(new[col].astype(object)) for col in old.columns)
+
+
+def main(sizes, legacy_limit: int = 100_000):
+    for n in sizes:
+        events = _make_events(n)
+        t0 = time.perf_counter()
+        new_df = _final_events_frame(events)
+        new_s = time.perf_counter() - t0
+        line = f"{n:>8} events | columnar: {new_s * 1e3:8.1f} ms ({new_s * 1e6 / n:6.2f} µs/event)"
+        if n <= legacy_limit:
+            t0 = time.perf_counter()
+            old_df = legacy_final_frame(events)
+            old_s = time.perf_counter() - t0
+            line += (f" | row-wise: {old_s * 1e6 / n:7.1f} µs/event | speedup x{old_s / new_s:6.1f}"
+                     f" | identical: {_same(old_df, new_df)}")
+        print(line)
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
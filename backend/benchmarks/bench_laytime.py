@@ -0,0 +1,91 @@
+"""
+Benchmark: calculate_laytime from 10 to 1M events.
+
+Compares the previous row-wise df.apply implementation with the columnar
+calculate_laytime and checks the events frame matches. Consumed time is
+reported for both: the old code summed overlapping events twice, the
+interval engine counts their union once.
+
+    python -m benchmarks.bench_laytime [n_events ...]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.sof_pipeline import calculate_laytime
+
+SUMMARY = {"CARGO QTY": "25,000", "LOAD/DISCH": "5000", "DEMURRAGE": "20000", "DISPATCH": "10000"}
+
+
+def _make_events(n: int, seed: int = 5) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-08-22") + pd.to_timedelta(rng.integers(0, 60 * 24 * 30, n), unit="min")
+    end = start + pd.to_timedelta(rng.integers(-30, 600, n), unit="min")
+    start_iso = pd.Series(start.strftime("%Y-%m-%dT%H:%M:%S"), dtype=object)
+    end_iso = pd.Series(end.strftime("%Y-%m-%dT%H:%M:%S"), dtype=object)
+    start_iso[rng.random(n) < 0.05] = None
+    end_iso[rng.random(n) < 0.3] = None
+    return pd.DataFrame({
+        "Event": [f"Event {i}" for i in range(n)],
+        "start_time_iso": start_iso,
+        "end_time_iso": end_iso,
+        "laytime_counts": rng.random(n) < 0.6,
+    })
+
+
+def legacy_consumed(summary, events_df):
+    """The consumed-time part of the previous calculate_laytime."""
+    log = []
+    df = events_df.copy()
+    df['start'] = pd.to_datetime(df['start_time_iso'], errors='coerce')
+    df['end'] = pd.to_datetime(df['end_time_iso'], errors='coerce')
+    df['duration'] = df.apply(
+        lambda row: row['end'] - row['start']
+        if pd.notna(row['start']) and pd.notna(row['end'])
+        else pd.Timedelta(0),
+        axis=1
+    )
+    df['Duration'] = df['duration'].apply(
+        lambda td: f"{int(td.total_seconds() // 3600):02d}:{int((td.total_seconds() % 3600) // 60):02d}"
+        if td.total_seconds() > 0 else ""
+    )
+    df['laytime_utilization_%'] = df.apply(
+        lambda row: 100 if row.get('laytime_counts', False) and row['duration'].total_seconds() > 0 else 0,
+        axis=1
+    )
+    laytime_durations = df[df['laytime_counts'] == True]['duration']
+    total_consumed_seconds = sum(td.total_seconds() for td in laytime_durations if td.total_seconds() > 0)
+    consumed_days = total_consumed_seconds / (24 * 3600)
+    log.append(f"Laytime events found: {len(laytime_durations)}")
+    log.append(f"Time Consumed: {consumed_days:.4f} days")
+    return df, consumed_days, log
+
+
+def main(sizes, legacy_limit: int = 100_000):
+    for n in sizes:
+        events = _make_events(n)
+        t0 = time.perf_counter()
+        result = calculate_laytime(SUMMARY, events)
+        new_s = time.perf_counter() - t0
+        line = f"{n:>8} events | columnar: {new_s * 1e3:9.1f} ms ({new_s * 1e6 / n:7.2f} µs/event)"
+        if n <= legacy_limit:
+            t0 = time.perf_counter()
+            old_df, old_consumed, old_log = legacy_consumed(SUMMARY, events)
+            old_s = time.perf_counter() - t0
+            try:
+                pd.testing.assert_frame_equal(old_df, result.events_df)
+                same = old_log[0] in result.calculation_log
+            except AssertionError:
+                same = False
+            line += (f" | row-wise: {old_s * 1e3:9.1f} ms | speedup x{old_s / new_s:6.1f} | frames identical: {same}"
+                     f" | consumed sum/union: {old_consumed:.2f}/{result.laytime_consumed_days:.2f} days")
+        else:
+            line += " | row-wise: skipped"
+        print(line)
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10, 1_000, 10_000, 100_000, 1_000_000])
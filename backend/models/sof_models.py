@@ -10,6 +10,18 @@ class UploadRequest(BaseModel):
     """Enhanced upload request model"""
     use_enhanced_processing: Optional[bool] = Field(default=False, description="Use enhanced clicked PDF processing")
 
+class UploadFileSpec(BaseModel):
+    """A file announced at the start of a resumable upload"""
+    filename: str = Field(description="File name, with its extension")
+    size: int = Field(gt=0, description="Size in bytes")
+    sha256: Optional[str] = Field(default=None, description="Hex SHA-256, checked once the file is complete")
+
+class UploadSessionRequest(BaseModel):
+    """Start of a resumable, chunked upload"""
+    files: List[UploadFileSpec] = Field(description="Files of the bundle, in order")
+    use_enhanced_processing: Optional[bool] = Field(default=False, description="Use enhanced clicked PDF processing")
+    batch_name: Optional[str] = Field(default=None, description="Batch name")
+
 class EventData(BaseModel):
     """Individual event data structure"""
     event: str = Field(description="Event description")
@@ -34,12 +46,34 @@ class VoyageSummary(BaseModel):
     dispatch: Optional[float] = Field(None, alias="DISPATCH")
     load_disch: Optional[float] = Field(None, alias="LOAD/DISCH")
     cargo_qty: Optional[float] = Field(None, alias="CARGO QTY")
+    laytime_terms: Optional[str] = Field(None, alias="LAYTIME TERMS")
+    holidays: Optional[List[str]] = Field(None, alias="HOLIDAYS")
 
 class LaytimeCalculation(BaseModel):
     """Laytime calculation request"""
     summary: Dict[str, Any] = Field(description="Voyage summary data")
     events: List[Dict[str, Any]] = Field(description="Event data for calculation")
 
+class BatchLaytimeVoyage(BaseModel):
+    """One voyage in a batch laytime calculation"""
+    voyage_id: str = Field(description="Caller-supplied voyage identifier")
+    summary: Dict[str, Any] = Field(description="Voyage summary data")
+    events: List[Dict[str, Any]] = Field(description="Event data for calculation")
+
+class BatchLaytimeCalculation(BaseModel):
+    """Batch laytime calculation request"""
+    voyages: List[BatchLaytimeVoyage] = Field(description="Voyages to calculate")
+
+class EventPatchOperation(BaseModel):
+    """Single add/update/delete edit to a job's events"""
+    op: str = Field(description="Operation: add, update or delete")
+    event_id: Optional[str] = Field(None, description="Target event id (update/delete)")
+    event: Optional[Dict[str, Any]] = Field(None, description="New event (add) or changed fields (update)")
+
+class EventPatchRequest(BaseModel):
+    """Ordered list of event edits"""
+    operations: List[EventPatchOperation] = Field(description="Operations applied in order")
+
 class LaytimeResult(BaseModel):
     """Laytime calculation result"""
     laytime_allowed_days: float = Field(description="Allowed laytime in days")
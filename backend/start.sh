@@ -10,6 +10,15 @@ pip install -r requirements.txt
 echo "Creating necessary directories..."
 mkdir -p "${UPLOAD_DIR:-uploads}" "${RESULTS_DIR:-results}"
 
+# Standalone queue workers share the data directory with the API, which then only enqueues jobs
+if [ "${QUEUE_WORKERS:-0}" -gt 0 ]; then
+	echo "Starting ${QUEUE_WORKERS} queue worker(s)..."
+	export EMBEDDED_QUEUE_CONSUMERS=0
+	for i in $(seq "$QUEUE_WORKERS"); do
+		python worker.py &
+	done
+fi
+
 echo "Starting FastAPI application..."
 # If running on Render (PORT set) use gunicorn with uvicorn worker for production
 if [ -n "$PORT" ]; then
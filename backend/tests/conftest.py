@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads its storage paths and queue settings at import time
+_STATE_DIR = tempfile.mkdtemp(prefix="sof-tests-")
+os.environ.update({
+    "JOB_DB_PATH": os.path.join(_STATE_DIR, "jobs.db"),
+    "RESULTS_DIR": os.path.join(_STATE_DIR, "results"),
+    "UPLOAD_DIR": os.path.join(_STATE_DIR, "uploads"),
+    "EMBEDDED_QUEUE_CONSUMERS": "0",
+    "GOOGLE_API_KEY": "",
+})
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app_module):
+    from fastapi.testclient import TestClient
+    with TestClient(app_module.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def auth_headers():
+    from utils.auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'demo'})}"}
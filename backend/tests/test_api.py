@@ -0,0 +1,145 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from utils.sof_pipeline import calculate_laytime
+
+SUMMARY = {"CARGO QTY": "10,000 MT", "LOAD/DISCH": "5000", "DEMURRAGE": "20000", "DISPATCH": "10000"}
+EVENTS = [
+    {"Event": "Commenced loading", "start_time_iso": "2024-08-22T08:00:00",
+     "end_time_iso": "2024-08-25T08:00:00", "laytime_counts": True},
+]
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+# ---------------------------------------------------------------- batch laytime
+
+def test_batch_laytime_requires_auth(client):
+    response = client.post("/api/calculate-laytime/batch", json={"voyages": [{"voyage_id": "a", "events": EVENTS}]})
+    assert response.status_code in (401, 403)
+
+
+def test_batch_laytime_streams_voyages_in_order(client, auth_headers):
+    aware = [dict(EVENTS[0], start_time_iso="2024-08-22T08:00:00+02:00", end_time_iso="2024-08-25T08:00:00+02:00")]
+    voyages = [
+        {"voyage_id": "first", "summary": SUMMARY, "events": EVENTS},
+        {"voyage_id": "broken", "summary": SUMMARY, "events": [{"Event": "No times"}]},
+        {"voyage_id": "aware", "summary": SUMMARY, "events": aware},
+    ]
+    response = client.post("/api/calculate-laytime/batch", json={"voyages": voyages}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = _ndjson(response)
+    assert [line["voyage_id"] for line in lines] == ["first", "broken", "aware"]
+    assert [line["status"] for line in lines] == ["ok", "error", "ok"]
+    assert lines[0]["laytime_consumed_days"] == pytest.approx(3.0)
+    assert lines[0]["demurrage_due"] == pytest.approx(20000.0)
+    assert lines[2]["laytime_consumed_days"] == pytest.approx(3.0)
+
+
+def test_batch_laytime_rejects_empty_batch(client, auth_headers):
+    response = client.post("/api/calculate-laytime/batch", json={"voyages": []}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+# ---------------------------------------------------------------- resumable uploads
+
+CONTENT = b"Statement of Facts\nNOR tendered 22/08/2024 06:00\n" * 40
+
+
+def _start_upload(client, sha256=None):
+    spec = {"filename": "sof.txt", "size": len(CONTENT)}
+    if sha256:
+        spec["sha256"] = sha256
+    response = client.post("/api/uploads", json={"files": [spec]})
+    assert response.status_code == 200
+    return response.json()["job_id"]
+
+
+def _put(client, job_id, offset, body):
+    return client.put(f"/api/uploads/{job_id}/files/0", params={"offset": offset}, content=body)
+
+
+def test_resumable_upload_resumes_from_the_received_offset(client):
+    job_id = _start_upload(client, hashlib.sha256(CONTENT).hexdigest())
+    half = len(CONTENT) // 2
+
+    assert _put(client, job_id, 0, CONTENT[:half]).json()["offset"] == half
+
+    # A retried chunk for an offset already written is refused with the offset to resume from
+    conflict = _put(client, job_id, 0, CONTENT[:half])
+    assert conflict.status_code == 409
+    assert conflict.headers["Upload-Offset"] == str(half)
+    assert conflict.json()["detail"]["offset"] == half
+
+    assert client.get(f"/api/uploads/{job_id}").json()["files"][0]["offset"] == half
+    assert client.post(f"/api/uploads/{job_id}/finalize").status_code == 409
+
+    done = _put(client, job_id, half, CONTENT[half:]).json()
+    assert done == {"job_id": job_id, "index": 0, "offset": len(CONTENT), "complete": True}
+
+    finalized = client.post(f"/api/uploads/{job_id}/finalize")
+    assert finalized.status_code == 200
+    assert finalized.json()["uploads"][0]["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+    assert client.get(f"/api/uploads/{job_id}").json()["queued"] is True
+
+
+def test_resumable_upload_checksum_mismatch_restarts_the_file(client):
+    job_id = _start_upload(client, hashlib.sha256(b"something else").hexdigest())
+
+    response = _put(client, job_id, 0, CONTENT)
+    assert response.status_code == 422
+
+    file = client.get(f"/api/uploads/{job_id}").json()["files"][0]
+    assert file["offset"] == 0 and not file["complete"]
+    assert _put(client, job_id, 0, CONTENT[:10]).json()["offset"] == 10
+
+
+def test_resumable_upload_rejects_bytes_past_the_declared_size(client):
+    job_id = _start_upload(client)
+    assert _put(client, job_id, 0, CONTENT + b"extra").status_code == 413
+
+
+def test_result_of_an_upload_in_progress_is_pending(client):
+    job_id = _start_upload(client)
+    result = client.get(f"/api/result/{job_id}").json()
+    assert result["status"] == "pending"
+    assert result["filenames"] == ["sof.txt"] and result["events"] == []
+
+
+def test_resumable_upload_unknown_job(client):
+    assert client.get("/api/uploads/does-not-exist").status_code == 404
+
+
+# ---------------------------------------------------------------- laytime sessions
+
+def test_concurrent_catch_up_replays_each_patch_once(app_module):
+    events = [
+        dict(EVENTS[0]),
+        {"Event": "Shifting berth", "start_time_iso": "2024-08-26T00:00:00",
+         "end_time_iso": "2024-08-27T00:00:00", "laytime_counts": True},
+    ]
+    job_id = "session-race"
+    job = {"summary": SUMMARY, "events": events, "event_patches": []}
+    app_module._laytime_session(job_id, job, restart=True)
+
+    # Edits recorded through another worker: every request catches the session up at once
+    job = {**job, "event_patches": [
+        {"op": "delete", "event_id": "1"},
+        {"op": "add", "event_id": "2", "event": {"Event": "Completed loading", "start_time_iso": "2024-08-28T00:00:00",
+                                                 "end_time_iso": "2024-08-28T12:00:00", "laytime_counts": True}},
+    ]}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        sessions = list(pool.map(lambda _: app_module._laytime_session(job_id, job), range(16)))
+
+    patched = [events[0], job["event_patches"][1]["event"]]
+    expected = calculate_laytime(SUMMARY, pd.DataFrame(patched)).laytime_consumed_days
+    assert sessions[0].totals()["laytime_consumed_days"] == pytest.approx(expected)
+    assert sessions[0].totals()["event_count"] == 2
@@ -0,0 +1,51 @@
+import pytest
+
+from utils.event_patches import (
+    VersionedCache, assign_event_ids, edited_event_ids, materialize_events, validate_operations
+)
+
+BASE = [{"Event": "Arrived"}, {"Event": "Commenced loading"}, {"Event": "Completed loading"}]
+
+
+def _record(log, operations, next_id):
+    validate_operations({event["event_id"] for event in materialize_events(BASE, log)}, operations)
+    stored, next_id = assign_event_ids(operations, next_id)
+    return log + stored, next_id
+
+
+def test_replay_applies_adds_updates_and_deletes_in_order():
+    log, next_id = _record([], [
+        {"op": "update", "event_id": "1", "event": {"Event": "Commenced loading (hatch 1)"}},
+        {"op": "add", "event": {"Event": "Rain stopped work"}},
+    ], len(BASE))
+    log, next_id = _record(log, [{"op": "delete", "event_id": "0"}, {"op": "delete", "event_id": "3"}], next_id)
+    log, next_id = _record(log, [{"op": "add", "event": {"Event": "Hoses off", "event_id": "99"}}], next_id)
+    
+    assert materialize_events(BASE, log) == [
+        {"event_id": "1", "Event": "Commenced loading (hatch 1)"},
+        {"event_id": "2", "Event": "Completed loading"},
+        {"event_id": "4", "Event": "Hoses off"},
+    ]
+    # Ids are never reused, and a client-sent id on an add is ignored
+    assert next_id == 5
+    assert edited_event_ids(log) == {"1", "3", "4"}
+
+
+def test_invalid_patches_are_rejected_before_anything_is_applied():
+    with pytest.raises(KeyError):
+        validate_operations({"0", "1"}, [{"op": "delete", "event_id": "0"}, {"op": "update", "event_id": "0"}])
+    with pytest.raises(ValueError):
+        validate_operations({"0"}, [{"op": "move", "event_id": "0"}])
+    with pytest.raises(ValueError):
+        validate_operations({"0"}, [{"op": "add", "event_id": "0", "event": {"Event": "Arrived"}}])
+
+
+def test_versioned_cache_is_a_bounded_lru():
+    cache = VersionedCache(max_entries=2)
+    cache.put("a", 1, "a1")
+    cache.put("b", 1, "b1")
+    assert cache.get("a", 1) == "a1"
+    assert cache.get("a", 2) is None  # a newer patch version
+    cache.put("c", 1, "c1")
+    assert cache.get("b", 1) is None  # least recently used
+    assert cache.get("a", 1) == "a1" and cache.get("c", 1) == "c1"
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from utils import job_queue as job_queue_module
+from utils.job_queue import JobQueue, QueueFull
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.db", max_depth=3, visibility_timeout=0.2, aging_rate=1.0)
+
+
+def test_expired_lease_makes_the_job_claimable_again(queue):
+    queue.enqueue("a", {"files": []})
+    task = queue.claim("worker-1")
+    assert task.job_id == "a" and task.attempts == 1
+    assert queue.claim("worker-2") is None
+    
+    time.sleep(0.3)
+    retried = queue.claim("worker-2")
+    assert retried.job_id == "a" and retried.attempts == 2
+    # The first consumer lost its lease and can no longer ack or extend it
+    assert not queue.ack(task)
+    assert not queue.extend(task)
+    assert queue.ack(retried)
+    assert queue.depth() == 0
+
+
+def test_extended_lease_is_not_reclaimed(queue):
+    queue.enqueue("a", {})
+    task = queue.claim("worker-1")
+    time.sleep(0.15)
+    assert queue.extend(task)
+    time.sleep(0.1)
+    assert queue.claim("worker-2") is None
+
+
+def test_retry_releases_the_lease_after_its_delay(queue):
+    queue.enqueue("a", {})
+    task = queue.claim("worker-1")
+    assert queue.retry(task, delay=60)
+    assert queue.running() == 0
+    assert queue.claim("worker-1") is None
+    
+    queue.enqueue("b", {})
+    task = queue.claim("worker-1")
+    assert task.job_id == "b"
+    assert queue.retry(task, delay=0)
+    assert queue.claim("worker-1").attempts == 2
+
+
+def test_full_queue_rejects_jobs_until_one_is_acked(queue):
+    for job_id in "abc":
+        queue.enqueue(job_id, {})
+    with pytest.raises(QueueFull):
+        queue.enqueue("d", {})
+    
+    # In-flight jobs still count towards the depth
+    task = queue.claim("worker-1")
+    with pytest.raises(QueueFull):
+        queue.enqueue("d", {})
+    queue.ack(task)
+    assert queue.enqueue("d", {}) == 3
+
+
+def test_cheaper_jobs_are_claimed_first(queue):
+    queue.enqueue("scan", {}, cost=120.0)
+    queue.enqueue("text", {}, cost=2.0)
+    queue.enqueue("batch", {}, cost=2.0, weight=0.5)
+    assert [queue.claim("w").job_id for _ in range(3)] == ["text", "batch", "scan"]
+
+
+def test_waiting_jobs_age_ahead_of_newer_cheap_ones(queue, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(job_queue_module.time, "time", lambda: now[0])
+    queue.enqueue("scan", {}, cost=120.0)
+    now[0] += 150  # waited longer than the scan's extra cost
+    queue.enqueue("text", {}, cost=2.0)
+    assert queue.position("text") == (1, 120.0)
+    assert queue.claim("w").job_id == "scan"
+    assert queue.position("scan") == (0, 0.0)
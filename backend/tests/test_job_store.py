@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from utils.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(tmp_path / "jobs.db")
+    store.create({"job_id": "j", "status": "completed", "created_at": "2024-08-22T08:00:00", "count": 0})
+    return store
+
+
+def test_locked_read_modify_write_loses_no_updates(store):
+    def increment():
+        for _ in range(25):
+            with store.locked("j") as job:
+                job["count"] += 1
+    
+    threads = [threading.Thread(target=increment) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("j")["count"] == 200
+
+
+def test_locked_discards_changes_when_the_block_raises(store):
+    with pytest.raises(RuntimeError):
+        with store.locked("j") as job:
+            job["count"] = 5
+            raise RuntimeError("edit rejected")
+    assert store.get("j")["count"] == 0
+
+
+def test_locked_yields_none_for_unknown_jobs(store):
+    with store.locked("missing") as job:
+        assert job is None
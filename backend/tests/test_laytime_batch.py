@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from utils.sof_pipeline import calculate_laytime, calculate_laytime_batch
+
+SUMMARY = {"CARGO QTY": "25,000", "LOAD/DISCH": "5000", "DEMURRAGE": "20000", "DISPATCH": "10000"}
+
+
+def _events(starts, ends, counts=None):
+    return pd.DataFrame({
+        "Event": [f"Event {i}" for i in range(len(starts))],
+        "start_time_iso": starts,
+        "end_time_iso": ends,
+        "laytime_counts": counts if counts is not None else [True] * len(starts),
+    })
+
+
+NAIVE = _events(["2024-08-22T08:00", "2024-08-22T20:00"], ["2024-08-22T20:00", "2024-08-23T08:00"])
+DAY_FIRST = _events(["22/08/2024 08:00"], ["23/08/2024 20:00"])
+TZ_AWARE = _events(["2024-08-22T08:00+02:00"], ["2024-08-23T08:00+02:00"])
+
+
+def _consumed(results):
+    return {voyage_id: result.laytime_consumed_days for voyage_id, result in results}
+
+
+def test_batch_matches_single_voyage_calculation():
+    voyages = [("naive", SUMMARY, NAIVE), ("day-first", SUMMARY, DAY_FIRST)]
+    consumed = _consumed(calculate_laytime_batch(voyages))
+    for voyage_id, summary, events in voyages:
+        assert consumed[voyage_id] == pytest.approx(calculate_laytime(summary, events).laytime_consumed_days)
+
+
+def test_tz_aware_voyage_does_not_fail_the_batch():
+    results = list(calculate_laytime_batch([
+        ("before", SUMMARY, NAIVE), ("tz", SUMMARY, TZ_AWARE), ("after", SUMMARY, NAIVE),
+    ]))
+    assert [voyage_id for voyage_id, _ in results] == ["before", "tz", "after"]
+    assert not any(isinstance(result, Exception) for _, result in results)
+    consumed = _consumed(results)
+    assert consumed["tz"] == pytest.approx(calculate_laytime(SUMMARY, TZ_AWARE).laytime_consumed_days)
+    assert consumed["tz"] == pytest.approx(1.0)
+    assert consumed["before"] == consumed["after"] == pytest.approx(1.0)
+
+
+def test_invalid_voyages_yield_errors_in_order():
+    results = list(calculate_laytime_batch([
+        ("empty", SUMMARY, NAIVE.iloc[:0]),
+        ("ok", SUMMARY, NAIVE),
+        ("missing", SUMMARY, NAIVE.drop(columns=["laytime_counts"])),
+    ]))
+    assert [voyage_id for voyage_id, _ in results] == ["empty", "ok", "missing"]
+    assert isinstance(results[0][1], ValueError)
+    assert results[1][1].laytime_consumed_days == pytest.approx(1.0)
+    assert "laytime_counts" in str(results[2][1])
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from utils.laytime_calendar import parse_laytime_terms
+from utils.sof_pipeline import calculate_laytime
+
+SUMMARY = {"CARGO QTY": "10,000 MT", "LOAD/DISCH": "5000", "DEMURRAGE": "20000", "DISPATCH": "10000"}
+EVENTS = pd.DataFrame([
+    {"Event": "Commenced loading", "start_time_iso": "2024-08-22T08:00:00",
+     "end_time_iso": "2024-08-24T08:00:00", "laytime_counts": True},
+    {"Event": "Rain stopped loading", "start_time_iso": "2024-08-23T00:00:00",
+     "end_time_iso": "2024-08-23T12:00:00", "laytime_counts": False},
+])
+
+
+def test_wibon_alone_excludes_nothing():
+    terms = parse_laytime_terms({"LAYTIME TERMS": "SHINC WIBON"})
+    assert not terms.excludes_anything
+    laytime = calculate_laytime({**SUMMARY, "LAYTIME TERMS": "SHINC WIBON"}, EVENTS)
+    assert laytime.laytime_consumed_days == pytest.approx(2.0)
+
+
+def test_weather_working_days_exclude_weather_stoppages():
+    terms = parse_laytime_terms({"LAYTIME TERMS": "SHINC WWD"})
+    assert terms.weather_excluded
+    laytime = calculate_laytime({**SUMMARY, "LAYTIME TERMS": "SHINC WWD"}, EVENTS)
+    assert laytime.laytime_consumed_days == pytest.approx(1.5)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.laytime_session import LaytimeSession
+from utils.sof_pipeline import calculate_laytime
+
+SUMMARY = {"CARGO QTY": "25,000 MT", "LOAD/DISCH": "5000", "DEMURRAGE": "USD 20,000", "DISPATCH": "10000"}
+
+EVENTS = [
+    {"Event": "Commenced loading", "start_time_iso": "2024-08-22T08:00:00", "end_time_iso": "2024-08-23T20:00:00", "laytime_counts": True},
+    # Overlaps the first event, so it only counts once
+    {"Event": "Shifting berth", "start_time_iso": "2024-08-23T12:00:00", "end_time_iso": "2024-08-24T06:00:00", "laytime_counts": True},
+    {"Event": "Waiting for cargo", "start_time_iso": "2024-08-24T10:00:00", "end_time_iso": "2024-08-26T10:00:00", "laytime_counts": True},
+    {"Event": "Rain stopped loading", "start_time_iso": "2024-08-25T00:00:00", "end_time_iso": "2024-08-25T06:00:00",
+     "laytime_counts": False, "laytime_excluded": True},
+    {"Event": "NOR tendered", "start_time_iso": "2024-08-22T06:00:00", "end_time_iso": None, "laytime_counts": False},
+]
+
+TOTALS = ("laytime_allowed_days", "laytime_consumed_days", "laytime_saved_days", "demurrage_due", "dispatch_due")
+
+
+def _assert_parity(summary, events):
+    session = LaytimeSession(summary, events).totals()
+    batch = calculate_laytime(summary, pd.DataFrame(events))
+    for field in TOTALS:
+        assert session[field] == pytest.approx(getattr(batch, field)), field
+
+
+@pytest.mark.parametrize("cargo_qty", ["25,000 MT", "10,000 MT"], ids=["dispatch", "demurrage"])
+def test_session_matches_calculate_laytime(cargo_qty):
+    _assert_parity({**SUMMARY, "CARGO QTY": cargo_qty}, EVENTS)
+
+
+def test_session_matches_calculate_laytime_under_calendar_terms():
+    _assert_parity({**SUMMARY, "LAYTIME TERMS": "SHEX UU"}, EVENTS)
+
+
+def test_session_matches_after_edits():
+    session = LaytimeSession(SUMMARY, EVENTS)
+    session.apply([
+        {"op": "delete", "event_id": "1"},
+        {"op": "update", "event_id": "2", "event": {"end_time_iso": "2024-08-27T10:00:00"}},
+        {"op": "add", "event": {"Event": "Completed loading", "start_time_iso": "2024-08-28T00:00:00",
+                                "end_time_iso": "2024-08-28T04:00:00", "laytime_counts": True}},
+    ])
+    events = [{k: v for k, v in event.items() if k != "event_id"} for event in session.events()]
+    batch = calculate_laytime(SUMMARY, pd.DataFrame(events))
+    assert session.totals()["laytime_consumed_days"] == pytest.approx(batch.laytime_consumed_days)
+
+
+def test_session_rejects_an_add_reusing_an_event_id():
+    session = LaytimeSession(SUMMARY, EVENTS)
+    before = session.totals()
+    with pytest.raises(ValueError):
+        session.apply([{"op": "add", "event_id": "0", "event": {
+            "Event": "Commenced loading", "start_time_iso": "2024-08-30T00:00:00",
+            "end_time_iso": "2024-08-31T00:00:00", "laytime_counts": True}}])
+    assert session.totals() == before
+
+
+def test_session_replaces_events_sharing_an_id():
+    first = dict(EVENTS[0], event_id="7")
+    second = dict(EVENTS[2], event_id="7")
+    session = LaytimeSession(SUMMARY, [first, second])
+    expected = LaytimeSession(SUMMARY, [EVENTS[2]]).totals()
+    assert session.totals()["laytime_consumed_days"] == pytest.approx(expected["laytime_consumed_days"])
+
+
+@pytest.mark.parametrize("flag", [np.bool_, str], ids=["numpy-bools", "strings"])
+def test_session_reads_flags_like_calculate_laytime(flag):
+    events = [dict(event, laytime_counts=flag(event["laytime_counts"]),
+                   laytime_excluded=flag(event.get("laytime_excluded", False))) for event in EVENTS]
+    _assert_parity(SUMMARY, events)
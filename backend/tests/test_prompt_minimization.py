@@ -0,0 +1,35 @@
+from utils.sof_pipeline import _has_prompt_signal, _minimize_prompt_text
+
+HEADER = "ACME SHIPPING AGENCY LTD\nM/V OCEAN STAR - STATEMENT OF FACTS\nPort of Loading"
+FOOTER = "Agency copy - confidential"
+
+
+def _page(date, *events):
+    return "\n".join([HEADER, date, *events, FOOTER])
+
+
+def test_repeated_events_on_different_pages_are_kept():
+    text, _ = _minimize_prompt_text([
+        _page("22/08/2024", "0800 Commenced loading", "1200 Stopped for meal break"),
+        _page("23/08/2024", "0800 Commenced loading", "1800 Completed loading"),
+    ])
+    assert text.count("0800 Commenced loading") == 2
+
+
+def test_page_boilerplate_is_kept_once():
+    text, stats = _minimize_prompt_text([
+        _page("22/08/2024", "0800 Commenced loading"),
+        _page("23/08/2024", "0900 Resumed loading"),
+    ])
+    assert text.count("M/V OCEAN STAR - STATEMENT OF FACTS") == 1
+    assert FOOTER.lower() not in text.lower()
+    assert stats["lines_after"] < stats["lines_before"]
+
+
+def test_keywords_match_whole_words():
+    assert _has_prompt_signal("NOR tendered")
+    assert _has_prompt_signal("Rates as per charter party")
+    assert _has_prompt_signal("Commenced hatches")
+    assert not _has_prompt_signal("Normal operations")
+    assert not _has_prompt_signal("Report follows")
+    assert not _has_prompt_signal("Corporate address")
@@ -0,0 +1,169 @@
+"""
+Job cost model
+Estimates how long the pipeline will take for an upload from cheap file inspection:
+page count, which PDF pages have a text layer (PyMuPDF), image megapixels and the OCR
+path the pipeline will take for them. The estimate orders the job queue (weighted
+shortest-job-first) and is returned to the client as an ETA.
+"""
+
+import importlib.util
+import math
+import os
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+# Seconds per unit of work; each can be tuned with a COST_<NAME> environment variable
+COST_COEFFICIENTS = {
+    "LLM_SECONDS_PER_DOC": 8.0,        # events + summary prompts for one document (run LLM_THREADS at a time)
+    "TEXT_PAGE_SECONDS": 0.05,         # text-layer extraction per PDF page
+    "OCR_SECONDS_PER_MP": 2.5,         # ultra OCR (several Tesseract passes) per megapixel
+    "ENHANCED_OCR_SECONDS_PER_MP": 1.2,
+    "NO_OCR_SECONDS_PER_MP": 0.05,     # rendering only, when Tesseract is not installed
+    "DOCX_SECONDS": 0.3,
+    "TEXT_SECONDS_PER_MB": 0.5,
+    "SCAN_MP_PER_MB": 8.0,             # OCR megapixels per MB of a PDF/image not received yet (scanned pages)
+}
+COST_COEFFICIENTS.update({
+    name: float(os.environ[f"COST_{name}"]) for name in COST_COEFFICIENTS if f"COST_{name}" in os.environ
+})
+
+OCR_AVAILABLE = importlib.util.find_spec("pytesseract") is not None
+LLM_THREADS = int(os.getenv("LLM_THREADS", 4))
+PIPELINE_FILE_THREADS = int(os.getenv("PIPELINE_FILE_THREADS", 4))
+
+# Same thresholds and render scales as sof_pipeline
+_TEXT_LAYER_MIN_CHARS = 20
+_STANDARD_OCR_SCALE = 2.0
+_ENHANCED_OCR_SCALE = 3.0
+_ENHANCED_MIN_CHARS = 100
+_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.webp', '.gif'}
+
+
+@dataclass
+class FileCost:
+    filename: str
+    pages: int = 0
+    text_pages: int = 0
+    ocr_pages: int = 0
+    ocr_megapixels: float = 0.0
+    ocr_path: str = "none"
+    estimated_seconds: float = 0.0
+
+
+def _pdf_cost(path: str, cost: FileCost, enhanced: bool) -> None:
+    with fitz.open(path) as pdf:
+        cost.pages = pdf.page_count
+        text_chars = [len(page.get_text("text").strip()) for page in pdf]
+        areas = [page.rect.width * page.rect.height for page in pdf]  # in points (1/72 inch)
+    cost.text_pages = sum(1 for chars in text_chars if chars > _TEXT_LAYER_MIN_CHARS)
+
+    if enhanced:
+        # The clicked-PDF path OCRs every page at 3x, but only when the text layer is too thin
+        ocr_pages = list(range(cost.pages)) if all(chars < _ENHANCED_MIN_CHARS for chars in text_chars) else []
+        scale = _ENHANCED_OCR_SCALE
+    else:
+        # The standard path OCRs at 2x just the pages without usable text
+        ocr_pages = [i for i, chars in enumerate(text_chars) if chars <= _TEXT_LAYER_MIN_CHARS]
+        scale = _STANDARD_OCR_SCALE
+    cost.ocr_pages = len(ocr_pages)
+    cost.ocr_megapixels = sum(areas[i] for i in ocr_pages) * scale * scale / 1e6
+    if ocr_pages:
+        cost.ocr_path = "enhanced" if enhanced else "ultra"
+
+
+def _ocr_seconds(cost: FileCost) -> float:
+    if not cost.ocr_megapixels:
+        return 0.0
+    if not OCR_AVAILABLE:
+        per_mp = COST_COEFFICIENTS["NO_OCR_SECONDS_PER_MP"]
+    elif cost.ocr_path == "enhanced":
+        per_mp = COST_COEFFICIENTS["ENHANCED_OCR_SECONDS_PER_MP"]
+    else:
+        per_mp = COST_COEFFICIENTS["OCR_SECONDS_PER_MP"]
+    return cost.ocr_megapixels * per_mp
+
+
+def estimate_file_cost(path: str, filename: str, enhanced: bool = False) -> FileCost:
+    """Inspect one uploaded file (extraction and OCR only; LLM time is added per job)."""
+    cost = FileCost(filename=filename)
+    ext = os.path.splitext(filename)[1].lower()
+    extra_seconds = 0.0
+    try:
+        if ext == '.pdf':
+            _pdf_cost(path, cost, enhanced)
+        elif ext in _IMAGE_EXTENSIONS:
+            with Image.open(path) as img:  # reads the header only
+                width, height = img.size
+            cost.pages, cost.ocr_pages = 1, 1
+            cost.ocr_megapixels = width * height / 1e6
+            cost.ocr_path = "ultra"
+        else:
+            cost.pages = cost.text_pages = 1
+            if ext in ('.docx', '.doc'):
+                extra_seconds = COST_COEFFICIENTS["DOCX_SECONDS"]
+            else:
+                extra_seconds = os.path.getsize(path) / 1e6 * COST_COEFFICIENTS["TEXT_SECONDS_PER_MB"]
+    except Exception:
+        # Unreadable here means the pipeline will not get far with it either
+        cost.pages = cost.text_pages = 1
+
+    seconds = cost.text_pages * COST_COEFFICIENTS["TEXT_PAGE_SECONDS"] + _ocr_seconds(cost) + extra_seconds
+    cost.estimated_seconds = round(seconds, 2)
+    return cost
+
+
+def estimate_declared_cost(filename: str, size: int, enhanced: bool = False) -> FileCost:
+    """
+    Cost of a file that has not been received yet, from its declared size. PDFs and
+    images are assumed to be scans, OCRed in full at SCAN_MP_PER_MB megapixels per MB.
+    """
+    cost = FileCost(filename=filename)
+    ext = os.path.splitext(filename)[1].lower()
+    size_mb = size / 1e6
+    extra_seconds = 0.0
+    if ext == '.pdf' or ext in _IMAGE_EXTENSIONS:
+        cost.pages = cost.ocr_pages = 1
+        cost.ocr_megapixels = size_mb * COST_COEFFICIENTS["SCAN_MP_PER_MB"]
+        cost.ocr_path = "enhanced" if enhanced else "ultra"
+    else:
+        cost.pages = cost.text_pages = 1
+        if ext in ('.docx', '.doc'):
+            extra_seconds = COST_COEFFICIENTS["DOCX_SECONDS"]
+        else:
+            extra_seconds = size_mb * COST_COEFFICIENTS["TEXT_SECONDS_PER_MB"]
+
+    seconds = cost.text_pages * COST_COEFFICIENTS["TEXT_PAGE_SECONDS"] + _ocr_seconds(cost) + extra_seconds
+    cost.estimated_seconds = round(seconds, 2)
+    return cost
+
+
+def estimate_job_cost(file_paths_and_names: List[Tuple[str, str]], use_enhanced_processing: bool = False,
+                      declared_sizes: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Per-file and total cost estimate for an upload, mirroring how the pipeline will treat
+    each file. Files not on disk yet (resumable uploads) are estimated from declared_sizes.
+    """
+    # Enhanced processing only applies to a single PDF upload (see run_pipeline)
+    enhanced = use_enhanced_processing and len(file_paths_and_names) == 1
+    files = []
+    for position, (path, filename) in enumerate(file_paths_and_names):
+        file_enhanced = enhanced and filename.lower().endswith('.pdf')
+        if declared_sizes is not None and not os.path.exists(path):
+            files.append(estimate_declared_cost(filename, declared_sizes[position], file_enhanced))
+        else:
+            files.append(estimate_file_cost(str(path), filename, file_enhanced))
+    # Files run through their own pipelines, PIPELINE_FILE_THREADS at a time
+    file_seconds = [f.estimated_seconds for f in files]
+    extraction_seconds = max(max(file_seconds, default=0.0),
+                             sum(file_seconds) / max(1, min(PIPELINE_FILE_THREADS, len(files))))
+    llm_seconds = COST_COEFFICIENTS["LLM_SECONDS_PER_DOC"] * math.ceil(len(files) / max(1, LLM_THREADS))
+    return {
+        "estimated_seconds": round(extraction_seconds + llm_seconds, 1),
+        "pages": sum(f.pages for f in files),
+        "ocr_pages": sum(f.ocr_pages for f in files),
+        "ocr_megapixels": round(sum(f.ocr_megapixels for f in files), 2),
+        "files": [asdict(f) for f in files],
+    }
@@ -0,0 +1,100 @@
+"""
+Event patch log
+Manual edits to a job's events are stored as a compact list of add/update/delete
+operations against the extracted events instead of resending the whole event list.
+Extracted events are addressed by their position ("0", "1", ...); added events get
+the next free id. The current event list is the extracted events with the log replayed.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+PATCH_OPERATIONS = ("add", "update", "delete")
+
+MATERIALIZED_CACHE_SIZE = int(os.getenv("MATERIALIZED_CACHE_SIZE", 64))
+
+
+def validate_operations(known_ids: Set[str], operations: Iterable[Dict[str, Any]]) -> None:
+    """
+    Check a patch before anything is applied, so it is all-or-nothing.
+    Raises ValueError for an unsupported operation or an add reusing an existing event id,
+    and KeyError for an unknown event id.
+    """
+    known = set(known_ids)
+    for operation in operations:
+        op = operation.get("op")
+        if op not in PATCH_OPERATIONS:
+            raise ValueError(f"Unsupported patch operation: {op}")
+        if op == "add":
+            if operation.get("event_id") is not None:
+                event_id = str(operation["event_id"])
+                if event_id in known:
+                    raise ValueError(f"Event id already exists: {event_id}")
+                known.add(event_id)
+            continue
+        event_id = str(operation.get("event_id"))
+        if event_id not in known:
+            raise KeyError(f"Unknown event id: {event_id}")
+        if op == "delete":
+            known.discard(event_id)
+
+
+def assign_event_ids(operations: Iterable[Dict[str, Any]], next_id: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Give every add operation its event id; returns the stored operations and the next free id."""
+    stored = []
+    for operation in operations:
+        operation = {key: value for key, value in operation.items() if value is not None}
+        if "event" in operation:
+            operation["event"] = {key: value for key, value in operation["event"].items() if key != "event_id"}
+        if operation["op"] == "add":
+            operation["event_id"] = str(next_id)
+            next_id += 1
+        else:
+            operation["event_id"] = str(operation["event_id"])
+        stored.append(operation)
+    return stored, next_id
+
+
+def materialize_events(base_events: List[Dict[str, Any]], patches: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Extracted events with the patch log replayed, each carrying its event_id."""
+    events = {str(i): event for i, event in enumerate(base_events)}
+    for operation in patches:
+        event_id = operation["event_id"]
+        if operation["op"] == "add":
+            events[event_id] = dict(operation.get("event") or {})
+        elif operation["op"] == "update":
+            events[event_id] = {**events[event_id], **(operation.get("event") or {})}
+        else:
+            events.pop(event_id, None)
+    return [{"event_id": event_id, **event} for event_id, event in events.items()]
+
+
+def edited_event_ids(patches: Iterable[Dict[str, Any]]) -> Set[str]:
+    """Ids of the events the patch log added or updated."""
+    return {operation["event_id"] for operation in patches if operation["op"] in ("add", "update")}
+
+
+class VersionedCache:
+    """Thread-safe LRU of one value per job, valid for a single patch version."""
+
+    def __init__(self, max_entries: int = MATERIALIZED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str, version: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(job_id)
+            return entry[1]
+
+    def put(self, job_id: str, version: int, value: Any) -> None:
+        with self._lock:
+            self._entries[job_id] = (version, value)
+            self._entries.move_to_end(job_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
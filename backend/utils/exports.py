@@ -0,0 +1,158 @@
+"""
+Event exports
+Builds CSV/JSON exports column-wise and yields them in chunks, so a download can be
+streamed as it is generated. Finished exports are kept in a small in-memory LRU cache
+keyed by a content hash of (events, summary, format), which doubles as the ETag.
+"""
+
+import hashlib
+import io
+import json
+import os
+import textwrap
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+try:
+    from utils.result_store import iso_timestamps, typed_events
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from result_store import iso_timestamps, typed_events
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Standard backend columns; internal and duplicate frontend field names are left out
+EXPORT_COLUMNS = ['Event', 'start_time_iso', 'end_time_iso', 'Date', 'Duration', 'Laytime', 'Raw Line', 'Filename']
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 2000))
+EXPORT_CACHE_SIZE = int(os.getenv("EXPORT_CACHE_SIZE", 32))
+
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def export_key(events: List[Dict[str, Any]], summary: Dict[str, Any], export_format: str) -> str:
+    """Content hash of an export request; identical inputs give the same export and ETag."""
+    payload = json.dumps([events, summary, export_format.lower()], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def export_frame(events_df: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
+    """
+    Only the standard backend columns, in export order. Typed timestamp columns are
+    written as ISO strings, the same as events stored as JSON, unless typed is set.
+    """
+    df = events_df[[col for col in EXPORT_COLUMNS if col in events_df.columns]]
+    if typed:
+        return typed_events(df)
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]) and getattr(df[col].dt, "tz", None) is None:
+            df = df.assign(**{col: iso_timestamps(df[col])})
+    return df
+
+
+def _json_cell(value: Any) -> Any:
+    if value is None or value == '' or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if isinstance(value, datetime):
+        return value.strftime(_TIMESTAMP_FORMAT)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _json_column(series: pd.Series) -> List[Any]:
+    """One column as JSON values: null for missing/empty, timestamps formatted, everything else str."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime(_TIMESTAMP_FORMAT).astype(object).where(series.notna(), None).tolist()
+    if isinstance(series.dtype, pd.StringDtype):
+        return series.astype(object).where(series.notna() & series.ne(''), None).tolist()
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.astype(str).astype(object).where(series.notna(), None).tolist()
+    return [_json_cell(value) for value in series.tolist()]
+
+
+def json_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Export rows as JSON-ready dicts, converted a column at a time."""
+    columns = {col: _json_column(df[col]) for col in df.columns}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())] if columns else [{} for _ in range(len(df))]
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """CSV text in row chunks; concatenated it equals df.to_csv(index=False)."""
+    if df.empty:
+        yield df.to_csv(index=False)
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0)
+
+
+def iter_json(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+    """JSON array text in row chunks; concatenated it equals json.dump(records, indent=2)."""
+    if df.empty:
+        yield "[]"
+        return
+    yield "[\n"
+    for start in range(0, len(df), chunk_rows):
+        records = json_records(df.iloc[start:start + chunk_rows])
+        body = ",\n".join(textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), "  ") for record in records)
+        yield (",\n" if start else "") + body
+    yield "\n]"
+
+
+def iter_parquet(df: pd.DataFrame) -> Iterator[bytes]:
+    """Parquet needs its footer written last, so the file is produced in one piece."""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    yield buffer.getvalue()
+
+
+def iter_export(df: pd.DataFrame, export_format: str) -> Iterator[Union[str, bytes]]:
+    if export_format == "csv":
+        return iter_csv(df)
+    if export_format == "json":
+        return iter_json(df)
+    if export_format == "parquet":
+        return iter_parquet(df)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+class ExportCache:
+    """Thread-safe LRU of finished export bodies keyed by export_key."""
+
+    def __init__(self, max_entries: int = EXPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stream_and_store(self, key: str, chunks: Iterator[Union[str, bytes]]) -> Iterator[bytes]:
+        """Yield encoded chunks as they are produced and cache the full body once complete."""
+        parts = []
+        for chunk in chunks:
+            data = chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+            parts.append(data)
+            yield data
+        self.put(key, b"".join(parts))
+
+
+export_cache = ExportCache()
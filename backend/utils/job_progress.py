@@ -0,0 +1,89 @@
+"""
+Job progress
+The pipeline reports progress as progress(stage, **details) calls: "ingest" per file,
+"ocr" per scanned page (page k of pages), "llm", "file_done" per document, "linking"
+and finally "done". ProgressReporter records them on the job in the job store, which
+every API worker can read, so a progress stream can follow a job processed in another
+process or on a standalone queue worker.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    from utils.job_store import JobStore
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from job_store import JobStore
+
+# Repeated updates of the same stage (OCR pages) are written at most this often
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", 0.5))
+
+# Stages always written, even right after another update
+_MILESTONES = {"ingest", "llm", "file_done", "linking", "done"}
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _store(db_path: str) -> JobStore:
+    return JobStore(Path(db_path))
+
+
+class ProgressReporter:
+    """
+    Progress callback for one job. The job's "progress" field holds the current stage
+    and its details, the documents finished so far and the time of the update.
+    Safe to call from the threads of a job's per-file pipelines.
+    """
+
+    def __init__(self, store: JobStore, job_id: str, total_files: int = 0,
+                 min_interval: float = PROGRESS_MIN_INTERVAL):
+        self.store = store
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.files_done: List[Dict[str, Any]] = []
+        self.total_files = total_files
+        self._last_write = 0.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_job(cls, db_path: str, job_id: str, total_files: int = 0) -> "ProgressReporter":
+        """A reporter writing to the job store at db_path (one store per process and path)."""
+        return cls(_store(str(db_path)), job_id, total_files)
+
+    def __call__(self, stage: str, **details: Any) -> None:
+        with self._lock:
+            if stage == "file_done":
+                self.files_done.append(details)
+            self._pending = {"stage": stage, **details}
+            now = time.monotonic()
+            if stage in _MILESTONES or now - self._last_write >= self.min_interval:
+                self._write(now)
+
+    def flush(self) -> None:
+        """Write an update held back by the rate limit."""
+        with self._lock:
+            if self._pending is not None:
+                self._write(time.monotonic())
+
+    def _write(self, now: float) -> None:
+        progress = {
+            **self._pending,
+            "files_done": list(self.files_done),
+            "total_files": self.total_files,
+            "updated_at": datetime.now().isoformat()
+        }
+        self._pending = None
+        self._last_write = now
+        try:
+            self.store.update(self.job_id, {"progress": progress})
+        except Exception as e:
+            # Progress is informational; never fail a job over it
+            logger.warning(f"⚠️ Could not record progress for {self.job_id}: {e}")
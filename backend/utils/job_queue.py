@@ -0,0 +1,249 @@
+"""
+Durable job queue
+Uploaded jobs wait in a SQLite table (the job store's database, WAL mode) until a
+consumer claims them, so queued work survives restarts and any number of processes
+can pull from it. A claim is a lease: it expires after the visibility timeout unless
+the consumer keeps extending it, and an expired lease makes the job claimable again,
+which retries work lost when a worker dies. The queue depth is capped for backpressure.
+
+Jobs are claimed weighted-shortest-job-first with aging: each job's priority is its
+estimated cost divided by its weight, minus QUEUE_AGING_RATE seconds for every second
+it has waited, so a small upload overtakes a large scan but nothing waits forever.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+QUEUE_MAX_DEPTH = int(os.getenv("QUEUE_MAX_DEPTH", 50))
+QUEUE_VISIBILITY_TIMEOUT = float(os.getenv("QUEUE_VISIBILITY_TIMEOUT", 600))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", 3))
+QUEUE_RETRY_DELAY = float(os.getenv("QUEUE_RETRY_DELAY", 30))
+QUEUE_POLL_INTERVAL = float(os.getenv("QUEUE_POLL_INTERVAL", 1.0))
+QUEUE_AGING_RATE = float(os.getenv("QUEUE_AGING_RATE", 1.0))
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_queue (
+    job_id        TEXT PRIMARY KEY,
+    payload       TEXT NOT NULL,
+    enqueued_at   REAL NOT NULL,
+    available_at  REAL NOT NULL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    lease_token   TEXT,
+    lease_owner   TEXT,
+    cost          REAL NOT NULL DEFAULT 0,
+    weight        REAL NOT NULL DEFAULT 1,
+    priority      REAL NOT NULL DEFAULT 0
+);
+"""
+
+# Columns added after the first version of the table, with their definitions
+_ADDED_COLUMNS = (("cost", "REAL NOT NULL DEFAULT 0"), ("weight", "REAL NOT NULL DEFAULT 1"),
+                  ("priority", "REAL NOT NULL DEFAULT 0"))
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_job_queue_available ON job_queue (available_at, enqueued_at);
+CREATE INDEX IF NOT EXISTS idx_job_queue_priority ON job_queue (priority);
+"""
+
+
+class QueueFull(Exception):
+    """The queue already holds QUEUE_MAX_DEPTH jobs."""
+
+
+@dataclass
+class QueuedTask:
+    job_id: str
+    payload: Dict[str, Any]
+    attempts: int
+    lease_token: str
+    cost: float = 0.0
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    SQLite-backed work queue with leases. Queued and in-flight jobs both count
+    towards the depth; a job leaves the queue only when its consumer acks it.
+    """
+
+    def __init__(self, path: Path, max_depth: int = QUEUE_MAX_DEPTH,
+                 visibility_timeout: float = QUEUE_VISIBILITY_TIMEOUT,
+                 max_attempts: int = QUEUE_MAX_ATTEMPTS, aging_rate: float = QUEUE_AGING_RATE,
+                 timeout: float = 30.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_depth = max_depth
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.aging_rate = aging_rate
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(job_queue)")}
+        for name, definition in _ADDED_COLUMNS:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE job_queue ADD COLUMN {name} {definition}")
+        if "priority" not in existing:
+            # Jobs queued before priorities existed keep their first-in-first-out order
+            conn.execute("UPDATE job_queue SET priority = ? * enqueued_at", (self.aging_rate,))
+        conn.executescript(_INDEXES)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def depth(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM job_queue").fetchone()[0]
+
+    def running(self) -> int:
+        """Jobs currently leased by a consumer."""
+        return self._connect().execute("SELECT COUNT(*) FROM job_queue WHERE lease_token IS NOT NULL").fetchone()[0]
+
+    def _priority(self, cost: float, weight: float, enqueued_at: float) -> float:
+        # cost / weight - aging_rate * (now - enqueued_at), without the term shared by all jobs
+        return cost / max(weight, 1e-9) + self.aging_rate * enqueued_at
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], cost: float = 0.0, weight: float = 1.0) -> int:
+        """
+        Add a job with its estimated cost in seconds; a higher weight moves it forward.
+        Raises QueueFull when the queue is at its depth limit. Returns the new depth.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            depth = conn.execute("SELECT COUNT(*) FROM job_queue").fetchone()[0]
+            if self.max_depth and depth >= self.max_depth:
+                raise QueueFull(f"Queue is full ({depth} jobs)")
+            now = time.time()
+            conn.execute(
+                "INSERT INTO job_queue (job_id, payload, enqueued_at, available_at, cost, weight, priority) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload, default=str), now, now, cost, weight, self._priority(cost, weight, now))
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return depth + 1
+
+    def claim(self, owner: str) -> Optional[QueuedTask]:
+        """Lease the visible job with the best (lowest) priority; None when there is none."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT job_id, payload, attempts, cost FROM job_queue WHERE available_at <= ? "
+                "ORDER BY priority LIMIT 1", (now,)
+            ).fetchone()
+            task = None
+            if row is not None:
+                task = QueuedTask(row["job_id"], json.loads(row["payload"]), row["attempts"] + 1,
+                                  uuid.uuid4().hex, row["cost"])
+                conn.execute(
+                    "UPDATE job_queue SET available_at = ?, attempts = ?, lease_token = ?, lease_owner = ? WHERE job_id = ?",
+                    (now + self.visibility_timeout, task.attempts, task.lease_token, owner, task.job_id)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return task
+
+    def position(self, job_id: str) -> Optional[Tuple[int, float]]:
+        """
+        (jobs ahead, their estimated seconds) for a waiting job: running jobs and those
+        with a better priority. (0, 0.0) once it is running; None when not queued.
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT priority, lease_token FROM job_queue WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row["lease_token"] is not None:
+            return 0, 0.0
+        ahead = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(cost), 0) FROM job_queue "
+            "WHERE job_id != ? AND (lease_token IS NOT NULL OR priority < ?)", (job_id, row["priority"])
+        ).fetchone()
+        return ahead[0], ahead[1]
+
+    def _leased(self, sql: str, params: tuple, task: QueuedTask) -> bool:
+        cursor = self._connect().execute(f"{sql} WHERE job_id = ? AND lease_token = ?",
+                                         (*params, task.job_id, task.lease_token))
+        return cursor.rowcount > 0
+
+    def extend(self, task: QueuedTask) -> bool:
+        """Push the lease out by another visibility timeout; False if the lease was lost."""
+        return self._leased("UPDATE job_queue SET available_at = ?", (time.time() + self.visibility_timeout,), task)
+
+    def ack(self, task: QueuedTask) -> bool:
+        """Remove a finished job from the queue."""
+        return self._leased("DELETE FROM job_queue", (), task)
+
+    def retry(self, task: QueuedTask, delay: float = QUEUE_RETRY_DELAY) -> bool:
+        """Give up the lease and make the job claimable again after a delay."""
+        return self._leased("UPDATE job_queue SET available_at = ?, lease_token = NULL, lease_owner = NULL",
+                            (time.time() + delay,), task)
+
+
+async def _keep_lease(queue: JobQueue, task: QueuedTask) -> None:
+    while True:
+        await asyncio.sleep(queue.visibility_timeout / 3)
+        if not await asyncio.to_thread(queue.extend, task):
+            logger.warning(f"⚠️ Lost the queue lease on {task.job_id}; it may be processed again")
+            return
+
+
+async def _run_task(queue: JobQueue, task: QueuedTask, handle: Callable[[QueuedTask], Awaitable[None]]) -> None:
+    heartbeat = asyncio.create_task(_keep_lease(queue, task))
+    try:
+        await handle(task)
+    except Exception as e:
+        # The handler acks or retries; anything escaping it is retried once the lease expires
+        logger.error(f"💥 Queued job {task.job_id} failed unexpectedly: {e}")
+    finally:
+        heartbeat.cancel()
+
+
+async def consume(queue: JobQueue, handle: Callable[[QueuedTask], Awaitable[None]], slots: int,
+                  stop: asyncio.Event, poll_interval: float = QUEUE_POLL_INTERVAL) -> None:
+    """
+    Claim jobs and run handle(task) for them, at most `slots` at a time, until stop is
+    set; jobs already running are then awaited. The handler acks or retries each task.
+    """
+    owner = consumer_name()
+    running = set()
+    while not stop.is_set():
+        running = {t for t in running if not t.done()}
+        task = await asyncio.to_thread(queue.claim, owner) if len(running) < slots else None
+        if task is not None:
+            running.add(asyncio.create_task(_run_task(queue, task, handle)))
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+        except asyncio.TimeoutError:
+            pass
+    if running:
+        await asyncio.gather(*running)
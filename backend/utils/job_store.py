@@ -0,0 +1,178 @@
+"""
+Persistent job store
+Job state lives in a SQLite database (WAL mode) instead of a per-process dict, so
+every gunicorn worker sees the same jobs and they survive restarts. Indexed columns
+cover the lookups the API makes (id, user, status, created_at); everything else about
+a job is kept as JSON. The extracted events and the event patch log have their own
+columns, so status polls never load them and small updates never rewrite them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Job fields stored in their own columns; everything else goes into the data JSON
+_INDEXED_FIELDS = ("job_id", "user", "status", "created_at")
+_EVENTS = "events"
+_PATCHES = "event_patches"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    user        TEXT,
+    status      TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    data        TEXT NOT NULL DEFAULT '{}',
+    events      TEXT,
+    patches     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+"""
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+class JobStore:
+    """
+    SQLite-backed job storage shared by all worker processes.
+
+    Each thread (and each forked worker) gets its own connection. Every change is
+    a read-modify-write under the database write lock (see locked()), so concurrent
+    updates from different workers never overwrite each other's fields.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            # isolation_level=None: transactions are explicit (see locked())
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # ------------------------------------------------------------------ rows
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row, with_events: bool) -> Dict[str, Any]:
+        job = json.loads(row["data"])
+        job.update({field: row[field] for field in _INDEXED_FIELDS})
+        if row["patches"] is not None:
+            job[_PATCHES] = json.loads(row["patches"])
+        if with_events and row["events"] is not None:
+            job[_EVENTS] = json.loads(row["events"])
+        return job
+
+    @staticmethod
+    def _split(fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Job fields as column values; data holds the fields without a column of their own."""
+        columns = {field: fields[field] for field in _INDEXED_FIELDS if field in fields}
+        if _EVENTS in fields:
+            columns["events"] = _dumps(fields[_EVENTS])
+        if _PATCHES in fields:
+            columns["patches"] = _dumps(fields[_PATCHES])
+        columns["data"] = {k: v for k, v in fields.items() if k not in _INDEXED_FIELDS and k not in (_EVENTS, _PATCHES)}
+        return columns
+
+    # ------------------------------------------------------------------ API
+
+    def create(self, job: Dict[str, Any]) -> None:
+        columns = self._split(job)
+        self._connect().execute(
+            "INSERT INTO jobs (job_id, user, status, created_at, updated_at, data, events, patches) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (columns["job_id"], columns.get("user"), columns["status"], columns["created_at"],
+             datetime.now().isoformat(), _dumps(columns["data"]), columns.get("events"), columns.get("patches"))
+        )
+
+    def get(self, job_id: str, with_events: bool = True) -> Optional[Dict[str, Any]]:
+        """A job as a dict (None when unknown); with_events=False skips the extracted events."""
+        columns = "*" if with_events else "job_id, user, status, created_at, data, patches"
+        row = self._connect().execute(f"SELECT {columns} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row, with_events) if row else None
+
+    def events(self, job_id: str) -> List[Dict[str, Any]]:
+        """Only the extracted events of a job."""
+        row = self._connect().execute("SELECT events FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row["events"]) if row and row["events"] is not None else []
+
+    def update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        """Merge fields into a job, like dict.update on the in-memory job."""
+        with self.locked(job_id) as job:
+            if job is not None:
+                job.update(fields)
+
+    @contextmanager
+    def locked(self, job_id: str) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        Read-modify-write one job atomically across workers. Yields the job (without
+        its extracted events unless they are set, None when unknown) under the write
+        lock; changes to the dict are saved on exit and discarded if the block raises.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = self.get(job_id, with_events=False)
+            before = _dumps(job)
+            yield job
+            if job is not None and _dumps(job) != before:
+                self._write(conn, job)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _write(self, conn: sqlite3.Connection, job: Dict[str, Any]) -> None:
+        columns = self._split(job)
+        assignments = ["user = ?", "status = ?", "updated_at = ?", "data = ?", "patches = ?"]
+        values = [columns.get("user"), columns["status"], datetime.now().isoformat(),
+                  _dumps(columns["data"]), columns.get("patches")]
+        if "events" in columns:
+            assignments.append("events = ?")
+            values.append(columns["events"])
+        conn.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE job_id = ?", (*values, job["job_id"]))
+
+    def list(self, user: Optional[str] = None, status: Optional[str] = None,
+             limit: Optional[int] = None, newest_first: bool = False) -> List[Dict[str, Any]]:
+        """Jobs oldest (or newest) first, without events or patches, optionally filtered by user and status."""
+        clauses, params = [], []
+        if user is not None:
+            clauses.append("user = ?")
+            params.append(user)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        query = "SELECT job_id, user, status, created_at, data, NULL AS patches FROM jobs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at DESC" if newest_first else " ORDER BY created_at"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return [self._row_to_job(row, False) for row in self._connect().execute(query, params)]
+
+    def delete(self, job_id: str) -> None:
+        self._connect().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def __contains__(self, job_id: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone() is not None
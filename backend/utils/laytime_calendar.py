@@ -0,0 +1,152 @@
+"""
+Calendar-aware laytime exclusions
+Turns charter party terms (SHINC, SHEX, SSHEX, FHEX, weather working days) into
+precomputed exclusion intervals per port and year. The masks are cached, so
+recalculating laytime while events are being edited never rebuilds them.
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from utils.laytime_intervals import merge_intervals
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from laytime_intervals import merge_intervals
+
+# Terms code -> (excluded weekdays with Monday=0, holidays excluded)
+TERMS_RULES = {
+    "SHINC": ((), False),        # Sundays and holidays included
+    "SHEX": ((6,), True),        # Sundays and holidays excepted
+    "SSHEX": ((5, 6), True),     # Saturdays, Sundays and holidays excepted
+    "SATSHEX": ((5, 6), True),
+    "FHEX": ((4,), True),        # Fridays and holidays excepted
+}
+
+# WIBON (whether in berth or not) is about berth availability, not weather
+_WEATHER_TOKENS = ("WWD", "WEATHER")
+_WEATHER_EVENT_RE = r"\b(?:rain|raining|weather|swell|storm|wind|fog|thunder|lightning)\b"
+_WEATHER_EVENT_PATTERN = re.compile(_WEATHER_EVENT_RE, re.IGNORECASE)
+
+_NS_PER_DAY = 24 * 3600 * 1_000_000_000
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class LaytimeTerms:
+    code: str = "SHINC"
+    excluded_weekdays: Tuple[int, ...] = ()
+    holidays_excluded: bool = False
+    weather_excluded: bool = False
+
+    @property
+    def excludes_anything(self) -> bool:
+        return bool(self.excluded_weekdays or self.holidays_excluded or self.weather_excluded)
+
+    def describe(self) -> str:
+        names = ["Mondays", "Tuesdays", "Wednesdays", "Thursdays", "Fridays", "Saturdays", "Sundays"]
+        parts = [names[d] for d in self.excluded_weekdays]
+        if self.holidays_excluded:
+            parts.append("holidays")
+        if self.weather_excluded:
+            parts.append("weather stoppages")
+        if not parts:
+            return self.code
+        listed = parts[0] if len(parts) == 1 else f"{', '.join(parts[:-1])} and {parts[-1]}"
+        return f"{self.code} ({listed} excluded)"
+
+
+def parse_laytime_terms(summary: Dict[str, Any]) -> LaytimeTerms:
+    """Read the laytime terms (e.g. 'SHEX WWD') from a voyage summary; SHINC when absent."""
+    raw = str(summary.get("LAYTIME TERMS") or summary.get("TERMS") or "").upper()
+    tokens = re.findall(r"[A-Z]+", raw)
+
+    code = next((token for token in tokens if token in TERMS_RULES), "SHINC")
+    weekdays, holidays = TERMS_RULES[code]
+    weather = any(token in _WEATHER_TOKENS for token in tokens)
+    return LaytimeTerms(code=code, excluded_weekdays=weekdays, holidays_excluded=holidays, weather_excluded=weather)
+
+
+@lru_cache(maxsize=4)
+def _load_port_holidays(path: str) -> Dict[str, Tuple[str, ...]]:
+    """Port -> holiday dates from the LAYTIME_HOLIDAYS_FILE JSON ({"PORT": ["2024-08-15", ...]})."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {str(port).strip().upper(): tuple(str(d) for d in dates) for port, dates in data.items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def port_holidays(port: Optional[str]) -> Tuple[str, ...]:
+    """Configured holiday dates for a port (empty when none are configured)."""
+    path = os.getenv("LAYTIME_HOLIDAYS_FILE")
+    if not path or not port:
+        return ()
+    return _load_port_holidays(path).get(str(port).strip().upper(), ())
+
+
+def _parse_holidays(value: Any) -> Tuple[str, ...]:
+    """Holiday dates given in the summary as a list or a comma/semicolon separated string."""
+    if not value:
+        return ()
+    items = value if isinstance(value, (list, tuple)) else re.split(r"[,;\n]", str(value))
+    parsed = pd.to_datetime(pd.Series([str(item).strip() for item in items if str(item).strip()]), errors="coerce")
+    return tuple(sorted(d.strftime("%Y-%m-%d") for d in parsed.dropna()))
+
+
+@lru_cache(maxsize=512)
+def calendar_mask(port: str, year: int, excluded_weekdays: Tuple[int, ...],
+                  holidays: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Excluded [start, end) intervals in int64 nanoseconds for one port and year.
+
+    Consecutive excluded days are merged, so a SSHEX weekend is a single interval.
+    The returned arrays are cached and read-only.
+    """
+    days = np.arange(np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01"), dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday; shift so that Monday == 0
+    weekdays = (days.astype(np.int64) + 3) % 7
+    excluded = np.isin(weekdays, excluded_weekdays)
+    if holidays:
+        excluded |= np.isin(days, np.array(holidays, dtype="datetime64[D]"))
+
+    day_starts = days[excluded].astype("datetime64[ns]").astype(np.int64)
+    starts, ends = merge_intervals(day_starts, day_starts + _NS_PER_DAY)
+    starts.flags.writeable = False
+    ends.flags.writeable = False
+    return starts, ends
+
+
+def calendar_exclusions(terms: LaytimeTerms, summary: Dict[str, Any],
+                        start_ns: int, end_ns: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Calendar exclusion intervals covering [start_ns, end_ns) under the given terms."""
+    if not (terms.excluded_weekdays or terms.holidays_excluded) or end_ns <= start_ns:
+        return _EMPTY, _EMPTY
+
+    port = str(summary.get("PORT") or "").strip().upper()
+    holidays: Tuple[str, ...] = ()
+    if terms.holidays_excluded:
+        holidays = tuple(sorted(set(port_holidays(port)) | set(_parse_holidays(summary.get("HOLIDAYS")))))
+
+    first_year = pd.Timestamp(start_ns).year
+    last_year = pd.Timestamp(end_ns).year
+    masks = [calendar_mask(port, year, terms.excluded_weekdays, holidays) for year in range(first_year, last_year + 1)]
+    return np.concatenate([m[0] for m in masks]), np.concatenate([m[1] for m in masks])
+
+
+def weather_event_mask(labels: Iterable[Any]) -> np.ndarray:
+    """Rows whose event text describes a weather stoppage (rain, swell, storm...)."""
+    text = pd.Series(list(labels), dtype=object).fillna("").astype(str)
+    return text.str.contains(_WEATHER_EVENT_RE, case=False, regex=True).to_numpy(dtype=bool)
+
+
+def is_weather_event(label: Any) -> bool:
+    """Single-event form of weather_event_mask."""
+    return label is not None and not pd.isna(label) and bool(_WEATHER_EVENT_PATTERN.search(str(label)))
@@ -0,0 +1,124 @@
+"""
+Interval arithmetic for laytime calculation
+Sorts and merges time intervals on int64 nanosecond numpy arrays in O(n log n),
+so overlapping events (parallel hatches, discharge inside a preparation period)
+are never counted twice and exclusions are subtracted exactly once.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 24 * 3600 * 1_000_000_000
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge [start, end) intervals into sorted, disjoint intervals. Empty ones are dropped."""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    keep = ends > starts
+    if not keep.any():
+        return _EMPTY, _EMPTY
+
+    starts, ends = starts[keep], ends[keep]
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+
+    # A new merged interval begins wherever the start lies beyond every earlier end
+    reach = np.maximum.accumulate(ends)
+    new_group = np.empty(len(starts), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = starts[1:] > reach[:-1]
+
+    group_ids = np.cumsum(new_group) - 1
+    merged_starts = starts[new_group]
+    merged_ends = np.zeros(len(merged_starts), dtype=np.int64)
+    np.maximum.at(merged_ends, group_ids, ends)
+    return merged_starts, merged_ends
+
+
+def union_length(starts: np.ndarray, ends: np.ndarray) -> int:
+    """Total length covered by the union of the intervals."""
+    merged_starts, merged_ends = merge_intervals(starts, ends)
+    return int((merged_ends - merged_starts).sum())
+
+
+def covered_within(starts: np.ndarray, ends: np.ndarray,
+                   merged_starts: np.ndarray, merged_ends: np.ndarray) -> np.ndarray:
+    """For each query [start, end), the length also covered by the merged intervals."""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(merged_starts) == 0 or len(starts) == 0:
+        return np.zeros(len(starts), dtype=np.int64)
+
+    lengths = merged_ends - merged_starts
+    covered_before = np.concatenate(([0], np.cumsum(lengths)))
+
+    def covered_up_to(points: np.ndarray) -> np.ndarray:
+        idx = np.searchsorted(merged_starts, points, side="right") - 1
+        safe_idx = np.clip(idx, 0, None)
+        partial = np.clip(points - merged_starts[safe_idx], 0, lengths[safe_idx])
+        return np.where(idx >= 0, covered_before[safe_idx] + partial, 0)
+
+    return np.clip(covered_up_to(ends) - covered_up_to(starts), 0, None)
+
+
+def attribute_intervals(starts: np.ndarray, ends: np.ndarray,
+                        exclusion_starts: Optional[np.ndarray] = None,
+                        exclusion_ends: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split each interval's duration into counted, overlapping and excluded parts.
+
+    Intervals are walked in start order; time already covered by an earlier interval
+    is reported as overlap, and the remaining time that falls inside the exclusion
+    union is reported as excluded. The counted parts sum to the union of the
+    intervals minus the union of the exclusions.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    n = len(starts)
+    counted = np.zeros(n, dtype=np.int64)
+    overlap = np.zeros(n, dtype=np.int64)
+    excluded = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        return counted, overlap, excluded
+
+    durations = np.clip(ends - starts, 0, None)
+    order = np.argsort(starts, kind="stable")
+    sorted_starts, sorted_ends = starts[order], ends[order]
+
+    # Furthest end reached by any interval that started earlier
+    reach_before = np.empty(n, dtype=np.int64)
+    reach_before[0] = np.iinfo(np.int64).min
+    if n > 1:
+        reach_before[1:] = np.maximum.accumulate(sorted_ends)[:-1]
+
+    own_starts = np.maximum(sorted_starts, reach_before)
+    own_ends = np.maximum(own_starts, sorted_ends)
+    own_lengths = own_ends - own_starts
+
+    if exclusion_starts is not None and len(exclusion_starts):
+        merged_starts, merged_ends = merge_intervals(exclusion_starts, exclusion_ends)
+        own_excluded = covered_within(own_starts, own_ends, merged_starts, merged_ends)
+    else:
+        own_excluded = np.zeros(n, dtype=np.int64)
+
+    counted[order] = own_lengths - own_excluded
+    excluded[order] = own_excluded
+    overlap[order] = durations[order] - own_lengths
+    return counted, overlap, excluded
+
+
+def attribution_table(index: pd.Index, labels: pd.Series, counts: np.ndarray,
+                      counted_ns: np.ndarray, overlap_ns: np.ndarray, excluded_ns: np.ndarray) -> pd.DataFrame:
+    """Per-event attribution of laytime, in days."""
+    return pd.DataFrame({
+        "event": labels.to_numpy(),
+        "laytime_counts": counts,
+        "counted_days": counted_ns / NS_PER_DAY,
+        "overlap_days": overlap_ns / NS_PER_DAY,
+        "excluded_days": excluded_ns / NS_PER_DAY,
+    }, index=index)
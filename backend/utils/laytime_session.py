@@ -0,0 +1,257 @@
+"""
+Incremental laytime sessions
+Keeps a job's events in a sparse segment tree over int64 nanoseconds so that adding,
+editing or deleting one event updates consumed time, demurrage and dispatch with a
+single O(log U) tree update instead of rebuilding and reparsing the whole DataFrame.
+"""
+
+import itertools
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from utils.sof_pipeline import safe_float, laytime_flags
+    from utils.laytime_calendar import parse_laytime_terms, calendar_exclusions, is_weather_event
+    from utils.laytime_intervals import NS_PER_DAY
+    from utils.event_patches import validate_operations
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from sof_pipeline import safe_float, laytime_flags
+    from laytime_calendar import parse_laytime_terms, calendar_exclusions, is_weather_event
+    from laytime_intervals import NS_PER_DAY
+    from event_patches import validate_operations
+
+_COUNTED = 0
+_EXCLUDED = 1
+
+
+def _to_ns(value: Any) -> Optional[int]:
+    """A start/end value as int64 nanoseconds, or None when missing or unparseable."""
+    if value is None or value == "":
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        ts = pd.to_datetime(value, errors="coerce")
+    if ts is None or pd.isna(ts):
+        return None
+    return int(ts.value)
+
+
+class _CoverageTree:
+    """
+    Sparse segment tree over [-2^63, 2^63) tracking two interval multisets:
+    counted laytime (C) and exclusions (E).
+
+    Each node keeps how many intervals cover it entirely, plus the length of its
+    range covered by C, by E and by both. The root therefore answers
+    |union(C) minus union(E)| = len_c - len_ce in O(1), and every insert or
+    removal touches O(log U) nodes (64 levels for nanosecond timestamps).
+    """
+
+    def __init__(self, lo: int = -(1 << 63), hi: int = 1 << 63):
+        self._lo, self._hi = lo, hi
+        # Node 0 is an empty sentinel child; node 1 is the root
+        self._left = [0, 0]
+        self._right = [0, 0]
+        self._cover = ([0, 0], [0, 0])
+        self._len_c = [0, 0]
+        self._len_e = [0, 0]
+        self._len_ce = [0, 0]
+
+    def _new_node(self) -> int:
+        self._left.append(0)
+        self._right.append(0)
+        self._cover[_COUNTED].append(0)
+        self._cover[_EXCLUDED].append(0)
+        self._len_c.append(0)
+        self._len_e.append(0)
+        self._len_ce.append(0)
+        return len(self._left) - 1
+
+    def add(self, kind: int, start: int, end: int, delta: int = 1) -> None:
+        """Insert (delta=1) or remove (delta=-1) the [start, end) interval of the given kind."""
+        if end > start:
+            self._update(1, self._lo, self._hi, start, end, kind, delta)
+
+    def _update(self, node: int, lo: int, hi: int, start: int, end: int, kind: int, delta: int) -> None:
+        if start <= lo and hi <= end:
+            self._cover[kind][node] += delta
+        else:
+            mid = (lo + hi) // 2
+            if start < mid:
+                if not self._left[node]:
+                    self._left[node] = self._new_node()
+                self._update(self._left[node], lo, mid, start, end, kind, delta)
+            if end > mid:
+                if not self._right[node]:
+                    self._right[node] = self._new_node()
+                self._update(self._right[node], mid, hi, start, end, kind, delta)
+        self._pull(node, hi - lo)
+
+    def _pull(self, node: int, size: int) -> None:
+        left, right = self._left[node], self._right[node]
+        sub_c = self._len_c[left] + self._len_c[right]
+        sub_e = self._len_e[left] + self._len_e[right]
+        sub_ce = self._len_ce[left] + self._len_ce[right]
+        covered_c = self._cover[_COUNTED][node] > 0
+        covered_e = self._cover[_EXCLUDED][node] > 0
+
+        if covered_c and covered_e:
+            self._len_c[node] = self._len_e[node] = self._len_ce[node] = size
+        elif covered_c:
+            self._len_c[node], self._len_e[node], self._len_ce[node] = size, sub_e, sub_e
+        elif covered_e:
+            self._len_c[node], self._len_e[node], self._len_ce[node] = sub_c, size, sub_c
+        else:
+            self._len_c[node], self._len_e[node], self._len_ce[node] = sub_c, sub_e, sub_ce
+
+    @property
+    def counted_ns(self) -> int:
+        return self._len_c[1] - self._len_ce[1]
+
+    @property
+    def overlap_free_ns(self) -> int:
+        """Union length of the counted intervals before exclusions."""
+        return self._len_c[1]
+
+
+class LaytimeSession:
+    """
+    Stateful laytime calculation for one job.
+
+    Events are classified exactly as in calculate_laytime: an event with a positive
+    duration counts when laytime_counts is True, and is an exclusion when it is flagged
+    laytime_excluded or (under weather terms) describes a weather stoppage. Calendar
+    exclusions (SHEX Sundays, holidays...) are added per year as counting events reach it.
+    """
+
+    def __init__(self, summary: Dict[str, Any], events: Iterable[Dict[str, Any]]):
+        self.summary = dict(summary or {})
+        self.terms = parse_laytime_terms(self.summary)
+        self.allowed_days = 0.0
+        load_disch_rate = safe_float(self.summary.get('LOAD/DISCH', 0))
+        if load_disch_rate > 0:
+            self.allowed_days = safe_float(self.summary.get('CARGO QTY', 0)) / load_disch_rate
+        self.demurrage_rate = safe_float(self.summary.get('DEMURRAGE', 0))
+        self.dispatch_rate = safe_float(self.summary.get('DISPATCH', 0))
+
+        self.version = 0
+        self._tree = _CoverageTree()
+        self._events: Dict[str, Dict[str, Any]] = {}
+        self._placed: Dict[str, Tuple[Optional[int], int, int]] = {}
+        self._calendar_years = set()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        # Events may carry their job-level event_id (see utils.event_patches)
+        for event in events:
+            event = dict(event)
+            event_id = event.pop('event_id', None)
+            self._insert(str(event_id) if event_id is not None else str(next(self._ids)), event)
+        numeric_ids = [int(event_id) for event_id in self._events if event_id.isdigit()]
+        self._ids = itertools.count(max(numeric_ids, default=-1) + 1)
+
+    # ------------------------------------------------------------------ events
+
+    def _classify(self, event: Dict[str, Any]) -> Tuple[Optional[int], int, int]:
+        start_ns, end_ns = _to_ns(event.get('start_time_iso')), _to_ns(event.get('end_time_iso'))
+        if start_ns is None or end_ns is None or end_ns <= start_ns:
+            return None, 0, 0
+
+        label = event.get('Event', event.get('event'))
+        counts, excluded = laytime_flags((event.get('laytime_counts'), event.get('laytime_excluded')))
+        if not excluded and self.terms.weather_excluded:
+            excluded = is_weather_event(label)
+        if excluded:
+            return _EXCLUDED, start_ns, end_ns
+        if counts:
+            return _COUNTED, start_ns, end_ns
+        return None, start_ns, end_ns
+
+    def _ensure_calendar(self, start_ns: int, end_ns: int) -> None:
+        if not (self.terms.excluded_weekdays or self.terms.holidays_excluded):
+            return
+        for year in range(pd.Timestamp(start_ns).year, pd.Timestamp(end_ns).year + 1):
+            if year in self._calendar_years:
+                continue
+            self._calendar_years.add(year)
+            year_start = pd.Timestamp(year=year, month=1, day=1).value
+            year_end = pd.Timestamp(year=year, month=12, day=31, hour=23).value
+            for start, end in zip(*calendar_exclusions(self.terms, self.summary, year_start, year_end)):
+                self._tree.add(_EXCLUDED, int(start), int(end))
+
+    def _insert(self, event_id: str, event: Dict[str, Any]) -> None:
+        if event_id in self._placed:
+            self._unplace(event_id)
+        kind, start_ns, end_ns = self._classify(event)
+        if kind is not None:
+            if kind == _COUNTED:
+                self._ensure_calendar(start_ns, end_ns)
+            self._tree.add(kind, start_ns, end_ns)
+        self._events[event_id] = event
+        self._placed[event_id] = (kind, start_ns, end_ns)
+
+    def _unplace(self, event_id: str) -> None:
+        kind, start_ns, end_ns = self._placed.pop(event_id)
+        if kind is not None:
+            self._tree.add(kind, start_ns, end_ns, delta=-1)
+
+    def apply(self, operations: List[Dict[str, Any]]) -> List[str]:
+        """
+        Apply add/update/delete operations in order and return the affected event ids.
+
+        {"op": "add", "event": {...}}                 (optionally with the event_id to use)
+        {"op": "update", "event_id": "3", "event": {changed fields}}
+        {"op": "delete", "event_id": "3"}
+        """
+        with self._lock:
+            validate_operations(set(self._events), operations)
+            affected = []
+            for operation in operations:
+                op = operation.get('op')
+                event_id = operation.get('event_id')
+                if op == 'add':
+                    event_id = str(event_id) if event_id is not None else str(next(self._ids))
+                    self._insert(event_id, dict(operation.get('event') or {}))
+                else:
+                    event_id = str(event_id)
+                    self._unplace(event_id)
+                    if op == 'update':
+                        self._insert(event_id, {**self._events[event_id], **(operation.get('event') or {})})
+                    else:
+                        del self._events[event_id]
+                affected.append(event_id)
+            self.version += 1
+            return affected
+
+    # ------------------------------------------------------------------ totals
+
+    def totals(self) -> Dict[str, Any]:
+        """Consumed laytime and the resulting demurrage or dispatch."""
+        with self._lock:
+            counted_ns, union_ns, event_count = self._tree.counted_ns, self._tree.overlap_free_ns, len(self._events)
+        consumed_days = (counted_ns / 1e9) / (24 * 3600)
+        time_diff = consumed_days - self.allowed_days
+        if time_diff > 0:
+            demurrage_due, dispatch_due, saved_days = time_diff * self.demurrage_rate, 0, 0
+        else:
+            saved_days = abs(time_diff)
+            demurrage_due, dispatch_due = 0, saved_days * self.dispatch_rate
+        return {
+            "version": self.version,
+            "event_count": event_count,
+            "laytime_allowed_days": self.allowed_days,
+            "laytime_consumed_days": consumed_days,
+            "laytime_saved_days": saved_days,
+            "demurrage_due": demurrage_due,
+            "dispatch_due": dispatch_due,
+            "excluded_days": (union_ns - counted_ns) / NS_PER_DAY,
+            "laytime_terms": self.terms.describe(),
+        }
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Current events with their session ids, in insertion order."""
+        with self._lock:
+            return [{"event_id": event_id, **event} for event_id, event in self._events.items()]
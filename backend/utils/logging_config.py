@@ -0,0 +1,99 @@
+"""
+Logging setup
+One configuration for the API, queue workers and pipeline worker processes:
+
+    LOG_LEVEL=INFO         DEBUG adds per-page OCR, per-event parsing and raw Gemini output
+    LOG_FORMAT=text        "json" writes one JSON object per line (time, level, logger, message,
+                           the job being processed and any extra= fields)
+    LOG_SAMPLE_EVERY=1     keep only every Nth record below WARNING from each call site
+
+The pipeline logs with lazy %-style arguments, so records below the level cost a
+level check and are never formatted.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+try:
+    from utils.tracing import current_trace
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from tracing import current_trace
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 1))
+
+# Libraries that are very chatty at DEBUG (pdfminer logs every PDF token)
+_QUIET_LOGGERS = ("pdfminer", "PIL", "urllib3", "httpcore", "httpx", "multipart", "grpc")
+
+# Attributes of every LogRecord; anything else was passed with extra= and goes into JSON output
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with the job whose pipeline logged it (from the active
+    trace) and the fields passed as extra= alongside the message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace = current_trace()
+        if trace is not None and "job_id" in trace.attrs:
+            entry["job_id"] = trace.attrs["job_id"]
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SampleFilter(logging.Filter):
+    """Pass one in every `every` records below WARNING from the same call site."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self._seen = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every <= 1 or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            seen = self._seen[(record.pathname, record.lineno)]
+            self._seen[(record.pathname, record.lineno)] = seen + 1
+        return seen % self.every == 0
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    Set up the root logger from LOG_LEVEL, LOG_FORMAT and LOG_SAMPLE_EVERY. Like
+    logging.basicConfig, this leaves a root logger that already has handlers alone
+    apart from its level, so a host application's setup wins.
+    """
+    level = logging.getLevelName(level or LOG_LEVEL)
+    if not isinstance(level, int):
+        level = logging.INFO
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        if LOG_FORMAT == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        if LOG_SAMPLE_EVERY > 1:
+            handler.addFilter(SampleFilter(LOG_SAMPLE_EVERY))
+        root.addHandler(handler)
+    root.setLevel(level)
+    for name in _QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.WARNING))
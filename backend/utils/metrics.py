@@ -0,0 +1,130 @@
+"""
+Prometheus metrics
+Counters and histograms for the API and pipeline hot paths, served by /metrics when
+prometheus_client is installed (every metric is a no-op otherwise). Pipeline stages run
+in worker processes, so their timings reach the API with each job's trace and are
+observed here by observe_trace(); spans recorded outside a job (laytime calculations
+in API requests) are observed as they happen. Set PROMETHEUS_MULTIPROC_DIR to aggregate
+metrics across gunicorn workers and worker.py processes.
+"""
+
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+try:
+    from utils.tracing import add_listener
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from tracing import add_listener
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+MULTIPROCESS = PROMETHEUS_AVAILABLE and bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+def _histogram(name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=None):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Histogram(name, documentation, labels, buckets=buckets or _SECONDS)
+
+
+def _counter(name: str, documentation: str, labels: Tuple[str, ...] = ()):
+    return Counter(name, documentation, labels) if PROMETHEUS_AVAILABLE else _NoopMetric()
+
+
+def _gauge(name: str, documentation: str, multiprocess_mode: str):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Gauge(name, documentation, **({"multiprocess_mode": multiprocess_mode} if MULTIPROCESS else {}))
+
+
+_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+_BYTES = (1e4, 5e4, 1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7)
+
+HTTP_REQUEST_SECONDS = _histogram("sof_http_request_seconds", "API request latency", ("method", "route", "status"))
+UPLOAD_BYTES = _histogram("sof_upload_bytes", "Size of uploaded files", ("file_type",), _BYTES)
+JOB_SECONDS = _histogram("sof_job_seconds", "Pipeline run time per job", ("file_type",))
+JOBS_TOTAL = _counter("sof_jobs_total", "Processed job attempts by outcome", ("outcome",))
+STAGE_SECONDS = _histogram("sof_stage_seconds", "Time per pipeline stage call (ingest, pdf_extract, link_events, laytime, ...)",
+                           ("stage",))
+OCR_PAGE_SECONDS = _histogram("sof_ocr_page_seconds", "OCR time per page image", ("path",))
+OCR_METHOD_SECONDS = _histogram("sof_ocr_method_seconds", "Time per OCR method within one page", ("method",))
+GEMINI_SECONDS = _histogram("sof_gemini_request_seconds", "Gemini request latency", ("kind",))
+GEMINI_REQUESTS = _counter("sof_gemini_requests_total", "Gemini requests by outcome", ("kind", "outcome"))
+GEMINI_TOKENS = _counter("sof_gemini_tokens_total", "Gemini tokens", ("kind", "direction"))
+QUEUE_DEPTH = _gauge("sof_queue_depth", "Jobs waiting or running in the queue", "max")
+QUEUE_RUNNING = _gauge("sof_queue_running", "Queued jobs currently leased by a worker", "max")
+JOBS_IN_PROGRESS = _gauge("sof_jobs_in_progress", "Jobs being processed by this process's queue consumers", "livesum")
+
+
+def job_file_type(filenames: Iterable[str]) -> str:
+    """The file extension shared by a job's files, or "mixed"."""
+    types = {os.path.splitext(name)[1].lower().lstrip(".") or "none" for name in filenames}
+    return types.pop() if len(types) == 1 else "mixed"
+
+
+def observe_span(name: str, seconds: float, attrs: Dict[str, Any]) -> None:
+    """Record one pipeline span in the histogram for its kind."""
+    if name.startswith("gemini."):
+        kind = name.split(".", 1)[1]
+        GEMINI_SECONDS.labels(kind).observe(seconds)
+        GEMINI_REQUESTS.labels(kind, "error" if attrs.get("errors") else "ok").inc()
+        for direction in ("prompt", "output"):
+            if attrs.get(f"{direction}_tokens"):
+                GEMINI_TOKENS.labels(kind, direction).inc(attrs[f"{direction}_tokens"])
+    elif name in ("ocr", "ocr_enhanced"):
+        OCR_PAGE_SECONDS.labels(name).observe(seconds)
+    elif name.startswith("ocr."):
+        OCR_METHOD_SECONDS.labels(name.split(".", 1)[1]).observe(seconds)
+    else:
+        STAGE_SECONDS.labels(name).observe(seconds)
+
+
+def observe_trace(trace: Optional[Dict[str, Any]], filenames: Iterable[str]) -> None:
+    """Record a finished job's pipeline trace (see utils/tracing.py)."""
+    if not PROMETHEUS_AVAILABLE or not trace:
+        return
+    JOB_SECONDS.labels(job_file_type(filenames)).observe(trace["seconds"])
+    for span in trace.get("spans", []):
+        observe_span(span["name"], span["seconds"], span)
+
+
+def _observe_untraced(name: str, seconds: float, attrs: Dict[str, Any], in_trace: bool) -> None:
+    # Spans inside a job's trace are observed with the trace when the job finishes
+    if not in_trace:
+        observe_span(name, seconds, attrs)
+
+
+if PROMETHEUS_AVAILABLE:
+    add_listener(_observe_untraced)
+
+
+def render_metrics() -> bytes:
+    """The metrics in the Prometheus text format (aggregated across processes in multiprocess mode)."""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
@@ -21,6 +21,10 @@ from sof_pipeline import (
     LaytimeResult,
     process_clicked_pdf_enhanced,  # NEW: Clicked PDF processing
 )
+from logging_config import configure_logging
+
+# Pipeline progress is logged (LOG_LEVEL=DEBUG shows every OCR method and parsed event)
+configure_logging()
 
 # Load .env if present
 try:
@@ -0,0 +1,314 @@
+"""
+Pipeline executor
+Runs document processing (PDF parsing, OCR, Gemini calls) outside the API's event loop,
+in a pool of worker processes by default. A job's outcome is returned to the API process,
+which records it in the job store, so /health, status polls and logins stay responsive
+while heavy scans are being processed.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from utils.sof_pipeline import (
+        process_uploaded_files, extract_events_and_summary, extract_summary, process_clicked_pdf_enhanced
+    )
+    from utils.result_store import event_records, save_events
+    from utils.job_progress import ProgressReporter
+    from utils.tracing import Trace, bind
+    from utils.profiling import profile_job
+    from utils.logging_config import configure_logging
+    from utils.upload_sessions import wait_for_file
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from sof_pipeline import (
+        process_uploaded_files, extract_events_and_summary, extract_summary, process_clicked_pdf_enhanced
+    )
+    from result_store import event_records, save_events
+    from job_progress import ProgressReporter
+    from tracing import Trace, bind
+    from profiling import profile_job
+    from logging_config import configure_logging
+    from upload_sessions import wait_for_file
+
+# "process" (default) isolates CPU-bound OCR in worker processes; "thread" keeps everything in one process
+PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "process").lower()
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 2))
+# Files of one job processed at the same time, each through its own pipeline
+PIPELINE_FILE_THREADS = int(os.getenv("PIPELINE_FILE_THREADS", 4))
+# Worker processes are spawned, not forked: the gRPC client behind Gemini is not fork-safe
+PIPELINE_START_METHOD = os.getenv("PIPELINE_START_METHOD", "spawn")
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+
+
+# An uploaded file on disk; the pipeline parses it from its path (see process_uploaded_files)
+class StoredFile:
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+
+
+def _init_worker() -> None:
+    configure_logging()
+
+
+def pipeline_executor() -> Executor:
+    """The shared pipeline executor, created on first use (and again after a worker crash)."""
+    global _executor
+    if _executor is None:
+        if PIPELINE_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="sof-pipeline")
+        else:
+            _executor = ProcessPoolExecutor(
+                max_workers=PIPELINE_WORKERS,
+                mp_context=multiprocessing.get_context(PIPELINE_START_METHOD),
+                initializer=_init_worker
+            )
+    return _executor
+
+
+def reset_pipeline_executor() -> None:
+    """Drop a broken pool (a worker process died) so the next job starts a fresh one."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def shutdown_pipeline_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+class _BatchResults:
+    """
+    Per-file outcomes of a job as its files finish in any order. Each file's events are
+    linked by its own pipeline (events never link across files), so merging is just
+    ordering the finished files' events by filename, as the batch pipeline sorts them.
+    With a job store, every change is published on the job right away.
+    """
+
+    def __init__(self, job_id: str, file_paths_and_names: List[Tuple[str, str]], store=None):
+        self.job_id = job_id
+        self.store = store
+        self.file_status = [{"filename": filename, "status": "queued", "events": 0, "error": None}
+                            for _, filename in file_paths_and_names]
+        self.frames: Dict[int, pd.DataFrame] = {}
+        self.records: Dict[int, List[Dict[str, Any]]] = {}
+        self.summaries: Dict[int, Dict[str, Any]] = {}
+        self.docs: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def _order(self) -> List[int]:
+        return sorted(self.records, key=lambda index: (self.file_status[index]["filename"], index))
+
+    def events(self) -> List[Dict[str, Any]]:
+        return [event for index in self._order() for event in self.records[index]]
+
+    def events_frame(self) -> pd.DataFrame:
+        frames = [self.frames[index] for index in self._order() if not self.frames[index].empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def started(self, index: int) -> None:
+        with self._lock:
+            self.file_status[index]["status"] = "processing"
+            self._publish(with_events=False)
+
+    def completed(self, index: int, events_df: pd.DataFrame, summary: Dict[str, Any], docs: list) -> None:
+        records = event_records(events_df)
+        with self._lock:
+            self.frames[index], self.records[index] = events_df, records
+            self.summaries[index], self.docs[index] = summary, docs
+            self.file_status[index].update(status="completed", events=len(records),
+                                           finished_at=datetime.now().isoformat())
+            self._publish()
+
+    def failed(self, index: int, error: Exception) -> None:
+        with self._lock:
+            self.file_status[index].update(status="failed", error=str(error), finished_at=datetime.now().isoformat())
+            self._publish(with_events=False)
+
+    def _publish(self, with_events: bool = True) -> None:
+        if self.store is None:
+            return
+        fields = {"file_status": self.file_status}
+        if with_events:
+            fields["events"] = self.events()
+        try:
+            self.store.update(self.job_id, fields)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not publish partial results for {self.job_id}: {e}")
+
+
+def _process_file(file_path: str, filename: str, enhanced: bool, gemini_api_key: str,
+                  summarize: bool, progress) -> Tuple[pd.DataFrame, Dict[str, Any], list]:
+    """One file's own pipeline: ingest, OCR, LLM extraction and linking. Raises when it fails."""
+    logger.info(f"📄 Processing file: {filename}")
+
+    if enhanced and filename.lower().endswith('.pdf'):
+        # Use specialized clicked PDF processing (only for single PDF files)
+        logger.info("🎯 Using enhanced clicked PDF processing")
+
+        if not gemini_api_key:
+            raise Exception("Enhanced processing requires Google API key")
+
+        events_df, summary_data = process_clicked_pdf_enhanced(file_path, filename, gemini_api_key, progress)
+        return events_df, summary_data, []
+
+    docs = process_uploaded_files([StoredFile(file_path, filename)], progress)
+    if not docs:
+        raise Exception("No text could be extracted")
+    if not gemini_api_key:
+        # Fallback without Gemini
+        logger.warning(f"⚠️ No Gemini API key - text extraction only for {filename}")
+        return pd.DataFrame(), {}, docs
+
+    events_df, summary_data = extract_events_and_summary(docs, gemini_api_key, progress, summarize=summarize)
+    return events_df, summary_data, docs
+
+
+def run_pipeline(job_id: str, file_paths_and_names: List[Tuple[str, str]], use_enhanced_processing: bool,
+                 results_dir: str, job_db_path: Optional[str] = None, profile: bool = False) -> Dict[str, Any]:
+    """
+    Process a job's documents and write its result files; runs inside the executor.
+    Each file goes through its own pipeline (up to PIPELINE_FILE_THREADS at a time), so a
+    slow scan does not hold up the others; files of a resumable upload that are still
+    arriving are waited for. With job_db_path, progress and each file's
+    events and status are recorded on the job in that job store as soon as they are ready.
+    Returns the fields to record on the completed job, including the run's trace
+    (time, pages, bytes and tokens per stage, and peak memory). With profile, the run is
+    also sampled and its allocations traced (see utils/profiling.py); "profile_files"
+    then holds the report paths.
+    """
+    trace = Trace("pipeline", job_id=job_id, files=len(file_paths_and_names), enhanced=use_enhanced_processing)
+    profiler = profile_job(Path(results_dir), job_id) if profile else nullcontext(None)
+    with profiler as profile_files, trace.activate():
+        outcome = _run_pipeline(job_id, file_paths_and_names, use_enhanced_processing, results_dir, job_db_path)
+    outcome = {**outcome, "trace": trace.to_dict()}
+    return {**outcome, "profile_files": profile_files} if profile else outcome
+
+
+def _run_pipeline(job_id: str, file_paths_and_names: List[Tuple[str, str]], use_enhanced_processing: bool,
+                  results_dir: str, job_db_path: Optional[str]) -> Dict[str, Any]:
+    results_dir = Path(results_dir)
+    progress = ProgressReporter.for_job(job_db_path, job_id, len(file_paths_and_names)) if job_db_path else None
+    batch = _BatchResults(job_id, file_paths_and_names, progress.store if progress else None)
+    logger.info(f"🚀 Processing {len(file_paths_and_names)} documents with SoF Pipeline (enhanced: {use_enhanced_processing})")
+
+    # Get API key for Gemini
+    gemini_api_key = os.getenv("GOOGLE_API_KEY", "")
+    if not gemini_api_key:
+        logger.warning("⚠️ No Google API key found, processing will be limited")
+
+    # Enhanced processing only applies to a single PDF upload
+    enhanced = use_enhanced_processing and len(file_paths_and_names) == 1
+
+    def process(index: int, file_path: str, filename: str):
+        # Files of a resumable upload may still be arriving (see utils/upload_sessions.py)
+        if not Path(file_path).exists():
+            logger.info(f"⏳ Waiting for {filename} to finish uploading")
+            if progress:
+                progress("uploading", file=filename, index=index)
+            wait_for_file(Path(file_path))
+        batch.started(index)
+        # Only the first file is summarized up front; the others are the fallback below
+        return _process_file(file_path, filename, enhanced, gemini_api_key, index == 0, progress)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(PIPELINE_FILE_THREADS, len(file_paths_and_names))),
+                            thread_name_prefix="sof-file") as pool:
+        futures = {
+            pool.submit(bind(process), index, file_path, filename): index
+            for index, (file_path, filename) in enumerate(file_paths_and_names)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            filename = file_paths_and_names[index][1]
+            try:
+                events_df, summary_data, docs = future.result()
+                batch.completed(index, events_df, summary_data, docs)
+            except Exception as file_error:
+                logger.error(f"❌ Failed to process {filename}: {file_error}")
+                batch.failed(index, file_error)
+            if progress:
+                status = batch.file_status[index]
+                progress("file_done", file=filename, index=index, outcome=status["status"],
+                         event_count=status["events"], error=status["error"])
+
+    # The summary comes from the first file that yields one, in upload order
+    combined_summary = {}
+    for index in sorted(batch.summaries):
+        if batch.summaries[index]:
+            combined_summary = batch.summaries[index]
+            break
+    if not combined_summary and gemini_api_key:
+        for index in sorted(batch.docs):
+            if index == 0:
+                continue  # already summarized by its own pipeline
+            for doc in batch.docs[index]:
+                combined_summary = extract_summary(doc, gemini_api_key)
+                if combined_summary:
+                    break
+            if combined_summary:
+                break
+
+    all_events_list = batch.events()
+    processed_filenames = [status["filename"] for status in batch.file_status if status["status"] == "completed"]
+    if not all_events_list:
+        logger.warning("No events extracted from any document")
+
+    # Save results
+    result_data = {
+        "events": all_events_list,
+        "summary": combined_summary,
+        "has_laytime_data": len(all_events_list) > 0 and any(event.get('laytime_counts') for event in all_events_list),
+        "processed_files": processed_filenames,
+        "file_status": batch.file_status,
+        "total_files": len(file_paths_and_names),
+        "successful_files": len(processed_filenames)
+    }
+
+    # Events go to a typed Parquet file when available; the JSON keeps the rest
+    events_file = None
+    events_frame = batch.events_frame()
+    if not events_frame.empty:
+        try:
+            events_file = save_events(events_frame, results_dir, job_id)
+        except Exception as store_error:
+            logger.warning(f"⚠️ Could not write Parquet events for {job_id}: {store_error}")
+    if events_file:
+        result_data = {**result_data, "events": [], "events_file": events_file.name}
+
+    result_file = results_dir / f"{job_id}_results.json"
+    with open(result_file, 'w') as f:
+        json.dump(result_data, f, default=str)
+
+    logger.info(f"✅ Batch processing completed: {len(processed_filenames)}/{len(file_paths_and_names)} files, {len(all_events_list)} total events")
+    if progress:
+        progress("done", events=len(all_events_list))
+
+    return {
+        "events": all_events_list,
+        "next_event_id": len(all_events_list),
+        "summary": combined_summary,
+        "has_laytime_data": result_data["has_laytime_data"],
+        "result_file": str(result_file),
+        "events_file": str(events_file) if events_file else None,
+        "processed_files": processed_filenames,
+        "file_status": batch.file_status,
+        "total_files": len(file_paths_and_names),
+        "successful_files": len(processed_filenames)
+    }
@@ -0,0 +1,214 @@
+"""
+Job profiling
+Opt-in profiling of one job's pipeline run, for finding why a particular document is
+slow without copying it off the server. A sampling profiler records the Python stacks
+of the threads running pipeline code every PROFILE_INTERVAL seconds (wall time, so
+waiting on tesseract or Gemini counts), and tracemalloc snapshots the allocation sites
+as traced memory reaches new highs. The reports are written next to the job's results:
+
+    {job_id}_profile.txt          time by package (pandas, dateparser, pytesseract, ...) and by function
+    {job_id}_profile.folded       collapsed stacks, for flamegraph.pl or speedscope
+    {job_id}_allocations.txt      peak traced memory and the top allocation sites at the peak
+
+Both tools watch the whole worker process, so with PIPELINE_EXECUTOR=thread other jobs
+running at the same time show up as well.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", 10))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", 40))
+# A new allocation snapshot is taken when traced memory grows by this factor over the last one
+PROFILE_SNAPSHOT_GROWTH = float(os.getenv("PROFILE_SNAPSHOT_GROWTH", 1.25))
+
+PROFILE_FILES = {
+    "report": "{job_id}_profile.txt",
+    "folded": "{job_id}_profile.folded",
+    "allocations": "{job_id}_allocations.txt",
+}
+
+# Only stacks passing through these modules are sampled (a job's file and LLM threads)
+_PIPELINE_MODULES = ("sof_pipeline.py", "pipeline_worker.py")
+# Leaf functions of pipeline threads waiting on other threads (as_completed, future.result)
+_IDLE_LEAVES = {"wait", "_wait_for_tstate_lock", "get", "result"}
+_IDLE_MODULES = ("threading.py", "queue.py", "_base.py")
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+def _in_pipeline(stack: List[Frame]) -> bool:
+    function, filename, _ = stack[-1]
+    if function in _IDLE_LEAVES and filename.endswith(_IDLE_MODULES):
+        return False
+    return any(frame[1].endswith(_PIPELINE_MODULES) for frame in stack)
+
+
+def _package(filename: str) -> str:
+    """Top-level package of an installed module, or the module file name for the backend's own code."""
+    for marker in ("site-packages", "dist-packages"):
+        if marker in filename:
+            relative = filename.split(marker, 1)[1].lstrip(os.sep)
+            return relative.split(os.sep, 1)[0].removesuffix(".py")
+    if os.sep + "lib" + os.sep + "python" in filename:
+        return "stdlib"
+    return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads running pipeline code at a fixed interval on a
+    background thread. While tracemalloc is tracing, it also keeps a snapshot of the
+    allocations taken close to the highest traced memory.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sof-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                if stack and _in_pipeline(stack):
+                    self.stacks[tuple(stack)] += 1
+            self.samples += 1
+            self._snapshot_if_peak()
+
+    def _snapshot_if_peak(self) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.snapshot_bytes * PROFILE_SNAPSHOT_GROWTH:
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self.snapshot_bytes = current
+
+    @staticmethod
+    def _label(frame: Frame) -> str:
+        function, filename, line = frame
+        return f"{function} ({os.path.basename(filename)}:{line})"
+
+    def folded(self) -> str:
+        """One line per distinct stack: frames root first, separated by ';', then the sample count."""
+        return "".join(
+            ";".join(self._label(frame) for frame in stack) + f" {count}\n"
+            for stack, count in self.stacks.most_common()
+        )
+
+    def report(self, top: int = PROFILE_TOP) -> str:
+        own, total, packages = Counter(), Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+            # A package's time includes what it calls; time in the backend's own code is its leaf module's
+            leaf = _package(stack[-1][1])
+            for package in {_package(frame[1]) for frame in stack if "site-packages" in frame[1]} | {leaf}:
+                packages[package] += count
+        busy = sum(self.stacks.values()) or 1
+        lines = [
+            f"Sampled every {self.interval * 1000:.1f} ms for {self.seconds:.2f} s: "
+            f"{self.samples} samples, {busy} pipeline thread stacks",
+            "",
+            f"{'total %':>8}  package",
+        ]
+        for package, count in packages.most_common(top):
+            lines.append(f"{100 * count / busy:8.1f}  {package}")
+        lines += ["", f"{'own %':>7} {'total %':>8}  function"]
+        for frame, count in total.most_common(top):
+            lines.append(f"{100 * own[frame] / busy:7.1f} {100 * count / busy:8.1f}  {self._label(frame)}")
+        lines += ["", f"Top {top} by own samples:", ""]
+        for frame, count in own.most_common(top):
+            lines.append(f"{100 * count / busy:7.1f}  {self._label(frame)}")
+        return "\n".join(lines) + "\n"
+
+
+def _allocation_report(snapshot: tracemalloc.Snapshot, peak: int, top: int = PROFILE_TOP) -> str:
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ])
+    held = sum(stat.size for stat in snapshot.statistics("filename"))
+    stats = snapshot.statistics("lineno")
+    lines = [
+        f"Peak traced memory: {peak / 1e6:.1f} MB",
+        f"Snapshot near the peak: {held / 1e6:.1f} MB",
+        "",
+        f"Top {top} allocation sites in the snapshot:",
+        "",
+    ]
+    for stat in stats[:top]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1e6:9.2f} MB {stat.count:9d} blocks  {frame.filename}:{frame.lineno}")
+    by_file = snapshot.statistics("filename")
+    lines += ["", "By file:", ""]
+    for stat in by_file[:top]:
+        lines.append(f"{stat.size / 1e6:9.2f} MB  {stat.traceback[0].filename}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile_job(results_dir: Path, job_id: str) -> Iterator[Dict[str, str]]:
+    """
+    Profile the block and write the reports to results_dir. Yields a dict that holds
+    the written report paths by kind (see PROFILE_FILES) once the block has finished.
+    """
+    files: Dict[str, str] = {}
+    profiler = SamplingProfiler()
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    profiler.start()
+    try:
+        yield files
+    finally:
+        profiler.stop()
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = profiler.peak_snapshot
+        if snapshot is None or current >= profiler.snapshot_bytes:
+            snapshot = tracemalloc.take_snapshot()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        contents = {
+            "report": profiler.report(),
+            "folded": profiler.folded(),
+            "allocations": _allocation_report(snapshot, peak),
+        }
+        for kind, text in contents.items():
+            path = Path(results_dir) / PROFILE_FILES[kind].format(job_id=job_id)
+            path.write_text(text)
+            files[kind] = str(path)
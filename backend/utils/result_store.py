@@ -0,0 +1,118 @@
+"""
+Columnar result store
+Persists each job's extracted events as Parquet next to the other results, with
+typed timestamp and boolean columns, so reloading a job, recalculating laytime or
+scanning events across jobs never goes back through string parsing.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Parquet support is optional; without pyarrow jobs keep their events in the JSON results file
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+TIMESTAMP_COLUMNS = ('start_time_iso', 'end_time_iso')
+BOOLEAN_COLUMNS = ('laytime_counts', 'laytime_excluded')
+EVENTS_SUFFIX = "_events.parquet"
+
+
+def events_path(results_dir: Path, job_id: str) -> Path:
+    return Path(results_dir) / f"{job_id}{EVENTS_SUFFIX}"
+
+
+def _as_bool(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    text = series.astype(object).where(series.notna(), False)
+    return text.map(lambda value: value is True or str(value).strip().lower() == "true").astype(bool)
+
+
+def typed_events(events_df: pd.DataFrame) -> pd.DataFrame:
+    """Events with datetime64 timestamps, real booleans and string columns, ready for Parquet."""
+    df = events_df.copy()
+    for col in TIMESTAMP_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in BOOLEAN_COLUMNS:
+        if col in df.columns:
+            df[col] = _as_bool(df[col])
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype(object).where(df[col].notna(), None).map(
+                lambda value: value if value is None else str(value)
+            ).astype("string")
+    return df
+
+
+def save_events(events_df: pd.DataFrame, results_dir: Path, job_id: str) -> Optional[Path]:
+    """Write a job's events as Parquet (atomically); None when pyarrow is not installed."""
+    if not PARQUET_AVAILABLE:
+        return None
+    path = events_path(results_dir, job_id)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    typed_events(events_df).reset_index(drop=True).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_events(path: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    return pd.read_parquet(path, columns=list(columns) if columns else None)
+
+
+def scan_events(results_dir: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """All stored events across jobs with a job_id column, reading only the requested columns."""
+    frames = []
+    for path in sorted(Path(results_dir).glob(f"*{EVENTS_SUFFIX}")):
+        try:
+            df = load_events(path, columns)
+        except Exception:
+            # A column missing from an older file or a partial write; skip that job
+            continue
+        frames.append(df.assign(job_id=path.name[:-len(EVENTS_SUFFIX)]))
+    if not frames:
+        return pd.DataFrame(columns=[*(columns or []), 'job_id'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def iso_timestamps(series: pd.Series) -> pd.Series:
+    """Naive datetime64 column as Timestamp.isoformat() strings (NaT stays missing)."""
+    missing = series.isna().to_numpy()
+    seconds = series.to_numpy(dtype='datetime64[ns]').astype('datetime64[s]')
+    values = pd.Series(np.datetime_as_string(seconds, unit='s'), index=series.index, dtype=object)
+    fractional = ((series.dt.microsecond != 0) | (series.dt.nanosecond != 0)).to_numpy() & ~missing
+    if fractional.any():
+        values[fractional] = [ts.isoformat() for ts in series[fractional]]
+    return values.where(~missing, None)
+
+
+def _record_column(series: pd.Series) -> List[Any]:
+    """One column as API values: None for missing, ISO strings for timestamps, bools kept, the rest str."""
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series) and getattr(series.dt, "tz", None) is None:
+        values = iso_timestamps(series)
+    elif pd.api.types.is_bool_dtype(series):
+        values = series.astype(object)
+    elif pd.api.types.is_numeric_dtype(series) or isinstance(series.dtype, pd.StringDtype):
+        values = series.astype(str).astype(object)
+    else:
+        values = pd.Series([
+            value if isinstance(value, bool) else value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            for value in series.astype(object).where(~missing, None)
+        ], index=series.index, dtype=object)
+    return values.where(~missing, None).tolist()
+
+
+def event_records(events_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """JSON-ready event dicts built a column at a time."""
+    if events_df.empty:
+        return []
+    columns = {col: _record_column(events_df[col]) for col in events_df.columns}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
@@ -9,11 +9,14 @@ import os
 import re
 import json
 import time
+import logging
 import shutil
-import traceback
 from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, Iterator, Union, Callable
 
 import pandas as pd
 import dateparser
@@ -25,23 +28,35 @@ import pdfplumber
 import fitz  # PyMuPDF  
 from docx import Document
 
+logger = logging.getLogger(__name__)
+
 # OCR (optional)
 try:
     import pytesseract
     PYTESSERACT_AVAILABLE = True
 except ImportError:
     PYTESSERACT_AVAILABLE = False
-    print("⚠️ Warning: pytesseract not available. OCR functionality will be limited.")
+    logger.warning("⚠️ pytesseract not available. OCR functionality will be limited.")
 
 # Gemini AI
 import google.generativeai as genai
 
+try:
+    from utils.laytime_intervals import NS_PER_DAY, attribute_intervals, attribution_table
+    from utils.laytime_calendar import parse_laytime_terms, calendar_exclusions, weather_event_mask
+    from utils.tracing import Laps, bind, span, traced
+except ImportError:  # imported as a top-level module (Streamlit app in utils/)
+    from laytime_intervals import NS_PER_DAY, attribute_intervals, attribution_table
+    from laytime_calendar import parse_laytime_terms, calendar_exclusions, weather_event_mask
+    from tracing import Laps, bind, span, traced
+
 # Data structures
 @dataclass
 class IngestedDoc:
     filename: str
     pages: List[str] 
     combined_text: str
+    prompt_stats: Optional[Dict[str, int]] = None
 
 @dataclass
 class LaytimeResult:
@@ -52,31 +67,56 @@ class LaytimeResult:
     demurrage_due: float = 0.0
     dispatch_due: float = 0.0
     calculation_log: List[str] = None
+    attribution_df: Optional[pd.DataFrame] = None  # per-event counted/overlap/excluded days
 
     def __post_init__(self):
         if self.calculation_log is None:
             self.calculation_log = []
 
+# Optional progress callback, called as progress(stage, **details) (see utils/job_progress.py)
+ProgressCallback = Optional[Callable[..., None]]
+
+def _report(progress: ProgressCallback, stage: str, **details) -> None:
+    if progress is not None:
+        progress(stage, **details)
+
+# A document's content: the bytes of an upload, or the path of the file on disk, which
+# the parsers then read as they need it instead of holding the whole file in memory
+DocumentSource = Union[bytes, str, os.PathLike]
+
+def _as_file(source: DocumentSource):
+    """Something pdfplumber, python-docx and PIL can open."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def _open_pdf(source: DocumentSource) -> "fitz.Document":
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source, filetype="pdf")
+
+def _source_size(source: DocumentSource) -> int:
+    return len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+
 
 # ==============================================================================
 # 🔥 ULTRA-ENHANCED OCR SYSTEM - 100000% ACCURACY GUARANTEE 🔥
 # ==============================================================================
 
+@traced("ocr")
 def _ocr_image(img: Image.Image) -> str:
     """🚀 ULTRA-MEGA OCR SYSTEM - Maximum accuracy with comprehensive preprocessing 🚀"""
     if shutil.which("tesseract") is None:
-        print("❌ ERROR: Tesseract OCR not found")
+        logger.error("❌ Tesseract OCR not found")
         return ""
     
     try:
-        print("🚀 STARTING ULTRA-MEGA OCR PROCESSING 🚀")
+        logger.debug("🚀 STARTING ULTRA-MEGA OCR PROCESSING 🚀")
         
         # Convert to RGB if needed
         if img.mode != 'RGB':
             img = img.convert('RGB')
             
         original_w, original_h = img.size
-        print(f"📐 Original image: {original_w}x{original_h} pixels")
+        logger.debug("📐 Original image: %sx%s pixels", original_w, original_h)
         
         # STAGE 1: LAPTOP-FRIENDLY SCALING
         target_size = 1500  # Reduced for laptop performance
@@ -85,19 +125,24 @@ def _ocr_image(img: Image.Image) -> str:
             new_w = int(original_w * scale)  # Removed extra scaling boost
             new_h = int(original_h * scale)
             img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            print(f"🔍 LAPTOP-SCALED to: {new_w}x{new_h} (scale: {scale:.1f}x)")
+            logger.debug("🔍 LAPTOP-SCALED to: %sx%s (scale: %.1fx)", new_w, new_h, scale)
         
         best_results = []
         
+        # Each method's time is recorded as an ocr.<method> span
+        laps = Laps("ocr")
+        
         # METHOD 1: Direct OCR (baseline)
         try:
             direct_text = pytesseract.image_to_string(img, config="--oem 3 --psm 6 -l eng")
             if direct_text.strip():
                 best_results.append(("Direct", direct_text.strip(), len(direct_text.strip())))
-                print(f"✅ Direct OCR: {len(direct_text.strip())} chars")
+                logger.debug("✅ Direct OCR: %s chars", len(direct_text.strip()))
         except Exception:
             pass
         
+        laps.lap("direct")
+        
         # METHOD 2: MEGA ENHANCEMENT
         try:
             enhanced = img.convert('L')  # Grayscale
@@ -119,10 +164,12 @@ def _ocr_image(img: Image.Image) -> str:
             text_result = pytesseract.image_to_string(enhanced, config="--oem 3 --psm 6 -l eng")
             if text_result.strip():
                 best_results.append(("MEGA", text_result.strip(), len(text_result.strip())))
-                print(f"✅ MEGA Enhancement: {len(text_result.strip())} chars")
+                logger.debug("✅ MEGA Enhancement: %s chars", len(text_result.strip()))
         except Exception:
             pass
         
+        laps.lap("mega")
+        
         # METHOD 3: BINARY THRESHOLD PERFECTION  
         try:
             gray = img.convert('L')
@@ -133,16 +180,18 @@ def _ocr_image(img: Image.Image) -> str:
                     text_result = pytesseract.image_to_string(binary, config="--oem 3 --psm 6 -l eng")
                     if text_result.strip() and len(text_result.strip()) > 10:
                         best_results.append((f"Binary{threshold}", text_result.strip(), len(text_result.strip())))
-                        print(f"✅ Binary {threshold}: {len(text_result.strip())} chars")
+                        logger.debug("✅ Binary %s: %s chars", threshold, len(text_result.strip()))
                 except Exception:
                     continue
         except Exception:
             pass
         
+        laps.lap("binary")
+        
         # METHOD 4: OPENCV SUPER-PROCESSING
         try:
             import cv2
-            print("🔬 OPENCV SUPER-PROCESSING ACTIVATED")
+            logger.debug("🔬 OPENCV SUPER-PROCESSING ACTIVATED")
             
             # Convert to OpenCV format
             cv_img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
@@ -168,12 +217,14 @@ def _ocr_image(img: Image.Image) -> str:
             text_result = pytesseract.image_to_string(cv_result, config="--oem 3 --psm 6 -l eng")
             if text_result.strip():
                 best_results.append(("OpenCV", text_result.strip(), len(text_result.strip())))
-                print(f"✅ OpenCV: {len(text_result.strip())} chars")
+                logger.debug("✅ OpenCV: %s chars", len(text_result.strip()))
         except ImportError:
-            print("📦 OpenCV not available - continuing with PIL methods")
+            logger.debug("📦 OpenCV not available - continuing with PIL methods")
         except Exception:
             pass
         
+        laps.lap("opencv")
+        
         # METHOD 5: ADVANCED OCR CONFIGURATIONS + TABLE-SPECIFIC EXTRACTION
         try:
             gray = img.convert('L')
@@ -197,12 +248,14 @@ def _ocr_image(img: Image.Image) -> str:
                     text_result = pytesseract.image_to_string(enhanced, config=config)
                     if text_result.strip() and len(text_result.strip()) > 5:
                         best_results.append((f"Config{i+1}", text_result.strip(), len(text_result.strip())))
-                        print(f"✅ Config {i+1}: {len(text_result.strip())} chars")
+                        logger.debug("✅ Config %s: %s chars", i+1, len(text_result.strip()))
                 except Exception:
                     continue
         except Exception:
             pass
             
+        laps.lap("configs")
+        
         # METHOD 6: ENHANCED TABLE-SPECIFIC OCR WITH STRUCTURE DETECTION
         try:
             # Use image_to_data for better table structure detection
@@ -233,11 +286,13 @@ def _ocr_image(img: Image.Image) -> str:
             table_text = '\n'.join(structured_text)
             if table_text.strip():
                 best_results.append(("EnhancedTableOCR", table_text.strip(), len(table_text.strip())))
-                print(f"✅ EnhancedTableOCR: {len(table_text.strip())} chars")
+                logger.debug("✅ EnhancedTableOCR: %s chars", len(table_text.strip()))
                 
         except Exception as e:
-            print(f"⚠️ EnhancedTableOCR failed: {e}")
+            logger.warning("⚠️ EnhancedTableOCR failed: %s", e)
             
+        laps.lap("table_data")
+        
         # METHOD 7: TESSERACT TSV OUTPUT FOR PERFECT TABLE STRUCTURE
         try:
             # Get TSV output which preserves exact positioning
@@ -260,11 +315,13 @@ def _ocr_image(img: Image.Image) -> str:
                 tsv_text = '\n'.join(table_rows)
                 if tsv_text.strip():
                     best_results.append(("TSV_TableOCR", tsv_text.strip(), len(tsv_text.strip())))
-                    print(f"✅ TSV_TableOCR: {len(tsv_text.strip())} chars")
+                    logger.debug("✅ TSV_TableOCR: %s chars", len(tsv_text.strip()))
                     
         except Exception as e:
-            print(f"⚠️ TSV_TableOCR failed: {e}")
+            logger.warning("⚠️ TSV_TableOCR failed: %s", e)
             
+        laps.lap("tsv")
+        
         # METHOD 8: LAPTOP-FRIENDLY SCALING FOR SMALL TEXT
         try:
             # Scale up image for tiny text (laptop-friendly scaling)
@@ -302,13 +359,15 @@ def _ocr_image(img: Image.Image) -> str:
                         super_text = pytesseract.image_to_string(super_binary, config=config)
                         if super_text.strip() and len(super_text.strip()) > 10:
                             best_results.append((f"LaptopScale{scale_factor}x_C{i}", super_text.strip(), len(super_text.strip())))
-                            print(f"✅ LaptopScale {scale_factor}x Config{i}: {len(super_text.strip())} chars")
+                            logger.debug("✅ LaptopScale %sx Config%s: %s chars", scale_factor, i, len(super_text.strip()))
                     except:
                         continue
                         
         except Exception as e:
-            print(f"⚠️ LaptopScale failed: {e}")
+            logger.warning("⚠️ LaptopScale failed: %s", e)
             
+        laps.lap("small_text")
+        
         # METHOD 9: EXTREME PREPROCESSING WITH CV2 TECHNIQUES
         try:
             if 'cv2' in globals():
@@ -365,13 +424,15 @@ def _ocr_image(img: Image.Image) -> str:
                             text = pytesseract.image_to_string(scaled, config=config)
                             if text.strip() and len(text.strip()) > 20:
                                 best_results.append((f"CV2_{method_name}_C{cfg_idx}", text.strip(), len(text.strip())))
-                                print(f"✅ CV2 {method_name} Config{cfg_idx}: {len(text.strip())} chars")
+                                logger.debug("✅ CV2 %s Config%s: %s chars", method_name, cfg_idx, len(text.strip()))
                     except:
                         continue
                         
         except Exception as e:
-            print(f"⚠️ CV2 Extreme failed: {e}")
+            logger.warning("⚠️ CV2 Extreme failed: %s", e)
             
+        laps.lap("cv2_extreme")
+        
         # METHOD 10: PERSPECTIVE CORRECTION + TABLE EXTRACTION
         try:
             if 'cv2' in globals():
@@ -403,10 +464,12 @@ def _ocr_image(img: Image.Image) -> str:
                     table_text = pytesseract.image_to_string(scaled_corrected, config="--oem 3 --psm 6 -l eng -c preserve_interword_spaces=1")
                     if table_text.strip():
                         best_results.append(("PerspectiveTable", table_text.strip(), len(table_text.strip())))
-                        print(f"✅ PerspectiveTable: {len(table_text.strip())} chars")
+                        logger.debug("✅ PerspectiveTable: %s chars", len(table_text.strip()))
                         
         except Exception as e:
-            print(f"⚠️ Perspective correction failed: {e}")
+            logger.warning("⚠️ Perspective correction failed: %s", e)
+        
+        laps.lap("perspective")
         
         # ULTRA-INTELLIGENT SCORING AND SELECTION
         if best_results:
@@ -485,26 +548,23 @@ def _ocr_image(img: Image.Image) -> str:
                         
                 score += complete_rows * 100  # MASSIVE bonus for complete table rows
                 
-                print(f"🔍 {method}: Score={score}, Length={length}, Times={len(time_patterns)}, Dates={len(date_patterns)}, Rows={complete_rows}")
+                logger.debug("🔍 %s: Score=%s, Length=%s, Times=%s, Dates=%s, Rows=%s", method, score, length, len(time_patterns), len(date_patterns), complete_rows)
                 
                 if score > best_score:
                     best_score = score
                     best_text = text
                     best_method = method
             
-            print(f"🎯 ULTRA OCR COMPLETE!")
-            print(f"🏆 WINNER: {best_method} with score {best_score}")
-            print(f"📏 LENGTH: {len(best_text)} characters")
-            print(f"📄 SAMPLE: {best_text[:400]}...")
+            logger.debug("🏆 OCR winner: %s with score %s, %s characters: %.400s...",
+                         best_method, best_score, len(best_text), best_text)
             
             return best_text
         else:
-            print("💥 ALL OCR METHODS FAILED!")
+            logger.warning("💥 ALL OCR METHODS FAILED!")
             return ""
             
     except Exception as e:
-        print(f"💥 CRITICAL OCR ERROR: {e}")
-        traceback.print_exc()
+        logger.exception("💥 CRITICAL OCR ERROR: %s", e)
         return ""
 
 
@@ -512,27 +572,30 @@ def _ocr_image(img: Image.Image) -> str:
 # 📄 FILE PROCESSING FUNCTIONS 
 # ==============================================================================
 
-def _pdf_to_text_or_ocr(pdf_bytes: bytes) -> List[str]:
+@traced("pdf_extract")
+def _pdf_to_text_or_ocr(pdf_source: DocumentSource, progress: ProgressCallback = None) -> List[str]:
     """Extract text from PDF, with OCR fallback for scanned pages."""
     pages = []
     
     try:
         # Method 1: Try pdfplumber first (best for text-based PDFs)
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        with pdfplumber.open(_as_file(pdf_source)) as pdf:
+            page_count = len(pdf.pages)
             for page_num, page in enumerate(pdf.pages):
                 text = page.extract_text() or ""
                 text = text.strip()
                 
                 if text and len(text) > 20:  # Good text extraction
                     pages.append(text)
-                    print(f"✅ Page {page_num + 1}: pdfplumber extracted {len(text)} chars")
+                    logger.debug("✅ Page %s: pdfplumber extracted %s chars", page_num + 1, len(text))
                 else:
                     # Fallback to OCR for this page
-                    print(f"⚠️ Page {page_num + 1}: pdfplumber failed, trying OCR...")
+                    logger.debug("⚠️ Page %s: pdfplumber failed, trying OCR...", page_num + 1)
+                    _report(progress, "ocr", page=page_num + 1, pages=page_count)
                     
                     try:
                         # Convert page to image for OCR using PyMuPDF
-                        pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                        pdf_doc = _open_pdf(pdf_source)
                         page_obj = pdf_doc[page_num]
                         pix = page_obj.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))  # 2x scaling
                         img_data = pix.tobytes("png")
@@ -542,22 +605,23 @@ def _pdf_to_text_or_ocr(pdf_bytes: bytes) -> List[str]:
                         
                         if ocr_text:
                             pages.append(ocr_text)
-                            print(f"🔍 Page {page_num + 1}: OCR extracted {len(ocr_text)} chars")
+                            logger.debug("🔍 Page %s: OCR extracted %s chars", page_num + 1, len(ocr_text))
                         else:
                             pages.append("")
-                            print(f"❌ Page {page_num + 1}: OCR also failed")
+                            logger.warning("❌ Page %s: OCR also failed", page_num + 1)
                             
                         pdf_doc.close()
                     except Exception as e:
-                        print(f"❌ OCR fallback failed for page {page_num + 1}: {e}")
+                        logger.warning("❌ OCR fallback failed for page %s: %s", page_num + 1, e)
                         pages.append("")
     
     except Exception as e:
-        print(f"❌ PDF processing failed: {e}")
+        logger.warning("❌ PDF processing failed: %s", e)
         # Complete fallback: convert entire PDF to images and OCR
         try:
-            pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            pdf_doc = _open_pdf(pdf_source)
             for page_num in range(pdf_doc.page_count):
+                _report(progress, "ocr", page=page_num + 1, pages=pdf_doc.page_count)
                 page_obj = pdf_doc[page_num]
                 pix = page_obj.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))
                 img_data = pix.tobytes("png")
@@ -565,20 +629,19 @@ def _pdf_to_text_or_ocr(pdf_bytes: bytes) -> List[str]:
                 img = Image.open(io.BytesIO(img_data))
                 ocr_text = _ocr_image(img)
                 pages.append(ocr_text or "")
-                print(f"🔍 Fallback OCR page {page_num + 1}: {len(ocr_text or '')} chars")
+                logger.debug("🔍 Fallback OCR page %s: %s chars", page_num + 1, len(ocr_text or ''))
             
             pdf_doc.close()
         except Exception as fallback_error:
-            print(f"❌ Complete fallback failed: {fallback_error}")
+            logger.error("❌ Complete fallback failed: %s", fallback_error)
     
     return pages
 
 
-def _docx_to_text(docx_bytes: bytes) -> str:
+def _docx_to_text(docx_source: DocumentSource) -> str:
     """Extract text from DOCX file."""
     try:
-        f = io.BytesIO(docx_bytes)
-        doc = Document(f)
+        doc = Document(_as_file(docx_source))
         
         # Extract text from paragraphs
         paragraphs_text = []
@@ -602,18 +665,18 @@ def _docx_to_text(docx_bytes: bytes) -> str:
         return "\n".join(all_text) if all_text else ""
         
     except Exception as e:
-        print(f"Error extracting DOCX content: {e}")
+        logger.error("Error extracting DOCX content: %s", e)
         return ""
 
 
-def _image_to_text(img_bytes: bytes) -> str:
-    """Convert image bytes to text using ultra OCR."""
+def _image_to_text(img_source: DocumentSource) -> str:
+    """Convert an image (bytes or file path) to text using ultra OCR."""
     try:
-        print(f"Starting image processing, file size: {len(img_bytes)} bytes")
+        logger.debug("Starting image processing, file size: %s bytes", _source_size(img_source))
         
         # Load image
-        img = Image.open(io.BytesIO(img_bytes))
-        print(f"Image loaded: {img.format}, {img.mode}, {img.size}")
+        img = Image.open(_as_file(img_source))
+        logger.debug("Image loaded: %s, %s, %s", img.format, img.mode, img.size)
         
         # Fix EXIF orientation if needed
         try:
@@ -627,23 +690,22 @@ def _image_to_text(img_bytes: bytes) -> str:
                         img = img.rotate(270, expand=True)  
                     elif orientation == 8:
                         img = img.rotate(90, expand=True)
-                    print("Image orientation corrected")
+                    logger.debug("Image orientation corrected")
         except Exception as e:
-            print(f"Warning: EXIF processing failed: {e}")
+            logger.warning("EXIF processing failed: %s", e)
         
         # Ultra OCR processing
         text = _ocr_image(img)
         
         if text.strip():
-            print(f"Image OCR successful: {len(text)} chars")
+            logger.debug("Image OCR successful: %s chars", len(text))
             return text
         else:
-            print("Warning: No text found in image")
+            logger.warning("No text found in image")
             return ""
             
     except Exception as e:
-        print(f"Error processing image: {e}")
-        traceback.print_exc()
+        logger.exception("Error processing image: %s", e)
         return ""
 
 
@@ -651,39 +713,52 @@ def _image_to_text(img_bytes: bytes) -> str:
 # 📁 FILE INGESTION PIPELINE
 # ==============================================================================
 
-def process_uploaded_files(uploaded_files: List[object]) -> List[IngestedDoc]:
-    """Process uploaded files and extract text content."""
+def process_uploaded_files(uploaded_files: List[object], progress: ProgressCallback = None) -> List[IngestedDoc]:
+    """
+    Process uploaded files and extract text content. Files with a `path` attribute
+    (stored uploads) are parsed from disk; others are read into memory.
+    """
     docs: List[IngestedDoc] = []
     
-    for f in uploaded_files:
+    for index, f in enumerate(uploaded_files):
         name = getattr(f, "name", "uploaded")
         ext = os.path.splitext(name)[1].lower()
-        data = f.read() if hasattr(f, "read") else f.getvalue()
-
-        print(f"Processing file: {name} (type: {ext}, size: {len(data)} bytes)")
-
-        pages: List[str] = []
-        
-        if ext == ".pdf":
-            pages = _pdf_to_text_or_ocr(data)
-        elif ext == ".docx":
-            docx_text = _docx_to_text(data)
-            if docx_text.strip():
-                pages = [docx_text]
-                print(f"DOCX extracted: {len(docx_text)} characters")
-        elif ext in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp"]:
-            image_text = _image_to_text(data)
-            if image_text.strip():
-                pages = [image_text]
-                print(f"Image OCR successful: {len(image_text)} characters")
-        elif ext == ".txt":
-            try:
-                text = data.decode("utf-8", errors="ignore")
-                if text.strip():
-                    pages = [text]
-                    print(f"Text file processed: {len(text)} characters")
-            except Exception as e:
-                print(f"Error processing text file: {e}")
+        path = getattr(f, "path", None)
+        data = path if path is not None else (f.read() if hasattr(f, "read") else f.getvalue())
+        size = _source_size(data)
+
+        logger.info("Processing file: %s (type: %s, size: %s bytes)", name, ext, size)
+        _report(progress, "ingest", file=name, index=index + 1, files=len(uploaded_files))
+        file_progress = partial(progress, file=name) if progress is not None else None
+
+        with span("ingest", ext=ext, bytes=size) as ingest_span:
+            pages: List[str] = []
+        
+            if ext == ".pdf":
+                pages = _pdf_to_text_or_ocr(data, file_progress)
+            elif ext == ".docx":
+                docx_text = _docx_to_text(data)
+                if docx_text.strip():
+                    pages = [docx_text]
+                    logger.debug("DOCX extracted: %s characters", len(docx_text))
+            elif ext in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp"]:
+                _report(file_progress, "ocr", page=1, pages=1)
+                image_text = _image_to_text(data)
+                if image_text.strip():
+                    pages = [image_text]
+                    logger.debug("Image OCR successful: %s characters", len(image_text))
+            elif ext == ".txt":
+                try:
+                    if path is not None:
+                        with open(path, "rb") as text_file:
+                            data = text_file.read()
+                    text = data.decode("utf-8", errors="ignore")
+                    if text.strip():
+                        pages = [text]
+                        logger.debug("Text file processed: %s characters", len(text))
+                except Exception as e:
+                    logger.warning("Error processing text file: %s", e)
+            ingest_span["pages"] = len(pages)
         
         # Filter valid pages and create document
         valid_pages = [p for p in pages if p and p.strip()]
@@ -694,29 +769,280 @@ def process_uploaded_files(uploaded_files: List[object]) -> List[IngestedDoc]:
                 pages=valid_pages, 
                 combined_text=combined
             ))
-            print(f"Document created: {name} with {len(combined)} chars")
+            logger.debug("Document created: %s with %s chars", name, len(combined))
         else:
-            print(f"No valid content found in {name}")
+            logger.warning("No valid content found in %s", name)
     
-    print(f"Total documents processed: {len(docs)}")
+    logger.info("Total documents processed: %s", len(docs))
     return docs
 
 
+# ==============================================================================
+# ✂️ PROMPT MINIMIZATION (strip OCR noise before the LLM sees it)
+# ==============================================================================
+
+# Keyword stems match at the start of a word ('commenc' in 'Commenced'); short or
+# ambiguous keywords only match as whole words ('nor' is not 'normal', 'port' not 'report')
+_PROMPT_SIGNAL_STEMS = (
+    'commenc', 'complet', 'start', 'finish', 'resum', 'suspend', 'stop', 'load', 'disch',
+    'hatch', 'crane', 'shift', 'prepar', 'arriv', 'depart', 'sail', 'anchor', 'berth',
+    'moor', 'unmoor', 'alongside', 'pilot', 'notice', 'tender', 'accept', 'customs',
+    'immigration', 'clearance', 'survey', 'inspection', 'hose', 'connect', 'rain',
+    'weather', 'breakdown', 'holiday', 'sunday', 'vessel', 'voyage', 'terminal',
+    'demurrage', 'dispatch', 'despatch', 'quantity', 'laytime', 'charter',
+)
+_PROMPT_SIGNAL_WORDS = (
+    'began', 'ended', 'cargo', 'gang', 'all fast', 'tug', 'nor', 'free pratique', 'draft',
+    'meal', 'break', 'm/v', 'm.v', 'port', 'rate', 'qty', 'tons',
+)
+_PROMPT_SIGNAL_RE = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, _PROMPT_SIGNAL_STEMS)) + r')'
+    r'|\b(?:' + '|'.join(map(re.escape, _PROMPT_SIGNAL_WORDS)) + r')(?:e?s)?\b',
+    re.IGNORECASE,
+)
+
+# Letterheads, footers and repeated table headers sit within this many lines of a page's edges
+_BOILERPLATE_EDGE_LINES = 5
+
+_MONTHS_PATTERN = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*'
+
+_DATE_SIGNAL_RE = re.compile(
+    r'\b\d{1,4}[/\-\.]\d{1,2}[/\-\.]\d{2,4}\b'
+    rf'|\b\d{{1,2}}(?:st|nd|rd|th)?[\s\-]{_MONTHS_PATTERN}\b'
+    rf'|\b{_MONTHS_PATTERN}[\s\-]\d{{1,2}}\b',
+    re.IGNORECASE,
+)
+_TIME_SIGNAL_RE = re.compile(r'\b\d{1,2}[:\.]\d{2}\b|\b[0-2]\d[0-5]\d\s*(?:hrs?|h|lt)?\b', re.IGNORECASE)
+_PIPE_RUN_RE = re.compile(r'\s*(?:\|\s*)+')
+_RULE_RUN_RE = re.compile(r'[-_=~*.]{3,}')
+_WHITESPACE_RE = re.compile(r'[ \t\u00a0]+')
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough LLM token estimate (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _collapse_prompt_line(line: str) -> str:
+    """Collapse whitespace, ruling characters and `|` column separators in one line."""
+    line = _RULE_RUN_RE.sub(' ', line)
+    line = _PIPE_RUN_RE.sub(' | ', line)
+    line = _WHITESPACE_RE.sub(' ', line).strip(' |')
+
+    # EnhancedTableOCR puts a separator between every single word - those carry no structure
+    cells = line.split(' | ')
+    if len(cells) > 2 and all(len(cell.split()) <= 1 for cell in cells):
+        line = ' '.join(cells)
+    return line
+
+
+def _has_prompt_signal(line: str) -> bool:
+    """True when a line carries a date, a time or a maritime/summary keyword."""
+    if _DATE_SIGNAL_RE.search(line) or _TIME_SIGNAL_RE.search(line):
+        return True
+    return _PROMPT_SIGNAL_RE.search(line) is not None
+
+
+def _page_edge_keys(lines: List[str]) -> set:
+    """Keys of the lines near the top and bottom of a page that carry no time."""
+    edge = _BOILERPLATE_EDGE_LINES
+    edge_lines = lines if len(lines) <= 2 * edge else lines[:edge] + lines[-edge:]
+    return {line.lower() for line in edge_lines if not _TIME_SIGNAL_RE.search(line)}
+
+
+def _minimize_prompt_text(pages: List[str], keep_unsignalled: bool = False) -> Tuple[str, Dict[str, int]]:
+    """
+    Shrink document text before it is sent to Gemini.
+
+    Boilerplate - a line without a time that sits near the top or bottom of at least
+    two pages (letterheads, footers, repeated table headers) - is kept only once, so
+    an event repeated on another day's page is never lost. Separators and whitespace
+    are collapsed, and - unless `keep_unsignalled` is set - lines without any date,
+    time or keyword signal are dropped. Returns the minimized text and before/after
+    size statistics.
+    """
+    original = "\n\n".join(p for p in pages if p)
+    lines_before = 0
+    collapsed_pages = []
+    edge_pages: Dict[str, int] = {}
+    for page in pages:
+        if not page:
+            continue
+        raw_lines = page.splitlines()
+        lines_before += len(raw_lines)
+        lines = [line for line in map(_collapse_prompt_line, raw_lines) if line]
+        collapsed_pages.append(lines)
+        for key in _page_edge_keys(lines):
+            edge_pages[key] = edge_pages.get(key, 0) + 1
+    boilerplate = {key for key, count in edge_pages.items() if count >= 2}
+
+    seen_boilerplate = set()
+    kept_pages = []
+    lines_after = 0
+    for lines in collapsed_pages:
+        edge_keys = _page_edge_keys(lines) & boilerplate
+        kept_lines = []
+        for line in lines:
+            key = line.lower()
+            if key in edge_keys:
+                if key in seen_boilerplate:
+                    continue
+                seen_boilerplate.add(key)
+            if not keep_unsignalled and not _has_prompt_signal(line):
+                continue
+            kept_lines.append(line)
+        if kept_lines:
+            lines_after += len(kept_lines)
+            kept_pages.append("\n".join(kept_lines))
+
+    minimized = "\n\n".join(kept_pages)
+    stats = {
+        "chars_before": len(original),
+        "chars_after": len(minimized),
+        "lines_before": lines_before,
+        "lines_after": lines_after,
+        "tokens_before": _estimate_tokens(original),
+        "tokens_after": _estimate_tokens(minimized),
+    }
+    return minimized, stats
+
+
+def _report_prompt_reduction(filename: str, stats: Dict[str, int]) -> None:
+    """Log the per-document token reduction achieved by the minimizer."""
+    before = stats["tokens_before"]
+    after = stats["tokens_after"]
+    saved_pct = (1 - after / before) * 100 if before else 0.0
+    logger.debug("✂️ Prompt minimized for %s: ~%s → ~%s tokens (%.1f%% fewer, %s → %s lines)",
+                 filename, before, after, saved_pct, stats["lines_before"], stats["lines_after"])
+
+
+# ==============================================================================
+# 📅 FAST DATE/TIME PARSING (compiled formats + memo, dateparser on a miss)
+# ==============================================================================
+
+_MONTH_NUMBERS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7,
+    'aug': 8, 'august': 8, 'sep': 9, 'sept': 9, 'september': 9, 'oct': 10, 'october': 10,
+    'nov': 11, 'november': 11, 'dec': 12, 'december': 12,
+}
+
+_ISO_DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')                       # 2024-08-22
+_TEXT_DATE_RE = re.compile(r'^(\d{1,2})[-\s]([A-Za-z]{3,9})[-\s,]+(\d{4})$')       # 22-Aug-2024
+_NUMERIC_DATE_RE = re.compile(r'^(\d{1,2})([/\-])(\d{1,2})\2(\d{4})$')            # 23/08/2024
+_CLOCK_RE = re.compile(r'^(\d{1,2})[:.](\d{2})$|^(\d{2})(\d{2})$')                 # 08:00, 8.00, 0800
+_CLOCK_SUFFIX_RE = re.compile(r'\s*(?:hrs?|h|lt)\.?$', re.IGNORECASE)
+
+_LEGACY_YEARS = ("2020", "2021", "2022", "2023")
+
+
+def _fast_parse_date(date_str: str) -> Optional[datetime]:
+    """Parse the date formats Gemini actually returns; None means 'not handled here'."""
+    try:
+        match = _ISO_DATE_RE.match(date_str)
+        if match:
+            return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+        match = _TEXT_DATE_RE.match(date_str)
+        if match:
+            month = _MONTH_NUMBERS.get(match.group(2).lower())
+            if month:
+                return datetime(int(match.group(3)), month, int(match.group(1)))
+            return None
+
+        match = _NUMERIC_DATE_RE.match(date_str)
+        if match:
+            first, second, year = int(match.group(1)), int(match.group(3)), int(match.group(4))
+            # Same resolution as dateparser's default order: month first unless that is impossible
+            if first > 12:
+                return datetime(year, second, first)
+            return datetime(year, first, second)
+    except ValueError:
+        return None
+    return None
+
+
+def _fast_parse_clock(time_str: str) -> Optional[Tuple[int, int]]:
+    """Parse HH:MM, HH.MM and HHMM clock times into (hour, minute)."""
+    match = _CLOCK_RE.match(_CLOCK_SUFFIX_RE.sub('', time_str))
+    if not match:
+        return None
+    hour, minute = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+    hour, minute = int(hour), int(minute)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_cached(date_str: str, prefer_first_day: bool = False) -> Optional[datetime]:
+    """Memoized date parse: compiled fast path first, dateparser only on a miss."""
+    parsed = _fast_parse_date(date_str)
+    if parsed is not None:
+        return parsed
+    if prefer_first_day:
+        return dateparser.parse(date_str, settings={'PREFER_DAY_OF_MONTH': 'first'})
+    return dateparser.parse(date_str)
+
+
+@lru_cache(maxsize=8192)
+def _combine_date_and_time(base_date: datetime, time_str: str) -> Optional[datetime]:
+    """Attach a clock time to a parsed date, falling back to dateparser for odd formats."""
+    clock = _fast_parse_clock(time_str)
+    if clock is not None:
+        return base_date.replace(hour=clock[0], minute=clock[1], second=0, microsecond=0)
+    return dateparser.parse(f"{base_date.strftime('%Y-%m-%d')} {time_str}")
+
+
+def _parse_event_date(date_str: str) -> Optional[datetime]:
+    """Parse an event date, assuming 2024 when Gemini returns a date without a known year."""
+    if any(year in date_str for year in _LEGACY_YEARS):
+        return _parse_date_cached(date_str)
+    if "2024" not in date_str and "2025" not in date_str:
+        # Convert formats like "22-Aug" to "2024-08-22"
+        return _parse_date_cached(f"{date_str}-2024")
+    return _parse_date_cached(date_str)
+
+
 # ==============================================================================
 # 🤖 GEMINI AI EVENT EXTRACTION  
 # ==============================================================================
 
 # HARDCODED FALLBACK COMPLETELY REMOVED - NO MORE FAKE DATA!
 
+# Gemini calls spend their time waiting on the network, so documents are prompted concurrently
+LLM_THREADS = int(os.getenv("LLM_THREADS", 4))
+_llm_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _llm_pool() -> ThreadPoolExecutor:
+    """Thread pool for Gemini requests, shared by all jobs in this process."""
+    global _llm_executor
+    if _llm_executor is None:
+        _llm_executor = ThreadPoolExecutor(max_workers=LLM_THREADS, thread_name_prefix="gemini")
+    return _llm_executor
+
+
+def _generate_content(model, prompt: str, kind: str):
+    """One Gemini request, recorded as a gemini.<kind> span with its token counts."""
+    with span(f"gemini.{kind}", prompt_tokens=_estimate_tokens(prompt), errors=1) as gemini_span:
+        response = model.generate_content(prompt)
+        gemini_span["errors"] = 0
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            gemini_span["prompt_tokens"] = getattr(usage, "prompt_token_count", None) or gemini_span["prompt_tokens"]
+            gemini_span["output_tokens"] = getattr(usage, "candidates_token_count", None) or 0
+        return response
+
 
 def _gemini_extract_events(text: str, filename: str, api_key: str) -> List[Dict]:
     """Extract events using Gemini AI - With demo fallback for testing"""
     try:
-        print(f"🤖 GEMINI PROCESSING: {filename} ({len(text)} chars)")
+        logger.debug("🤖 GEMINI PROCESSING: %s (%s chars)", filename, len(text))
         
         # Check if API key is properly configured
         if not api_key or api_key == "your-google-gemini-api-key":
-            print("⚠️ No valid API key found - returning demo data")
+            logger.warning("⚠️ No valid API key found - returning demo data")
             return _create_demo_events(filename)
         
         genai.configure(api_key=api_key)
@@ -774,9 +1100,9 @@ DOCUMENT CONTENT:
 EXTRACT ONLY REAL DATA FROM THE DOCUMENT. Return ONLY the JSON array with actual extracted information.
 """
 
-        response = model.generate_content(prompt)
+        response = _generate_content(model, prompt, "events")
         content = response.text.strip()
-        print(f"🤖 Gemini response length: {len(content)}")
+        logger.debug("🤖 Gemini response length: %s", len(content))
         
         # Clean the response to get pure JSON
         content = content.replace('```json', '').replace('```', '').strip()
@@ -784,90 +1110,66 @@ EXTRACT ONLY REAL DATA FROM THE DOCUMENT. Return ONLY the JSON array with actual
         # Extract JSON from response
         json_match = re.search(r'\[.*?\]', content, re.DOTALL)
         if not json_match:
-            print(f"❌ No JSON found in Gemini response for {filename}")
-            print(f"Raw response: {content[:500]}...")
+            logger.warning("❌ No JSON found in Gemini response for %s", filename)
+            logger.debug("Raw response: %.500s...", content)
             return []
             
         try:
             events_data = json.loads(json_match.group())
-            print(f"🎯 Gemini extracted {len(events_data)} raw events from {filename}")
+            logger.debug("🎯 Gemini extracted %s raw events from %s", len(events_data), filename)
             
             # Normalize events with better date/time parsing
             normalized_events = []
             for i, event in enumerate(events_data):
                 if not isinstance(event, dict) or not event.get("event"):
-                    print(f"⚠️ Skipping invalid event {i}: {event}")
+                    logger.warning("⚠️ Skipping invalid event %s: %s", i, event)
                     continue
                     
                 start_time = str(event.get("start_time", "")).strip()
                 end_time = str(event.get("end_time", "")).strip()
                 date_str = str(event.get("date", "")).strip()
                 
-                print(f"📅 Processing event {i+1}: {event.get('event')} | Date: {date_str} | Start: {start_time} | End: {end_time}")
+                logger.debug("📅 Processing event %s: %s | Date: %s | Start: %s | End: %s", i+1, event.get('event'), date_str, start_time, end_time)
+                
+                # Parse the event date once; start, end and the date-only fallback share it
+                parsed_date = None
+                if date_str:
+                    try:
+                        parsed_date = _parse_event_date(date_str)
+                    except Exception as e:
+                        logger.debug("❌ Date parsing failed: %s", e)
                 
                 # Parse start time
                 start_iso = None
-                if date_str and start_time and start_time.lower() not in ["none", "null", ""]:
+                parsed_start = None
+                if parsed_date and start_time and start_time.lower() not in ["none", "null", ""]:
                     try:
-                        # Handle various date formats - FIXED FOR 2020 DATES
-                        if "2020" in date_str or "2021" in date_str or "2022" in date_str or "2023" in date_str:
-                            parsed_date = dateparser.parse(date_str)
-                        elif "2024" not in date_str and "2025" not in date_str:
-                            # Convert formats like "22-Aug" to "2024-08-22"  
-                            parsed_date = dateparser.parse(f"{date_str}-2024")
-                        else:
-                            parsed_date = dateparser.parse(date_str)
-                        
-                        if parsed_date:
-                            parsed_start = dateparser.parse(f"{parsed_date.strftime('%Y-%m-%d')} {start_time}")
-                            if parsed_start:
-                                start_iso = parsed_start.isoformat()
-                                print(f"✅ Start time parsed: {start_iso}")
+                        parsed_start = _combine_date_and_time(parsed_date, start_time)
+                        if parsed_start:
+                            start_iso = parsed_start.isoformat()
+                            logger.debug("✅ Start time parsed: %s", start_iso)
                     except Exception as e:
-                        print(f"❌ Start time parsing failed: {e}")
+                        logger.debug("❌ Start time parsing failed: %s", e)
                 
                 # Parse end time  
                 end_iso = None
-                if date_str and end_time and end_time.lower() not in ["none", "null", ""]:
+                if parsed_date and end_time and end_time.lower() not in ["none", "null", ""]:
                     try:
-                        if "2020" in date_str or "2021" in date_str or "2022" in date_str or "2023" in date_str:
-                            parsed_date = dateparser.parse(date_str)
-                        elif "2024" not in date_str and "2025" not in date_str:
-                            parsed_date = dateparser.parse(f"{date_str}-2024")
-                        else:
-                            parsed_date = dateparser.parse(date_str)
-                            
-                        if parsed_date:
-                            parsed_end = dateparser.parse(f"{parsed_date.strftime('%Y-%m-%d')} {end_time}")
-                            if parsed_end:
-                                end_iso = parsed_end.isoformat()
-                                # Fix next day if end < start
-                                if start_iso:
-                                    start_dt = pd.to_datetime(start_iso)
-                                    end_dt = pd.to_datetime(end_iso)
-                                    if end_dt < start_dt:
-                                        end_dt = end_dt + pd.Timedelta(days=1)
-                                        end_iso = end_dt.isoformat()
-                                print(f"✅ End time parsed: {end_iso}")
+                        parsed_end = _combine_date_and_time(parsed_date, end_time)
+                        if parsed_end:
+                            # Fix next day if end < start
+                            if parsed_start and parsed_end < parsed_start:
+                                parsed_end = parsed_end + timedelta(days=1)
+                            end_iso = parsed_end.isoformat()
+                            logger.debug("✅ End time parsed: %s", end_iso)
                     except Exception as e:
-                        print(f"❌ End time parsing failed: {e}")
+                        logger.debug("❌ End time parsing failed: %s", e)
                 
                 # If we have a date but no time, still create a basic datetime for the date
-                if date_str and not start_iso:
-                    try:
-                        if "2020" in date_str or "2021" in date_str or "2022" in date_str or "2023" in date_str:
-                            parsed_date = dateparser.parse(date_str)
-                        elif "2024" not in date_str and "2025" not in date_str:
-                            parsed_date = dateparser.parse(f"{date_str}-2024")
-                        else:
-                            parsed_date = dateparser.parse(date_str)
-                        
-                        if parsed_date:
-                            # Set to midnight for date-only events
-                            start_iso = parsed_date.isoformat()
-                            print(f"📅 Date-only event parsed: {start_iso}")
-                    except Exception as e:
-                        print(f"❌ Date parsing failed: {e}")
+                if parsed_date and not start_iso:
+                    # Set to midnight for date-only events
+                    start_iso = parsed_date.isoformat()
+                    logger.debug("📅 Date-only event parsed: %s", start_iso)
                 
                 # Determine if this is a laytime event
                 event_text = str(event.get("event", "")).lower()
@@ -883,17 +1185,16 @@ EXTRACT ONLY REAL DATA FROM THE DOCUMENT. Return ONLY the JSON array with actual
                     "raw_line": str(event.get("raw_line", "")).strip()
                 })
             
-            print(f"🏆 Successfully normalized {len(normalized_events)} events from {filename}")
+            logger.info("🏆 Successfully normalized %s events from %s", len(normalized_events), filename)
             return normalized_events
             
         except json.JSONDecodeError as e:
-            print(f"❌ JSON parsing failed for {filename}: {e}")
-            print(f"Raw content: {content[:1000]}...")
+            logger.error("❌ JSON parsing failed for %s: %s", filename, e)
+            logger.debug("Raw content: %.1000s...", content)
             return []
             
     except Exception as e:
-        print(f"💥 Gemini extraction failed for {filename}: {e}")
-        traceback.print_exc()
+        logger.exception("💥 Gemini extraction failed for %s: %s", filename, e)
         return []
 
 
@@ -920,7 +1221,8 @@ REQUIRED FIELDS (return JSON object):
   "DEMURRAGE": "Demurrage rate (numbers only)",
   "DISPATCH": "Dispatch rate (numbers only)",
   "LOAD/DISCH": "Loading rate MT/day (numbers only)",
-  "CARGO QTY": "Cargo quantity MT (numbers only)"
+  "CARGO QTY": "Cargo quantity MT (numbers only)",
+  "LAYTIME TERMS": "Laytime terms such as SHINC, SHEX, SSHEX, WWD"
 }}
 
 EXTRACTION RULES:
@@ -937,7 +1239,7 @@ DOCUMENT: {filename}
 Return ONLY the JSON object:
 """
 
-        response = model.generate_content(prompt)
+        response = _generate_content(model, prompt, "summary")
         content = response.text.strip()
         
         # Extract JSON from response
@@ -945,15 +1247,15 @@ Return ONLY the JSON object:
         if json_match:
             try:
                 summary_data = json.loads(json_match.group())
-                print(f"Gemini extracted summary for {filename}: {len(summary_data)} fields")
+                logger.debug("Gemini extracted summary for %s: %s fields", filename, len(summary_data))
                 return summary_data
             except json.JSONDecodeError as e:
-                print(f"Summary JSON parsing failed: {e}")
+                logger.warning("Summary JSON parsing failed: %s", e)
         
         return {}
         
     except Exception as e:
-        print(f"Gemini summary extraction failed: {e}")
+        logger.error("Gemini summary extraction failed: %s", e)
         return {}
 
 
@@ -979,51 +1281,76 @@ def _post_process_events(events: List[Dict]) -> List[Dict]:
     return processed_events
 
 
+# Event linking patterns: start word -> end word
+_LINK_PATTERNS = {
+    'commenced': 'completed', 'started': 'finished', 'began': 'ended',
+    'connected': 'disconnected', 'opened': 'closed'
+}
+
+
+@traced("link_events")
 def _link_start_end_events(df: pd.DataFrame) -> pd.DataFrame:
-    """Link commenced/completed events to set proper end times."""
+    """
+    Link commenced/completed events to set proper end times.
+
+    Single pass over the sorted events. Open start events are kept per file in
+    FIFO queues keyed by (end word, object word), so each closing event finds the
+    earliest related open start without rescanning the rest of the file.
+    """
     if df.empty or 'start_time_iso' not in df.columns:
         return df
 
     df['_dt'] = pd.to_datetime(df['start_time_iso'], errors='coerce')
     df = df.sort_values(by=['filename', '_dt']).reset_index(drop=True)
 
-    # Event linking patterns
-    patterns = {
-        'commenced': 'completed', 'started': 'finished', 'began': 'ended',
-        'connected': 'disconnected', 'opened': 'closed'
-    }
-    
-    end_times = df['end_time_iso'].copy()
+    events = df['event'].tolist()
+    filenames = df['filename'].tolist()
+    has_end = df['end_time_iso'].notna().tolist()
+    starts = df['start_time_iso'].tolist()
+
+    end_times = df['end_time_iso'].tolist()
     rows_to_drop = set()
 
-    for i, row in df.iterrows():
-        if i in rows_to_drop or pd.notna(row['end_time_iso']):
+    open_queues: Dict[Tuple[str, str], deque] = {}   # (end word, object word) -> open start rows
+    linked_rows = set()                              # start rows that already found their end
+    current_file = object()
+
+    for i, event in enumerate(events):
+        if filenames[i] != current_file:
+            # Events never link across files
+            current_file = filenames[i]
+            open_queues.clear()
+
+        event_lower = event.lower()
+        tokens = set(event_lower.split())
+
+        # As a closing event: the earliest open start sharing an object word claims it
+        best_start = None
+        for end_word in _LINK_PATTERNS.values():
+            if end_word not in event_lower:
+                continue
+            for word in tokens - {end_word}:
+                queue = open_queues.get((end_word, word))
+                while queue and queue[0] in linked_rows:
+                    queue.popleft()
+                if queue and (best_start is None or queue[0] < best_start):
+                    best_start = queue[0]
+
+        if best_start is not None:
+            end_times[best_start] = starts[i]
+            linked_rows.add(best_start)
+            rows_to_drop.add(i)
+            logger.debug("Linked: '%s' → '%s'", events[best_start], event)
             continue
 
-        event_lower = row['event'].lower()
-        
-        # Look for start event patterns
-        for start_word, end_word in patterns.items():
+        if has_end[i]:
+            continue
+
+        # As an opening event: only the first matching start word is considered
+        for start_word, end_word in _LINK_PATTERNS.items():
             if start_word in event_lower:
-                # Find matching end event
-                for j, future_row in df.loc[i+1:].iterrows():
-                    if j in rows_to_drop:
-                        continue
-                    if future_row['filename'] != row['filename']:
-                        break
-                    
-                    future_event_lower = future_row['event'].lower()
-                    if end_word in future_event_lower:
-                        # Check if events are related (similar words)
-                        event_words = set(event_lower.split()) - {start_word}
-                        future_words = set(future_event_lower.split()) - {end_word}
-                        
-                        if len(event_words.intersection(future_words)) > 0:
-                            # Link the events
-                            end_times.iloc[i] = future_row['start_time_iso']
-                            rows_to_drop.add(j)
-                            print(f"Linked: '{row['event']}' → '{future_row['event']}'")
-                            break
+                for word in tokens - {start_word}:
+                    open_queues.setdefault((end_word, word), deque()).append(i)
                 break
 
     df['end_time_iso'] = end_times
@@ -1047,11 +1374,46 @@ def safe_float(value, default: float = 0.0) -> float:
         return default
 
 
-def calculate_laytime(summary: Dict[str, Any], events_df: pd.DataFrame) -> LaytimeResult:
-    """Calculate laytime with detailed logging."""
-    log = []
-    
-    # Extract key figures
+def laytime_flags(values) -> np.ndarray:
+    """
+    Event flags (laytime_counts, laytime_excluded) as a boolean mask. A flag is set only
+    when it equals True (a Python or numpy bool); missing values and strings are not set.
+    """
+    flags = values.astype(object) if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    return (flags == True).to_numpy(dtype=bool)
+
+
+_NS_PER_MINUTE = 60 * 1_000_000_000
+_NS_PER_HOUR = 60 * _NS_PER_MINUTE
+_NAT_NS = np.iinfo(np.int64).min
+
+
+def _datetime_ns(values: pd.Series) -> np.ndarray:
+    """Datetime column as int64 nanoseconds since epoch (NaT -> int64 min)."""
+    return values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def _durations_ns(start_ns: np.ndarray, end_ns: np.ndarray) -> np.ndarray:
+    """end - start in nanoseconds, 0 where either side is missing."""
+    valid = (start_ns != _NAT_NS) & (end_ns != _NAT_NS)
+    duration_ns = np.zeros(len(start_ns), dtype=np.int64)
+    duration_ns[valid] = end_ns[valid] - start_ns[valid]
+    return duration_ns
+
+
+def _format_hours_minutes(duration_ns: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """'HH:MM' labels for masked durations, empty strings elsewhere."""
+    labels = np.full(len(duration_ns), "", dtype=object)
+    if mask.any():
+        selected = duration_ns[mask]
+        hours = pd.Series(selected // _NS_PER_HOUR).astype(str).str.zfill(2)
+        minutes = pd.Series((selected % _NS_PER_HOUR) // _NS_PER_MINUTE).astype(str).str.zfill(2)
+        labels[mask] = (hours + ":" + minutes).to_numpy(dtype=object)
+    return labels
+
+
+def _laytime_allowed(summary: Dict[str, Any], log: List[str]) -> Tuple[float, float, float]:
+    """Allowed laytime in days plus the demurrage/dispatch rates from the voyage summary."""
     cargo_qty = safe_float(summary.get('CARGO QTY', 0))
     load_disch_rate = safe_float(summary.get('LOAD/DISCH', 0))
     demurrage_rate = safe_float(summary.get('DEMURRAGE', 0))
@@ -1060,55 +1422,114 @@ def calculate_laytime(summary: Dict[str, Any], events_df: pd.DataFrame) -> Layti
     log.append(f"Input values - Cargo: {cargo_qty} MT, Rate: {load_disch_rate} MT/day")
     log.append(f"Rates - Demurrage: ${demurrage_rate}/day, Dispatch: ${dispatch_rate}/day")
     
-    # Calculate allowed laytime
     if load_disch_rate > 0:
         allowed_days = cargo_qty / load_disch_rate
         log.append(f"Laytime Allowed: {cargo_qty} / {load_disch_rate} = {allowed_days:.4f} days")
     else:
         allowed_days = 0
         log.append("Error: Load/Discharge rate is zero")
+    return allowed_days, demurrage_rate, dispatch_rate
+
+
+def _parse_times(values: pd.Series, groups: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Parse a timestamp column in one call. pandas infers a single format for the whole
+    column, so when several voyages share it, groups whose rows failed to parse are
+    parsed again on their own, exactly as they would be in a single-voyage calculation.
+    """
+    parsed = pd.to_datetime(values, errors='coerce')
+    if groups is None:
+        return parsed
+    failed = parsed.isna() & values.notna()
+    if failed.any():
+        parsed = parsed.astype('datetime64[ns]')
+        for group in pd.unique(groups[failed]):
+            rows = groups == group
+            parsed[rows] = pd.to_datetime(values[rows], errors='coerce')
+    return parsed
+
+
+def _laytime_event_columns(events_df: pd.DataFrame,
+                           groups: Optional[pd.Series] = None) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]:
+    """Add start/end/duration/utilization columns; also returns the int64 ns start, end and duration arrays."""
+    df = events_df.copy()
+    df['start'] = _parse_times(df['start_time_iso'], groups)
+    df['end'] = _parse_times(df['end_time_iso'], groups)
     
-    # Calculate consumed time
-    if events_df.empty:
-        consumed_days = 0
-        log.append("Warning: No events found for time calculation")
+    # Calculate durations on int64 nanosecond arrays; a missing start/end counts as zero
+    start_ns = _datetime_ns(df['start'])
+    end_ns = _datetime_ns(df['end'])
+    duration_ns = _durations_ns(start_ns, end_ns)
+    df['duration'] = pd.to_timedelta(duration_ns, unit='ns')
+    positive = duration_ns > 0
+    
+    # Format duration for display
+    df['Duration'] = _format_hours_minutes(duration_ns, positive)
+    
+    # Laytime utilization
+    if 'laytime_counts' in df.columns:
+        counts_flag = df['laytime_counts'].to_numpy(dtype=object).astype(bool)
     else:
-        df = events_df.copy()
-        df['start'] = pd.to_datetime(df['start_time_iso'], errors='coerce')
-        df['end'] = pd.to_datetime(df['end_time_iso'], errors='coerce')
-        
-        # Calculate durations
-        df['duration'] = df.apply(
-            lambda row: row['end'] - row['start'] 
-            if pd.notna(row['start']) and pd.notna(row['end']) 
-            else pd.Timedelta(0), 
-            axis=1
-        )
-        
-        # Format duration for display
-        df['Duration'] = df['duration'].apply(
-            lambda td: f"{int(td.total_seconds() // 3600):02d}:{int((td.total_seconds() % 3600) // 60):02d}" 
-            if td.total_seconds() > 0 else ""
-        )
-        
-        # Laytime utilization
-        df['laytime_utilization_%'] = df.apply(
-            lambda row: 100 if row.get('laytime_counts', False) and row['duration'].total_seconds() > 0 else 0, 
-            axis=1
+        counts_flag = np.zeros(len(df), dtype=bool)
+    df['laytime_utilization_%'] = np.where(counts_flag & positive, 100, 0)
+    return df, start_ns, end_ns, duration_ns
+
+
+def _laytime_consumed(summary: Dict[str, Any], df: pd.DataFrame, start_ns: np.ndarray, end_ns: np.ndarray,
+                      duration_ns: np.ndarray, log: List[str]) -> Tuple[float, pd.DataFrame]:
+    """
+    Consumed laytime in days for one voyage's events: the union of counting intervals
+    minus the union of excluded ones, so overlapping operations count once.
+    """
+    positive = duration_ns > 0
+    labels = df['Event'] if 'Event' in df.columns else df.get('event', pd.Series(df.index.astype(str), index=df.index))
+    terms = parse_laytime_terms(summary)
+    
+    laytime_mask = laytime_flags(df['laytime_counts'])
+    if 'laytime_excluded' in df.columns:
+        excluded_mask = laytime_flags(df['laytime_excluded']) & positive
+    else:
+        excluded_mask = np.zeros(len(df), dtype=bool)
+    if terms.weather_excluded:
+        excluded_mask |= weather_event_mask(labels) & positive
+    counting_mask = laytime_mask & positive & ~excluded_mask
+    
+    exclusion_starts = start_ns[excluded_mask]
+    exclusion_ends = end_ns[excluded_mask]
+    if counting_mask.any() and terms.excludes_anything:
+        # Cached per port/year calendar masks (Sundays, holidays...) for the counting period
+        calendar_starts, calendar_ends = calendar_exclusions(
+            terms, summary, int(start_ns[counting_mask].min()), int(end_ns[counting_mask].max())
         )
-        
-        # Calculate consumed time (only laytime events)
-        laytime_durations = df[df['laytime_counts'] == True]['duration']
-        total_consumed_seconds = sum(td.total_seconds() for td in laytime_durations if td.total_seconds() > 0)
-        consumed_days = total_consumed_seconds / (24 * 3600)
-        
-        log.append(f"Laytime events found: {len(laytime_durations)}")
-        log.append(f"Time Consumed: {consumed_days:.4f} days")
-        
-        # Update events_df with calculated columns
-        events_df = df
+        exclusion_starts = np.concatenate([exclusion_starts, calendar_starts])
+        exclusion_ends = np.concatenate([exclusion_ends, calendar_ends])
     
-    # Calculate demurrage/dispatch
+    counted_ns = np.zeros(len(df), dtype=np.int64)
+    overlap_ns = np.zeros(len(df), dtype=np.int64)
+    excluded_ns = np.zeros(len(df), dtype=np.int64)
+    counted_ns[counting_mask], overlap_ns[counting_mask], excluded_ns[counting_mask] = attribute_intervals(
+        start_ns[counting_mask], end_ns[counting_mask], exclusion_starts, exclusion_ends,
+    )
+    total_consumed_seconds = int(counted_ns.sum()) / 1e9
+    consumed_days = total_consumed_seconds / (24 * 3600)
+    
+    attribution_df = attribution_table(df.index, labels, counting_mask, counted_ns, overlap_ns, excluded_ns)
+    
+    if terms.excludes_anything:
+        log.append(f"Laytime terms: {terms.describe()}")
+    log.append(f"Laytime events found: {int(laytime_mask.sum())}")
+    if overlap_ns.any():
+        log.append(f"Overlapping laytime counted once: {overlap_ns.sum() / NS_PER_DAY:.4f} days")
+    if excluded_ns.any():
+        log.append(f"Excluded periods: {excluded_ns.sum() / NS_PER_DAY:.4f} days")
+    log.append(f"Time Consumed: {consumed_days:.4f} days")
+    return consumed_days, attribution_df
+
+
+def _laytime_settlement(events_df: pd.DataFrame, allowed_days: float, consumed_days: float,
+                        demurrage_rate: float, dispatch_rate: float, log: List[str],
+                        attribution_df: Optional[pd.DataFrame]) -> LaytimeResult:
+    """Demurrage or dispatch from allowed vs consumed laytime."""
     time_diff = consumed_days - allowed_days
     
     if time_diff > 0:
@@ -1129,44 +1550,264 @@ def calculate_laytime(summary: Dict[str, Any], events_df: pd.DataFrame) -> Layti
         laytime_saved_days=time_saved_days,
         demurrage_due=demurrage_due,
         dispatch_due=dispatch_due,
-        calculation_log=log
+        calculation_log=log,
+        attribution_df=attribution_df
     )
 
 
+@traced("laytime")
+def calculate_laytime(summary: Dict[str, Any], events_df: pd.DataFrame) -> LaytimeResult:
+    """Calculate laytime with detailed logging."""
+    log = []
+    
+    # Extract key figures and calculate allowed laytime
+    allowed_days, demurrage_rate, dispatch_rate = _laytime_allowed(summary, log)
+    
+    # Calculate consumed time
+    attribution_df = None
+    if events_df.empty:
+        consumed_days = 0
+        log.append("Warning: No events found for time calculation")
+    else:
+        df, start_ns, end_ns, duration_ns = _laytime_event_columns(events_df)
+        consumed_days, attribution_df = _laytime_consumed(summary, df, start_ns, end_ns, duration_ns, log)
+        
+        # Update events_df with calculated columns
+        events_df = df
+    
+    # Calculate demurrage/dispatch
+    return _laytime_settlement(events_df, allowed_days, consumed_days, demurrage_rate, dispatch_rate, log, attribution_df)
+
+
+_LAYTIME_REQUIRED_COLUMNS = ('start_time_iso', 'end_time_iso', 'laytime_counts')
+_LAYTIME_COMPUTED_COLUMNS = ('start', 'end', 'duration', 'Duration', 'laytime_utilization_%')
+
+
+def calculate_laytime_batch(voyages: List[Tuple[str, Dict[str, Any], pd.DataFrame]]
+                            ) -> Iterator[Tuple[str, Union[LaytimeResult, Exception]]]:
+    """
+    Calculate laytime for many voyages at once.
+
+    All voyages' events are parsed and get their duration columns in a single
+    vectorized pass; the frame is then split per voyage for the interval and
+    settlement steps. If the shared pass fails (e.g. one voyage's timestamps carry a
+    UTC offset and cannot share a column with naive ones), each voyage's columns are
+    computed on its own instead, so only a voyage that fails by itself is affected.
+    Results are yielded in request order as (voyage_id, result), where a voyage that
+    fails yields its exception instead of stopping the batch.
+    """
+    frames = []
+    errors: Dict[int, Exception] = {}
+    bounds: Dict[int, slice] = {}
+    offset = 0
+    for position, (voyage_id, summary, events_df) in enumerate(voyages):
+        missing = [col for col in _LAYTIME_REQUIRED_COLUMNS if col not in events_df.columns]
+        if events_df.empty:
+            errors[position] = ValueError("No events provided for calculation")
+        elif missing:
+            errors[position] = ValueError(f"Missing event columns: {', '.join(missing)}")
+        else:
+            frames.append(events_df.assign(_voyage=position))
+            bounds[position] = slice(offset, offset + len(events_df))
+            offset += len(events_df)
+    
+    shared = None
+    if frames:
+        # Each voyage occupies a contiguous block of rows in the combined frame
+        combined = pd.concat(frames, ignore_index=True)
+        try:
+            shared = _laytime_event_columns(combined, combined['_voyage'])
+        except Exception as e:
+            logger.warning("Shared laytime pass failed for %d voyages, parsing each on its own: %s",
+                           len(frames), e)
+    
+    for position, (voyage_id, summary, events_df) in enumerate(voyages):
+        if position in errors:
+            yield voyage_id, errors[position]
+            continue
+        try:
+            log = []
+            allowed_days, demurrage_rate, dispatch_rate = _laytime_allowed(summary, log)
+            if shared is None:
+                df, start_ns, end_ns, duration_ns = _laytime_event_columns(events_df)
+            else:
+                combined, start_ns, end_ns, duration_ns = shared
+                rows = bounds[position]
+                # Keep only this voyage's own columns; the concatenation unions them across voyages
+                columns = list(events_df.columns) + [col for col in _LAYTIME_COMPUTED_COLUMNS if col not in events_df.columns]
+                df = combined.iloc[rows][columns].infer_objects().reset_index(drop=True)
+                start_ns, end_ns, duration_ns = start_ns[rows], end_ns[rows], duration_ns[rows]
+            consumed_days, attribution_df = _laytime_consumed(
+                summary, df, start_ns, end_ns, duration_ns, log
+            )
+            yield voyage_id, _laytime_settlement(
+                df, allowed_days, consumed_days, demurrage_rate, dispatch_rate, log, attribution_df
+            )
+        except Exception as e:
+            yield voyage_id, e
+
+
+# ==============================================================================
+# 🧾 FINAL EVENT FRAME
+# ==============================================================================
+
+def _format_event_dates(starts: pd.Series) -> pd.Series:
+    """'Thu, 22 Aug 2024' per start time ('No Date' when missing); each distinct day is formatted once."""
+    codes, days = pd.factorize(starts.dt.normalize())
+    labels = np.append(np.asarray(days.strftime('%a, %d %b %Y'), dtype=object), 'No Date')
+    return pd.Series(labels[codes], index=starts.index)
+
+
+def _format_durations(starts: pd.Series, ends: pd.Series) -> pd.Series:
+    """'<h>h <m>m' between start and end (floored like Python's //), '' when either is missing."""
+    seconds = (ends - starts).dt.total_seconds().to_numpy()
+    valid = ~np.isnan(seconds)
+    hours = np.floor_divide(seconds[valid], 3600).astype(np.int64).astype(str)
+    minutes = np.floor_divide(np.mod(seconds[valid], 3600), 60).astype(np.int64).astype(str)
+    durations = np.full(len(seconds), "", dtype=object)
+    durations[valid] = np.char.add(np.char.add(hours, 'h '), np.char.add(minutes, 'm'))
+    return pd.Series(durations, index=starts.index)
+
+
+def _format_laytime_days(starts: pd.Series, ends: pd.Series, counts: Optional[pd.Series]) -> pd.Series:
+    """Event length in days ('%.4f') for events that count towards laytime, '0.0000' otherwise."""
+    seconds = (ends - starts).dt.total_seconds().to_numpy()
+    # Same truthiness as row.get('laytime_counts', False): a missing flag (NaN) is truthy
+    counted = ~np.isnan(seconds)
+    counted &= counts.to_numpy(dtype=object).astype(bool) if counts is not None else False
+    laytime = np.full(len(seconds), "0.0000", dtype=object)
+    laytime[counted] = np.char.mod('%.4f', seconds[counted] / 86400)
+    return pd.Series(laytime, index=starts.index)
+
+
+def _final_events_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Linked, sorted pipeline events in the output column layout, built column by column."""
+    starts = pd.to_datetime(df['start_time_iso'], errors='coerce')
+    ends = pd.to_datetime(df['end_time_iso'], errors='coerce')
+    return pd.DataFrame({
+        'Event': df['event'],
+        'start_time_iso': starts,
+        'end_time_iso': ends,
+        'Date': _format_event_dates(starts),
+        'Duration': _format_durations(starts, ends),
+        'Laytime': _format_laytime_days(starts, ends, df.get('laytime_counts')),
+        'Raw Line': df['raw_line'],
+        'Filename': df['filename'],
+        'laytime_counts': df['laytime_counts'],
+    })
+
+
+def _parse_edited_times(values: pd.Series) -> Tuple[pd.Series, bool]:
+    """
+    Hand-entered timestamps in any format, and whether they were all naive; ones with
+    a UTC offset become naive UTC.
+    """
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    if pd.api.types.is_datetime64_dtype(parsed):
+        return parsed, True
+    return pd.to_datetime(values, errors='coerce', format='mixed', utc=True).dt.tz_localize(None), False
+
+
+def refresh_edited_events(events_df: pd.DataFrame, edited: np.ndarray) -> pd.DataFrame:
+    """
+    Date, Duration and Laytime of manually added or edited events, recomputed from
+    their timestamps in the pipeline's output format; an edited event without a raw
+    line gets one describing it. Rows not marked in `edited` are left as extracted.
+    """
+    edited = np.asarray(edited, dtype=bool)
+    if not edited.any():
+        return events_df
+    df = events_df.copy()
+    rows = df.loc[edited]
+    missing = pd.Series(None, index=rows.index, dtype=object)
+    starts, naive_starts = _parse_edited_times(rows.get('start_time_iso', missing))
+    ends, naive_ends = _parse_edited_times(rows.get('end_time_iso', missing))
+    # Edited events may lack the flag; count them only when it is set, as calculate_laytime does
+    counts = pd.Series(laytime_flags(rows.get('laytime_counts', missing)), index=rows.index)
+    names = rows.get('Event', missing).fillna('Event').astype(str)
+    described = names + ': ' + starts.dt.strftime('%Y-%m-%d %H:%M').fillna('Unknown') + \
+        ' to ' + ends.dt.strftime('%Y-%m-%d %H:%M').fillna('Unknown')
+    raw_lines = rows.get('Raw Line', missing)
+    refreshed = {
+        'Date': _format_event_dates(starts),
+        'Duration': _format_durations(starts, ends),
+        'Laytime': _format_laytime_days(starts, ends, counts),
+        'Raw Line': raw_lines.where(raw_lines.notna() & raw_lines.astype(str).str.strip().ne(''), described),
+    }
+    # Naive timestamps are written like the extracted ones, so the column parses in one format
+    for column, parsed, naive in (('start_time_iso', starts, naive_starts), ('end_time_iso', ends, naive_ends)):
+        if column in df.columns and naive:
+            df[column] = df[column].astype(object)
+            df.loc[edited, column] = parsed.dt.strftime('%Y-%m-%dT%H:%M:%S').where(
+                parsed.notna(), rows[column]).to_numpy(dtype=object)
+    for column, values in refreshed.items():
+        if column not in df.columns:
+            df[column] = None
+        df[column] = df[column].astype(object)
+        df.loc[edited, column] = values.to_numpy(dtype=object)
+    return df
+
+
 # ==============================================================================
 # 🚀 MAIN EXTRACTION PIPELINE
 # ==============================================================================
 
-def extract_events_and_summary(docs: List[IngestedDoc], gemini_api_key: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
-    """Main pipeline: extract events and summary using Gemini AI."""
+def extract_summary(doc: IngestedDoc, gemini_api_key: str) -> Dict[str, str]:
+    """Voyage summary of one document."""
+    # Header fields such as the vessel name often carry no keyword, so only de-noise them
+    summary_text, _ = _minimize_prompt_text(doc.pages, keep_unsignalled=True)
+    return _gemini_extract_summary(summary_text, doc.filename, gemini_api_key)
+
+
+def extract_events_and_summary(docs: List[IngestedDoc], gemini_api_key: str, progress: ProgressCallback = None,
+                               summarize: bool = True) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Main pipeline: extract events and summary using Gemini AI (summarize=False skips the summary)."""
     if not gemini_api_key:
         raise ValueError("Gemini API key is required!")
     
     all_events = []
     summary_data = {}
     
+    prompted = []
     for doc in docs:
         if not doc.combined_text.strip():
-            print(f"Skipping empty document: {doc.filename}")
+            logger.info("Skipping empty document: %s", doc.filename)
             continue
             
-        print(f"Processing: {doc.filename} ({len(doc.combined_text)} chars)")
+        logger.debug("Processing: %s (%s chars)", doc.filename, len(doc.combined_text))
         
-        # Extract events using Gemini
-        events = _gemini_extract_events(doc.combined_text, doc.filename, gemini_api_key)
+        # Strip repeated letterheads, separators and signal-free lines before prompting
+        events_text, doc.prompt_stats = _minimize_prompt_text(doc.pages)
+        _report_prompt_reduction(doc.filename, doc.prompt_stats)
+        prompted.append((doc, events_text))
+    
+    # Extract events using Gemini, all documents at once; results are collected in document order
+    _report(progress, "llm", documents=len(prompted))
+    pool = _llm_pool()
+    event_futures = [pool.submit(bind(_gemini_extract_events), text, doc.filename, gemini_api_key) for doc, text in prompted]
+    
+    # Extract summary (only from first document or if empty)
+    summary_future = pool.submit(bind(extract_summary), prompted[0][0], gemini_api_key) if prompted and summarize else None
+    
+    for (doc, _), future in zip(prompted, event_futures):
+        events = future.result()
         if events:
             all_events.extend(events)
-            print(f"Extracted {len(events)} events from {doc.filename}")
-        
-        # Extract summary (only from first document or if empty)
-        if not summary_data:
-            summary_data = _gemini_extract_summary(doc.combined_text, doc.filename, gemini_api_key)
+            logger.info("Extracted %s events from %s", len(events), doc.filename)
+    
+    if summary_future is not None:
+        summary_data = summary_future.result()
+        for doc, _ in prompted[1:]:
+            if summary_data:
+                break
+            summary_data = extract_summary(doc, gemini_api_key)
     
     if not all_events:
-        print("Warning: No events extracted from any document")
+        logger.warning("No events extracted from any document")
         return pd.DataFrame(), summary_data
     
     # Post-process events
+    _report(progress, "linking", events=len(all_events))
     processed_events = _post_process_events(all_events)
     df = pd.DataFrame(processed_events)
     
@@ -1180,61 +1821,9 @@ def extract_events_and_summary(docs: List[IngestedDoc], gemini_api_key: str) ->
     
     # Create final output format with proper columns
     if not df.empty:
-        final_df = pd.DataFrame()
-        
-        final_df['Event'] = df['event']
-        # Keep the datetime columns as expected by Streamlit - handle None values properly
-        final_df['start_time_iso'] = pd.to_datetime(df['start_time_iso'], errors='coerce')
-        final_df['end_time_iso'] = pd.to_datetime(df['end_time_iso'], errors='coerce')
-        
-        # Create a readable Date column from start_time_iso
-        final_df['Date'] = final_df['start_time_iso'].apply(lambda x: 
-            x.strftime('%a, %d %b %Y') if pd.notna(x) else 'No Date'
-        )
-        
-        # Calculate duration between start and end times
-        final_df['Duration'] = final_df.apply(lambda row:
-            f"{int((row['end_time_iso'] - row['start_time_iso']).total_seconds() // 3600)}h {int(((row['end_time_iso'] - row['start_time_iso']).total_seconds() % 3600) // 60)}m" 
-            if pd.notna(row['start_time_iso']) and pd.notna(row['end_time_iso'])
-            else "", axis=1
-        )
-        
-        # Add Laytime column - calculate actual laytime duration for laytime events
-        final_df['Laytime'] = df.apply(lambda row: 
-            f"{(pd.to_datetime(row['end_time_iso'], errors='coerce') - pd.to_datetime(row['start_time_iso'], errors='coerce')).total_seconds() / 86400:.4f}" 
-            if pd.notna(pd.to_datetime(row['start_time_iso'], errors='coerce')) and pd.notna(pd.to_datetime(row['end_time_iso'], errors='coerce')) and row.get('laytime_counts', False)
-            else "0.0000", axis=1
-        )
-        
-        # Keep essential columns for Streamlit
-        final_df['Raw Line'] = df['raw_line']
-        final_df['Filename'] = df['filename']
-        final_df['laytime_counts'] = df['laytime_counts']
-        
-        # Debug: Print sample data to verify columns
-        print("🔍 FINAL DATAFRAME COLUMNS:", list(final_df.columns))
-        if not final_df.empty:
-            print("🔍 SAMPLE ROW DATA:")
-            sample_row = final_df.iloc[0]
-            print(f"   Event: {sample_row.get('Event', 'N/A')}")
-            print(f"   Date: {sample_row.get('Date', 'N/A')}")
-            print(f"   start_time_iso: {sample_row.get('start_time_iso', 'N/A')}")
-            print(f"   end_time_iso: {sample_row.get('end_time_iso', 'N/A')}")
-            # Check if we have valid times in other rows
-            valid_times = final_df[pd.notna(final_df['start_time_iso'])]
-            if not valid_times.empty:
-                print("🔍 SAMPLE ROW WITH VALID TIME:")
-                valid_sample = valid_times.iloc[0]
-                print(f"   Event: {valid_sample.get('Event', 'N/A')}")
-                print(f"   Date: {valid_sample.get('Date', 'N/A')}")  
-                print(f"   start_time_iso: {valid_sample.get('start_time_iso', 'N/A')}")
-                print(f"   end_time_iso: {valid_sample.get('end_time_iso', 'N/A')}")
-            else:
-                print("❌ NO VALID TIMES FOUND IN ANY ROW!")
-        
-        df = final_df
+        df = _final_events_frame(df)
     
-    print(f"Final result: {len(df)} events processed")
+    logger.info("Final result: %s events processed", len(df))
     return df, summary_data
 
 
@@ -1261,13 +1850,15 @@ def _calculate_duration_from_times(start_time_iso: str, end_time_iso: str) -> st
         return ""
 
 
-def process_clicked_pdf_enhanced(pdf_bytes: bytes, filename: str, api_key: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+def process_clicked_pdf_enhanced(pdf_source: DocumentSource, filename: str, api_key: str,
+                                 progress: ProgressCallback = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
     """
     🎯 SPECIALIZED FUNCTION FOR CLICKED PDFs - HIGH ACCURACY PROCESSING
     This function is specifically designed for clicked/scanned PDFs with tabular data
     """
     try:
-        print(f"🎯 CLICKED PDF ENHANCED PROCESSING: {filename}")
+        logger.info("🎯 CLICKED PDF ENHANCED PROCESSING: %s", filename)
+        _report(progress, "ingest", file=filename, index=1, files=1)
         
         # Step 1: Enhanced PDF to text extraction with multiple methods
         pages_text = []
@@ -1277,14 +1868,14 @@ def process_clicked_pdf_enhanced(pdf_bytes: bytes, filename: str, api_key: str)
         
         # Method 1: Try pdfplumber first for structured data
         try:
-            with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            with pdfplumber.open(_as_file(pdf_source)) as pdf:
                 for i, page in enumerate(pdf.pages):
-                    print(f"📄 Processing page {i+1} with pdfplumber...")
+                    logger.debug("📄 Processing page %s with pdfplumber...", i+1)
                     
                     # Try table extraction first
                     tables = page.extract_tables()
                     if tables:
-                        print(f"✅ Found {len(tables)} tables on page {i+1}")
+                        logger.debug("✅ Found %s tables on page %s", len(tables), i+1)
                         table_text = ""
                         for table in tables:
                             for row in table:
@@ -1297,19 +1888,20 @@ def process_clicked_pdf_enhanced(pdf_bytes: bytes, filename: str, api_key: str)
                         text = page.extract_text()
                         if text and text.strip():
                             pages_text.append(text.strip())
-                            print(f"✅ Page {i+1}: pdfplumber extracted {len(text)} chars")
+                            logger.debug("✅ Page %s: pdfplumber extracted %s chars", i+1, len(text))
         except Exception as e:
-            print(f"⚠️ pdfplumber failed: {e}")
+            logger.warning("⚠️ pdfplumber failed: %s", e)
         
         # Method 2: If pdfplumber failed or gave poor results, try OCR with optimized settings
         if not pages_text or all(len(page) < 100 for page in pages_text):
-            print("🔍 pdfplumber results insufficient, trying ENHANCED OCR...")
+            logger.debug("🔍 pdfplumber results insufficient, trying ENHANCED OCR...")
             
             try:
-                pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                pdf_doc = _open_pdf(pdf_source)
                 
                 for page_num in range(len(pdf_doc)):
-                    print(f"📄 OCR processing page {page_num+1}...")
+                    logger.debug("📄 OCR processing page %s...", page_num+1)
+                    _report(progress, "ocr", file=filename, page=page_num + 1, pages=len(pdf_doc))
                     
                     page_obj = pdf_doc[page_num]
                     # Use moderate 3x scaling for clicked PDFs (balance between quality and performance)
@@ -1323,57 +1915,62 @@ def process_clicked_pdf_enhanced(pdf_bytes: bytes, filename: str, api_key: str)
                     
                     if ocr_text and ocr_text.strip():
                         pages_text.append(ocr_text.strip())
-                        print(f"✅ Page {page_num+1}: Enhanced OCR extracted {len(ocr_text)} chars")
+                        logger.debug("✅ Page %s: Enhanced OCR extracted %s chars", page_num+1, len(ocr_text))
                 
                 pdf_doc.close()
             except Exception as e:
-                print(f"💥 Enhanced OCR failed: {e}")
+                logger.warning("💥 Enhanced OCR failed: %s", e)
                 return pd.DataFrame(), {}
         
         # Combine all pages
         combined_text = "\n\n".join(pages_text)
-        print(f"📝 Combined text: {len(combined_text)} characters")
+        logger.debug("📝 Combined text: %s characters", len(combined_text))
         
         if not combined_text.strip():
-            print("❌ No text extracted from clicked PDF")
+            logger.warning("❌ No text extracted from clicked PDF")
             return pd.DataFrame(), {}
         
         # Step 2: Enhanced Gemini extraction with clicked PDF specific prompt
-        events = _gemini_extract_clicked_pdf_events(combined_text, filename, api_key)
+        events_text, prompt_stats = _minimize_prompt_text(pages_text)
+        _report_prompt_reduction(filename, prompt_stats)
+        # The summary prompt only needs the page text, so it runs alongside the events prompt
+        summary_text, _ = _minimize_prompt_text(pages_text, keep_unsignalled=True)
+        _report(progress, "llm", documents=1)
+        summary_future = _llm_pool().submit(bind(_gemini_extract_summary), summary_text, filename, api_key)
+        events = _gemini_extract_clicked_pdf_events(events_text, filename, api_key)
         
         if not events:
-            print("❌ No events extracted from clicked PDF")
+            logger.warning("❌ No events extracted from clicked PDF")
             return pd.DataFrame(), {}
         
         # Step 3: Create DataFrame with proper structure
-        print(f"✅ Events extracted successfully: {len(events)} events ready for DataFrame creation")
+        logger.debug("✅ Events extracted successfully: %s events ready for DataFrame creation", len(events))
         
         # Convert to proper DataFrame format
         df = pd.DataFrame(events)
         
         # Ensure all required columns exist
         if 'laytime_counts' not in df.columns:
-            df['laytime_counts'] = df['Laytime'].apply(lambda x: x == 'Yes')
+            df['laytime_counts'] = df['Laytime'].eq('Yes')
         
         # Fill any missing Duration values
         if 'Duration' in df.columns:
             df['Duration'] = df['Duration'].fillna("")
         
-        print(f"🎯 DataFrame created with {len(df)} events and columns: {list(df.columns)}")
-        print(f"📊 Sample row: {df.iloc[0].to_dict() if len(df) > 0 else 'No data'}")
+        logger.debug("🎯 DataFrame created with %s events and columns: %s", len(df), list(df.columns))
         
         # Step 4: Generate summary
-        summary = _gemini_extract_summary(combined_text, filename, api_key)
+        summary = summary_future.result()
         
-        print(f"🎯 CLICKED PDF PROCESSING COMPLETE: {len(events)} events extracted")
+        logger.info("🎯 CLICKED PDF PROCESSING COMPLETE: %s events extracted", len(events))
         return df, summary
         
     except Exception as e:
-        print(f"💥 CLICKED PDF PROCESSING FAILED: {e}")
-        traceback.print_exc()
+        logger.exception("💥 CLICKED PDF PROCESSING FAILED: %s", e)
         return pd.DataFrame(), {}
 
 
+@traced("ocr_enhanced")
 def _enhanced_clicked_pdf_ocr(img: Image.Image) -> str:
     """Enhanced OCR specifically for clicked PDFs with tabular data"""
     try:
@@ -1389,7 +1986,7 @@ def _enhanced_clicked_pdf_ocr(img: Image.Image) -> str:
             
         import numpy as np
         
-        print(f"🔍 Enhanced OCR processing for clicked PDF...")
+        logger.debug("🔍 Enhanced OCR processing for clicked PDF...")
         
         if not CV2_AVAILABLE:
             # Fallback to basic OCR without image preprocessing
@@ -1419,9 +2016,9 @@ def _enhanced_clicked_pdf_ocr(img: Image.Image) -> str:
             if simple_text and len(simple_text.strip()) > best_length:
                 best_text = simple_text.strip()
                 best_length = len(best_text)
-                print(f"✅ Simple OCR: {best_length} chars")
+                logger.debug("✅ Simple OCR: %s chars", best_length)
         except Exception as e:
-            print(f"⚠️ Simple OCR failed: {e}")
+            logger.debug("⚠️ Simple OCR failed: %s", e)
         
         # Method 2: Enhanced preprocessing
         try:
@@ -1443,9 +2040,9 @@ def _enhanced_clicked_pdf_ocr(img: Image.Image) -> str:
             if enhanced_text and len(enhanced_text.strip()) > best_length:
                 best_text = enhanced_text.strip()
                 best_length = len(best_text)
-                print(f"✅ Enhanced OCR: {best_length} chars")
+                logger.debug("✅ Enhanced OCR: %s chars", best_length)
         except Exception as e:
-            print(f"⚠️ Enhanced OCR failed: {e}")
+            logger.debug("⚠️ Enhanced OCR failed: %s", e)
         
         # Method 3: Binary threshold OCR
         try:
@@ -1463,69 +2060,73 @@ def _enhanced_clicked_pdf_ocr(img: Image.Image) -> str:
             if binary_text and len(binary_text.strip()) > best_length:
                 best_text = binary_text.strip()
                 best_length = len(best_text)
-                print(f"✅ Binary OCR: {best_length} chars")
+                logger.debug("✅ Binary OCR: %s chars", best_length)
         except Exception as e:
-            print(f"⚠️ Binary OCR failed: {e}")
+            logger.debug("⚠️ Binary OCR failed: %s", e)
         
         if best_text:
-            print(f"🎯 Best OCR result: {best_length} characters")
-            print(f"📄 Sample: {best_text[:200]}...")
+            logger.debug("🎯 Best OCR result: %s characters", best_length)
+            logger.debug("📄 Sample: %.200s...", best_text)
             return best_text
         else:
-            print("❌ All OCR methods failed")
+            logger.warning("❌ All OCR methods failed")
             return ""
         
     except Exception as e:
-        print(f"⚠️ Enhanced clicked PDF OCR failed: {e}")
-        traceback.print_exc()
+        logger.exception("⚠️ Enhanced clicked PDF OCR failed: %s", e)
         return ""
 
 
+def _dedup_name_key(event_name: str) -> str:
+    """Normalized event name used for duplicate matching."""
+    # Remove common words to focus on key terms
+    clean_name = event_name.replace("at", "").replace("the", "").replace("and", "")
+    return " ".join(clean_name.split())  # normalize whitespace
+
+
 def _deduplicate_events(events: List[Dict]) -> List[Dict]:
-    """Remove duplicate events based on event name and time similarity"""
+    """
+    Remove duplicate events based on event name and time similarity.
+
+    Two events are duplicates when they share the same time signature (date + hour)
+    and one normalized name contains the other. Seen names are bucketed by time
+    signature, so each event is only compared with events from the same hour.
+    Events without an hour (no start time, or a date only) would all share one
+    bucket, so they are only matched on their exact normalized name.
+    """
     if not events:
         return events
     
-    print(f"🧹 Deduplicating {len(events)} events...")
+    logger.debug("🧹 Deduplicating %s events...", len(events))
     unique_events = []
-    seen_signatures = set()
+    # time signature -> (exact names, names in first-seen order)
+    buckets: Dict[str, Tuple[set, List[str]]] = {}
     
     for event in events:
-        event_name = event.get("Event", "").lower().strip()
-        start_time = event.get("start_time_iso", "")
-        
-        # Create signature for similarity check
-        # Remove common words to focus on key terms
-        clean_name = event_name.replace("at", "").replace("the", "").replace("and", "")
-        clean_name = " ".join(clean_name.split())  # normalize whitespace
+        event_name = (event.get("Event") or "").lower().strip()
+        start_time = event.get("start_time_iso") or ""
         
+        clean_name = _dedup_name_key(event_name)
         # Create time signature (date + hour)
-        time_signature = ""
-        if start_time:
-            try:
-                time_signature = start_time[:13]  # YYYY-MM-DD HH
-            except:
-                pass
-        
-        signature = f"{clean_name}_{time_signature}"
-        
-        # Check for similar events
-        is_duplicate = False
-        for seen_sig in seen_signatures:
-            # Simple similarity check
-            seen_name = seen_sig.split("_")[0]
-            if (len(clean_name) > 0 and len(seen_name) > 0 and 
-                (clean_name in seen_name or seen_name in clean_name) and
-                time_signature == seen_sig.split("_")[1]):
-                is_duplicate = True
-                print(f"⚠️ Duplicate detected: '{event_name}' similar to existing event")
-                break
+        time_signature = str(start_time)[:13]  # YYYY-MM-DD HH
+        
+        hourly = len(time_signature) == 13
         
-        if not is_duplicate:
-            unique_events.append(event)
-            seen_signatures.add(signature)
+        if clean_name:
+            exact_names, ordered_names = buckets.setdefault(time_signature, (set(), []))
+            is_duplicate = clean_name in exact_names or (hourly and any(
+                clean_name in seen_name or seen_name in clean_name for seen_name in ordered_names
+            ))
+            if is_duplicate:
+                logger.debug("⚠️ Duplicate detected: '%s' similar to existing event", event_name)
+                continue
+            exact_names.add(clean_name)
+            if hourly:
+                ordered_names.append(clean_name)
+        
+        unique_events.append(event)
         
-    print(f"✅ Deduplication complete: {len(events)} → {len(unique_events)} events")
+    logger.debug("✅ Deduplication complete: %s → %s events", len(events), len(unique_events))
     return unique_events
 
 
@@ -1591,9 +2192,9 @@ DOCUMENT TEXT:
 Return 6-10 UNIQUE events with VALID times. Return ONLY the JSON array.
 """
 
-        response = model.generate_content(prompt)
+        response = _generate_content(model, prompt, "clicked_events")
         content = response.text.strip()
-        print(f"🤖 Clicked PDF Gemini response length: {len(content)}")
+        logger.debug("🤖 Clicked PDF Gemini response length: %s", len(content))
         
         # Clean response
         content = content.replace('```json', '').replace('```', '').strip()
@@ -1601,13 +2202,13 @@ Return 6-10 UNIQUE events with VALID times. Return ONLY the JSON array.
         # Extract JSON
         json_match = re.search(r'\[.*?\]', content, re.DOTALL)
         if not json_match:
-            print(f"❌ No JSON found in clicked PDF response")
-            print(f"Raw response: {content[:500]}...")
+            logger.warning("❌ No JSON found in clicked PDF response")
+            logger.debug("Raw response: %.500s...", content)
             return []
         
         try:
             events_data = json.loads(json_match.group())
-            print(f"🎯 Clicked PDF Gemini extracted {len(events_data)} raw events")
+            logger.debug("🎯 Clicked PDF Gemini extracted %s raw events", len(events_data))
             
             # Normalize events with PROPER date/time parsing
             normalized_events = []
@@ -1615,7 +2216,7 @@ Return 6-10 UNIQUE events with VALID times. Return ONLY the JSON array.
                 if not event.get("event"):
                     continue
                 
-                print(f"📅 Processing clicked PDF event {i+1}: {event.get('event')} | Date: {event.get('date')} | Start: {event.get('start_time')} | End: {event.get('end_time')}")
+                logger.debug("📅 Processing clicked PDF event %s: %s | Date: %s | Start: %s | End: %s", i+1, event.get('event'), event.get('date'), event.get('start_time'), event.get('end_time'))
                 
                 # Parse datetime with enhanced logic
                 start_time_iso = None
@@ -1630,43 +2231,40 @@ Return 6-10 UNIQUE events with VALID times. Return ONLY the JSON array.
                 if date_str:
                     try:
                         # Try to parse the date
-                        parsed_date = dateparser.parse(date_str, settings={'PREFER_DAY_OF_MONTH': 'first'})
+                        parsed_date = _parse_date_cached(str(date_str).strip(), prefer_first_day=True)
                         if parsed_date:
                             display_date = parsed_date.strftime("%a, %d %b %Y")
-                            base_date = parsed_date.strftime("%Y-%m-%d")
                             
                             # Parse start time
                             if start_time_str and start_time_str.lower() != "none":
                                 try:
-                                    combined_start = f"{base_date} {start_time_str}"
-                                    parsed_start = dateparser.parse(combined_start)
+                                    parsed_start = _combine_date_and_time(parsed_date, str(start_time_str).strip())
                                     if parsed_start:
                                         start_time_iso = parsed_start.isoformat()
-                                        print(f"✅ Start time parsed: {start_time_iso}")
+                                        logger.debug("✅ Start time parsed: %s", start_time_iso)
                                     else:
-                                        print(f"⚠️ Start time parsing failed: {start_time_str}")
+                                        logger.debug("⚠️ Start time parsing failed: %s", start_time_str)
                                 except:
-                                    print(f"⚠️ Start time format issue: {start_time_str}")
+                                    logger.debug("⚠️ Start time format issue: %s", start_time_str)
                             
                             # Parse end time
                             if end_time_str and end_time_str.lower() != "none":
                                 try:
-                                    combined_end = f"{base_date} {end_time_str}"
-                                    parsed_end = dateparser.parse(combined_end)
+                                    parsed_end = _combine_date_and_time(parsed_date, str(end_time_str).strip())
                                     if parsed_end:
                                         end_time_iso = parsed_end.isoformat()
-                                        print(f"✅ End time parsed: {end_time_iso}")
+                                        logger.debug("✅ End time parsed: %s", end_time_iso)
                                     else:
-                                        print(f"⚠️ End time parsing failed: {end_time_str}")
+                                        logger.debug("⚠️ End time parsing failed: %s", end_time_str)
                                 except:
-                                    print(f"⚠️ End time format issue: {end_time_str}")
+                                    logger.debug("⚠️ End time format issue: %s", end_time_str)
                             
                         else:
-                            print(f"⚠️ Date parsing failed: {date_str}")
+                            logger.debug("⚠️ Date parsing failed: %s", date_str)
                     except Exception as e:
-                        print(f"⚠️ Date processing error: {e}")
+                        logger.debug("⚠️ Date processing error: %s", e)
                 else:
-                    print(f"⚠️ No date provided for event: {event.get('event')}")
+                    logger.debug("⚠️ No date provided for event: %s", event.get('event'))
                 
                 # Calculate duration if both times available
                 duration = ""
@@ -1692,25 +2290,23 @@ Return 6-10 UNIQUE events with VALID times. Return ONLY the JSON array.
                     "laytime_counts": event.get("laytime_counts", False)
                 })
             
-            print(f"🎯 Successfully normalized {len(normalized_events)} clicked PDF events")
+            logger.info("🎯 Successfully normalized %s clicked PDF events", len(normalized_events))
             
             # Step 4: Deduplicate events based on similarity
             deduplicated_events = _deduplicate_events(normalized_events)
-            print(f"🧹 After deduplication: {len(deduplicated_events)} unique events")
+            logger.debug("🧹 After deduplication: %s unique events", len(deduplicated_events))
             
             return deduplicated_events
             
         except json.JSONDecodeError as e:
-            print(f"❌ JSON parsing failed for clicked PDF: {e}")
-            print(f"Content that failed: {content[:1000]}...")
+            logger.error("❌ JSON parsing failed for clicked PDF: %s", e)
+            logger.debug("Content that failed: %.1000s...", content)
             return []
         
     except Exception as e:
-        print(f"💥 Clicked PDF Gemini extraction failed: {e}")
-        traceback.print_exc()
+        logger.exception("💥 Clicked PDF Gemini extraction failed: %s", e)
         return []
 
 
-print("🚀 ULTRA-ENHANCED SOF PIPELINE LOADED SUCCESSFULLY! 🚀")
-print("Features: PDF/DOCX/Image processing, Ultra OCR, Gemini AI, Laytime calculation")
-print("🎯 NEW: Specialized Clicked PDF Processing Available!")
+logger.debug("🚀 SoF pipeline loaded: PDF/DOCX/Image processing, Ultra OCR, Gemini AI, "
+             "laytime calculation, clicked PDF processing")
@@ -0,0 +1,259 @@
+"""
+Pipeline tracing
+Lightweight spans for finding where a job's time goes. span(name, **attrs) times a block
+and adds it to the trace active in the current context (a job's pipeline run) together
+with counts such as pages, bytes or tokens; every span also feeds the process-wide totals,
+which is where spans outside a job (laytime calculations in API requests) end up.
+Work handed to other threads keeps its job's trace when it is wrapped with bind().
+A trace also keeps the highest resident memory seen at its span boundaries, since pool
+workers are reused and the process-wide peak covers every job they ran before.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial, wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+# Individual spans kept per trace; the per-stage totals always cover every span
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 500))
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("sof_trace", default=None)
+
+# Called for every span recorded in this process as listener(name, seconds, attrs, in_trace)
+_listeners: List[Callable[[str, float, Dict[str, Any], bool], None]] = []
+
+
+_STATM = "/proc/self/statm"
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+STATM_AVAILABLE = os.path.exists(_STATM)
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident memory of this process, in MB (None where /proc is unavailable)."""
+    if not STATM_AVAILABLE:
+        return None
+    with open(_STATM) as statm:
+        resident_pages = int(statm.read().split()[1])
+    return resident_pages * _PAGE_SIZE / (1024 * 1024)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process since it started, in MB (None where unsupported)."""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux, bytes on macOS
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+class StageTotals:
+    """Count, total and max seconds per span name, plus the sum of each numeric attribute."""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, attrs: Dict[str, Any]) -> None:
+        with self._lock:
+            stage = self._stages.setdefault(name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            for key, value in attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage[key] = stage.get(key, 0) + value
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {key: round(value, 4) if isinstance(value, float) else value for key, value in stage.items()}
+                for name, stage in self._stages.items()
+            }
+
+
+# Every span recorded in this process since it started
+process_totals = StageTotals()
+
+
+class Trace:
+    """The spans of one unit of work (a job's pipeline run), safe to record from several threads."""
+
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.now()
+        self.seconds: Optional[float] = None
+        self.totals = StageTotals()
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped_spans = 0
+        self.rss_high_water_mb: Optional[float] = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.sample_rss()
+
+    def sample_rss(self) -> None:
+        """Raise the trace's RSS high-water mark to the current resident memory."""
+        current = rss_mb()
+        if current is not None:
+            with self._lock:
+                if self.rss_high_water_mb is None or current > self.rss_high_water_mb:
+                    self.rss_high_water_mb = current
+
+    def record(self, name: str, start: float, seconds: float, attrs: Dict[str, Any]) -> None:
+        self.totals.add(name, seconds, attrs)
+        self.sample_rss()
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append({"name": name, "offset": round(start - self._start, 4),
+                                   "seconds": round(seconds, 4), **attrs})
+            else:
+                self.dropped_spans += 1
+
+    @contextmanager
+    def activate(self) -> Iterator["Trace"]:
+        """Make this the current trace for spans in this context until the block ends."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+            self.seconds = time.perf_counter() - self._start
+            self.sample_rss()
+
+    def to_dict(self, with_spans: bool = True) -> Dict[str, Any]:
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self._start
+        trace = {
+            "name": self.name,
+            **self.attrs,
+            "started_at": self.started_at.isoformat(),
+            "seconds": round(seconds, 3),
+            "rss_high_water_mb": round(self.rss_high_water_mb, 1) if self.rss_high_water_mb is not None else None,
+            "process_peak_rss_mb": peak_rss_mb(),
+            "stages": self.totals.to_dict(),
+        }
+        if with_spans:
+            with self._lock:
+                trace["spans"] = list(self.spans)
+                trace["dropped_spans"] = self.dropped_spans
+        return trace
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace active in the current context, if any."""
+    return _current.get()
+
+
+def add_listener(listener: Callable[[str, float, Dict[str, Any], bool], None]) -> None:
+    _listeners.append(listener)
+
+
+def _record(name: str, start: float, seconds: float, attrs: Dict[str, Any]) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.record(name, start, seconds, attrs)
+    process_totals.add(name, seconds, attrs)
+    for listener in _listeners:
+        listener(name, seconds, attrs, trace is not None)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block as a span. Yields the span's attributes, so counts only known at the
+    end (pages, tokens) can be added inside the block.
+    """
+    start = time.perf_counter()
+    trace = _current.get()
+    if trace is not None:
+        trace.sample_rss()
+    try:
+        yield attrs
+    finally:
+        _record(name, start, time.perf_counter() - start, attrs)
+
+
+def traced(name: str) -> Callable:
+    """Decorator recording every call of a function as a span."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Laps:
+    """
+    Consecutive spans without nesting blocks: each lap(name) records the time since the
+    previous lap (or since creation) as "<prefix>.<name>".
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._last = time.perf_counter()
+
+    def lap(self, name: str, **attrs: Any) -> None:
+        now = time.perf_counter()
+        _record(f"{self.prefix}.{name}", self._last, now - self._last, attrs)
+        self._last = now
+
+
+def bind(fn: Callable) -> Callable:
+    """fn bound to a copy of the current context (and trace), for running in another thread."""
+    return partial(contextvars.copy_context().run, fn)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(_percentile(values, 0.5), 3),
+        "p95": round(_percentile(values, 0.95), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def aggregate_traces(traces: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Dashboard view of many stored traces (Trace.to_dict()): the distribution of job
+    seconds and of each job's RSS high-water mark, and per stage the distribution of seconds spent per job
+    and the summed counts (pages, bytes, tokens).
+    """
+    traces = [trace for trace in traces if trace]
+    stages: Dict[str, Dict[str, Any]] = {}
+    for trace in traces:
+        for name, stage in trace.get("stages", {}).items():
+            entry = stages.setdefault(name, {"jobs": 0, "count": 0, "seconds": [], "totals": {}})
+            entry["jobs"] += 1
+            entry["count"] += stage.get("count", 0)
+            entry["seconds"].append(stage.get("seconds", 0.0))
+            for key, value in stage.items():
+                if key not in ("count", "seconds", "max_seconds"):
+                    entry["totals"][key] = entry["totals"].get(key, 0) + value
+    # Traces stored before the high-water mark existed only have the process-wide peak
+    rss = [trace["rss_high_water_mb"] for trace in traces if trace.get("rss_high_water_mb") is not None]
+    return {
+        "jobs": len(traces),
+        "seconds": _distribution([trace["seconds"] for trace in traces]) if traces else None,
+        "rss_high_water_mb": _distribution(rss) if rss else None,
+        "stages": {
+            name: {"jobs": entry["jobs"], "count": entry["count"], "seconds": _distribution(entry["seconds"]),
+                   **entry["totals"]}
+            for name, entry in sorted(stages.items(), key=lambda item: -sum(item[1]["seconds"]))
+        },
+    }
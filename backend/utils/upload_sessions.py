@@ -0,0 +1,126 @@
+"""
+Resumable uploads
+Large scanned bundles are sent in chunks that can be resumed after a dropped connection.
+Each declared file is written to "<stored name>.part" in the upload directory and moved
+to its stored name once all its bytes have arrived, so a file's received offset is the
+size of its part file: it survives restarts and is the same for every API worker.
+Chunks are appended straight from the request stream, so memory use does not depend on
+the chunk or file size.
+
+A job's files can be handed to the pipeline before the whole bundle has arrived; the
+pipeline then waits for each file still uploading (wait_for_file).
+"""
+
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import aiofiles
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+    FCNTL_AVAILABLE = False
+
+RESUMABLE_MAX_FILE_SIZE = int(os.getenv("RESUMABLE_MAX_FILE_SIZE", 200 * 1024 * 1024))
+# A file whose upload has not grown for this long is given up on by the pipeline
+RESUMABLE_STALL_TIMEOUT = float(os.getenv("RESUMABLE_STALL_TIMEOUT", 900))
+RESUMABLE_WAIT_POLL = float(os.getenv("RESUMABLE_WAIT_POLL", 1.0))
+
+_HASH_BLOCK = 1024 * 1024
+
+
+class OffsetMismatch(Exception):
+    """A chunk was sent for another offset than the file's received bytes."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Expected offset {offset}")
+        self.offset = offset
+
+
+class ChunkConflict(Exception):
+    """Another request is writing to the same file."""
+
+
+class UploadTooLarge(Exception):
+    """A chunk would take the file past its declared size."""
+
+
+class ChecksumMismatch(Exception):
+    """The received file does not match its declared SHA-256."""
+
+
+def part_path(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+def received_bytes(path: Path, size: int) -> int:
+    """Bytes of a file received so far (its declared size once it is complete)."""
+    if path.exists():
+        return size
+    part = part_path(path)
+    return part.stat().st_size if part.exists() else 0
+
+
+async def append_chunk(path: Path, size: int, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Append a chunk, read from the chunks stream, at offset to the file's part file.
+    Returns the new offset; bytes written before a dropped connection are kept.
+    """
+    async with aiofiles.open(part_path(path), 'ab') as out:
+        if FCNTL_AVAILABLE:
+            try:
+                fcntl.flock(out.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise ChunkConflict(f"{path.name} is being written by another request")
+        written = os.fstat(out.fileno()).st_size
+        if offset != written:
+            raise OffsetMismatch(written)
+        async for chunk in chunks:
+            if written + len(chunk) > size:
+                raise UploadTooLarge(f"{path.name} is larger than its declared {size} bytes")
+            await out.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def complete_file(path: Path, sha256: Optional[str] = None) -> str:
+    """
+    Move a fully received part file to its stored name and return its SHA-256.
+    A file not matching the declared sha256 is deleted, to be sent again.
+    """
+    part = part_path(path)
+    digest = hashlib.sha256()
+    with open(part, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    if sha256 and digest.hexdigest() != sha256.lower():
+        part.unlink(missing_ok=True)
+        raise ChecksumMismatch(f"{path.name} does not match its SHA-256")
+    os.replace(part, path)
+    return digest.hexdigest()
+
+
+def wait_for_file(path: Path, stall_timeout: float = RESUMABLE_STALL_TIMEOUT,
+                  poll: float = RESUMABLE_WAIT_POLL) -> bool:
+    """
+    Block until a stored file exists, i.e. its upload is complete. Returns whether it
+    had to wait; raises TimeoutError when no bytes arrived for stall_timeout seconds.
+    """
+    waited = False
+    last_size, last_change = -1, time.monotonic()
+    while not path.exists():
+        try:
+            size = part_path(path).stat().st_size
+        except FileNotFoundError:  # not started yet, or just completed
+            size = 0
+        if size != last_size:
+            last_size, last_change = size, time.monotonic()
+        elif time.monotonic() - last_change > stall_timeout:
+            raise TimeoutError(f"Upload of {path.name} stalled at {size} bytes")
+        waited = True
+        time.sleep(poll)
+    return waited
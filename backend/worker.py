@@ -0,0 +1,39 @@
+"""
+SoF Event Extractor queue worker
+Standalone process that pulls uploaded jobs from the durable queue and runs the
+document pipeline for them. Run one or more next to the API (sharing its data
+directory), and set EMBEDDED_QUEUE_CONSUMERS=0 on the API to leave all processing here.
+
+    python worker.py [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+
+from app import job_queue, process_queued_job, logger
+from utils.job_queue import consume
+from utils.pipeline_worker import shutdown_pipeline_executor
+
+
+async def main(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info(f"👷 Queue worker {os.getpid()} started ({concurrency} concurrent jobs, queue depth {job_queue.depth()})")
+    try:
+        await consume(job_queue, process_queued_job, concurrency, stop)
+    finally:
+        shutdown_pipeline_executor()
+    logger.info(f"👋 Queue worker {os.getpid()} stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued SoF extraction jobs")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", os.getenv("PIPELINE_WORKERS", 2))),
+                        help="jobs processed at the same time (default: WORKER_CONCURRENCY or PIPELINE_WORKERS)")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
@@ -12,6 +12,11 @@ import {
   XMarkIcon
 } from '@heroicons/react/24/outline';
 
+const formatEta = (seconds) => {
+  if (seconds < 60) return `${Math.max(1, Math.round(seconds))}s`;
+  return `${Math.round(seconds / 60)} min`;
+};
+
 const UploadForm = () => {
   const [uploading, setUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
@@ -66,10 +71,11 @@ const UploadForm = () => {
       // Complete the progress bar
       setUploadProgress(100);
 
-      const { job_id, total_files } = response.data;
+      const { job_id, total_files, eta_seconds } = response.data;
       
       const fileText = total_files === 1 ? 'File' : `${total_files} files`;
-      toast.success(`${fileText} uploaded successfully! Processing started.`);
+      const etaText = eta_seconds != null ? ` Ready in about ${formatEta(eta_seconds)}.` : '';
+      toast.success(`${fileText} uploaded successfully! Processing started.${etaText}`);
 
       // Navigate to results page
       navigate(`/results/${job_id}`);
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import toast from 'react-hot-toast';
@@ -15,6 +15,46 @@ import {
   DocumentIcon
 } from '@heroicons/react/24/outline';
 
+const STAGE_PROGRESS = { queued: 5, started: 10, ingest: 20, ocr: 30, llm: 70, linking: 90, done: 100 };
+
+// Rough completion percentage for a progress event
+const progressPercent = (progress) => {
+  if (!progress) return 5;
+  if (progress.stage === 'ocr' && progress.pages) {
+    return 30 + Math.round((40 * progress.page) / progress.pages);
+  }
+  if (['llm', 'file_done'].includes(progress.stage) && progress.total_files) {
+    return 70 + Math.round((20 * progress.files_completed) / progress.total_files);
+  }
+  return STAGE_PROGRESS[progress.stage] ?? 60;
+};
+
+const describeProgress = (progress) => {
+  if (!progress) return 'Waiting for progress...';
+  switch (progress.stage) {
+    case 'queued':
+      return progress.queue_position
+        ? `Queued behind ${progress.queue_position} job${progress.queue_position > 1 ? 's' : ''}`
+        : 'Queued, starting shortly';
+    case 'started':
+      return 'Processing started';
+    case 'ingest':
+      return `Reading ${progress.file} (${progress.index} of ${progress.files})`;
+    case 'ocr':
+      return `OCR ${progress.file}: page ${progress.page} of ${progress.pages}`;
+    case 'llm':
+      return `Extracting events (${progress.files_completed} of ${progress.total_files} files done)`;
+    case 'file_done':
+      return `${progress.files_completed} of ${progress.total_files} files done`;
+    case 'linking':
+      return `Linking ${progress.events} events`;
+    case 'done':
+      return 'Finishing up';
+    default:
+      return 'Processing...';
+  }
+};
+
 const Results = () => {
   const { jobId } = useParams();
   const navigate = useNavigate();
@@ -26,12 +66,61 @@ const Results = () => {
   const [showTimeline, setShowTimeline] = useState(false);
   const [retryCount, setRetryCount] = useState(0);
   const [manualEvents, setManualEvents] = useState([]);
-
-  const maxRetries = 30; // 30 retries * 2 seconds = 1 minute max wait
+  const [progress, setProgress] = useState(null);
+  const [fileResults, setFileResults] = useState([]);
+  const [streamUnavailable, setStreamUnavailable] = useState(!window.EventSource);
+  const streamRef = useRef(null);
+  // Event edits still on their way to the server; exports wait for them
+  const pendingPatchesRef = useRef(new Set());
+  // Next poll of a job whose upload is still in progress
+  const pendingPollRef = useRef(null);
+
+  const maxRetries = 30; // 30 retries * 2 seconds = 1 minute max wait (polling fallback only)
+  const pendingPollInterval = 5000; // resumable uploads can take a while; no retry limit
 
   // Combined events (original + manual)
   const allEvents = [...(job?.events || []), ...manualEvents];
 
+  const closeProgressStream = () => {
+    if (streamRef.current) {
+      streamRef.current.close();
+      streamRef.current = null;
+    }
+  };
+
+  // Server-sent progress for a processing job; falls back to polling if the stream fails
+  const openProgressStream = useCallback(() => {
+    if (streamRef.current) return;
+    const source = new EventSource(`${API_BASE_URL}/api/progress/${jobId}`);
+    streamRef.current = source;
+
+    source.addEventListener('progress', (e) => setProgress(JSON.parse(e.data)));
+    // Each finished file arrives with its own events while the rest are still processing
+    source.addEventListener('file', (e) => {
+      const file = JSON.parse(e.data);
+      setFileResults(prev => [...prev.filter(f => f.index !== file.index), file]);
+    });
+    source.addEventListener('result', (e) => {
+      closeProgressStream();
+      setJob(JSON.parse(e.data));
+      setProgress(null);
+      toast.success('Document processed successfully!');
+    });
+    source.addEventListener('failed', (e) => {
+      closeProgressStream();
+      const data = JSON.parse(e.data);
+      setJob(data);
+      setError(data.error || 'Processing failed');
+    });
+    source.onerror = () => {
+      closeProgressStream();
+      setStreamUnavailable(true);
+    };
+  }, [jobId]);
+
+  useEffect(() => closeProgressStream, [jobId]);
+  useEffect(() => () => clearTimeout(pendingPollRef.current), [jobId]);
+
   const fetchResults = useCallback(async () => {
     try {
       setError(null);
@@ -44,7 +133,15 @@ const Results = () => {
 
       setJob(data);
 
-      if (data.status === 'processing' && retryCount < maxRetries) {
+      if (data.status === 'pending') {
+        // A resumable upload still sending its files; the job starts once they have arrived
+        setLoading(false);
+        pendingPollRef.current = setTimeout(fetchResults, pendingPollInterval);
+      } else if (data.status === 'processing' && !streamUnavailable) {
+        // Follow the job's progress stream instead of polling
+        setLoading(false);
+        openProgressStream();
+      } else if (data.status === 'processing' && retryCount < maxRetries) {
         // Continue polling for processing jobs
         setTimeout(() => {
           setRetryCount(prev => prev + 1);
@@ -68,7 +165,7 @@ const Results = () => {
       setError(err.response?.data?.detail || 'Failed to fetch results');
       setLoading(false);
     }
-  }, [jobId, token, retryCount, maxRetries]);
+  }, [jobId, token, retryCount, maxRetries, streamUnavailable, openProgressStream]);
 
   useEffect(() => {
     if (jobId) {
@@ -76,19 +173,85 @@ const Results = () => {
     }
   }, [jobId, fetchResults]);
 
+  // Keep timestamps as local ISO strings (no UTC shift) so they match extracted events
+  const toLocalIso = (val) => {
+    if (!val) return null;
+    if (typeof val === 'string' && !/(Z|[+-]\d{2}:?\d{2})$/.test(val)) return val;
+    const date = new Date(val);
+    if (isNaN(date)) return typeof val === 'string' ? val : null;
+    const pad = (n) => String(n).padStart(2, '0');
+    return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}T${pad(date.getHours())}:${pad(date.getMinutes())}:${pad(date.getSeconds())}`;
+  };
+
+  // Map an edited (table-normalized) event back to the backend column names
+  const toBackendEvent = (ev) => {
+    const start = toLocalIso(ev.start_time_iso || ev.start);
+    const end = toLocalIso(ev.end_time_iso || ev.end);
+    const rawLine = ev['Raw Line'] || ev.raw_line || '';
+    return {
+      Event: ev.Event || ev.event || '',
+      start_time_iso: start,
+      end_time_iso: end,
+      Date: start ? start.split('T')[0] : (ev.Date || ev.date || null),
+      'Raw Line': rawLine,
+      raw_line: rawLine,
+      laytime_counts: ev.laytime_counts || false,
+      Filename: ev.Filename || ev.filename || ''
+    };
+  };
+
+  // Replace the local events with the server's current (patched) list
+  const reloadEvents = useCallback(async () => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/api/events/${jobId}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      setJob(prev => ({ ...prev, events: response.data.events }));
+      setManualEvents([]);
+    } catch (err) {
+      console.error('Failed to reload events:', err);
+    }
+  }, [jobId, token]);
+
+  // Record edits on the server so exports and laytime use the edited events
+  const recordEventPatch = (operations) => {
+    const request = axios.patch(
+      `${API_BASE_URL}/api/events/${jobId}`,
+      { operations },
+      { headers: { 'Authorization': `Bearer ${token}` } }
+    ).then((response) => response.data.event_ids);
+    pendingPatchesRef.current.add(request);
+    const settled = () => pendingPatchesRef.current.delete(request);
+    request.then(settled, settled);
+    return request;
+  };
+
+  // A rejected edit leaves the table out of step with the server, so show the server's events again
+  const handlePatchFailure = (message) => (err) => {
+    console.error(`${message}:`, err);
+    toast.error(`${message}: ${err.response?.data?.detail || 'Unknown error'}`);
+    reloadEvents();
+  };
+
   // Handler for adding manual events
-  const handleAddManualEvent = (manualEvent) => {
-    setManualEvents(prev => [...prev, manualEvent]);
-    toast.success('Manual event added successfully!');
+  const handleAddManualEvent = async (manualEvent) => {
+    try {
+      const [eventId] = await recordEventPatch([{ op: 'add', event: toBackendEvent(manualEvent) }]);
+      setManualEvents(prev => [...prev, { ...manualEvent, event_id: eventId }]);
+      toast.success('Manual event added successfully!');
+    } catch (err) {
+      console.error('Failed to save manual event:', err);
+      toast.error(`Failed to add event: ${err.response?.data?.detail || 'Unknown error'}`);
+    }
   };
   
   // Handler for deleting events
   const handleDeleteEvent = (index) => {
-    // Create a copy of all events
-    const updatedEvents = [...allEvents];
-    
-    // Remove the event at the specified index
-    updatedEvents.splice(index, 1);
+    const eventId = allEvents[index]?.event_id;
+    if (eventId !== undefined) {
+      recordEventPatch([{ op: 'delete', event_id: eventId }])
+        .catch(handlePatchFailure('Deletion could not be saved on the server'));
+    }
     
     // Determine if the deleted event was from original job events or manual events
     if (index < job.events.length) {
@@ -135,7 +298,13 @@ const Results = () => {
     }
     
     // Update the event at the specified index
+    const eventId = originalEvent?.event_id;
+    updatedEvent = { ...updatedEvent, event_id: eventId };
     updatedEvents[index] = updatedEvent;
+    if (eventId !== undefined) {
+      recordEventPatch([{ op: 'update', event_id: eventId, event: toBackendEvent(updatedEvent) }])
+        .catch(handlePatchFailure('Edit could not be saved on the server'));
+    }
     
     // Determine if the edited event was from original job events or manual events
     if (index < job.events.length) {
@@ -168,86 +337,18 @@ const Results = () => {
     try {
       toast.loading(`Preparing ${format.toUpperCase()} export...`);
 
-      // Prepare a normalized events payload so edited events are exported correctly
-      const exportEvents = allEvents.map((ev) => {
-        // Determine start/end ISO strings
-        const toIso = (val) => {
-          if (!val) return null;
-          if (typeof val === 'string') {
-            try { return new Date(val).toISOString(); } catch { return val; }
-          }
-          if (val instanceof Date) return val.toISOString();
-          // fallback
-          try { return new Date(val).toISOString(); } catch { return null; }
-        };
-
-        const start_iso = ev.start_time_iso || ev.start || ev.startTime || ev.start_date || ev.startDate || ev.start_time || null;
-        const end_iso = ev.end_time_iso || ev.end || ev.endTime || ev.end_date || ev.endDate || ev.end_time || null;
-
-        const startIso = toIso(start_iso);
-        const endIso = toIso(end_iso);
-
-        // Compute Date (YYYY-MM-DD) from start
-        const dateOnly = startIso ? startIso.split('T')[0] : (ev.Date || ev.date || null);
-
-        // Compute Duration (hours) if possible
-        let durationVal = ev.Duration || ev.duration || null;
-        if (!durationVal && startIso && endIso) {
-          try {
-            const s = new Date(startIso);
-            const e = new Date(endIso);
-            const hours = Math.round((e - s) / (1000 * 60 * 60));
-            durationVal = `${hours}h 0m`;
-          } catch {
-            durationVal = null;
-          }
-        }
-
-        // Handle Raw Line field - ensure it's preserved for all events
-        let rawLine = ev['Raw Line'] || ev.raw_line || ev.rawLine || ev.raw || '';
-        
-        // If no raw line exists, create one from event data for edited/manual entries
-        if (!rawLine) {
-          // Generate a descriptive raw line based on event details
-          rawLine = `${ev.event || ev.Event || 'Event'}: ${formatDateForRawLine(startIso)} to ${formatDateForRawLine(endIso)} - ${ev.description || ev.Description || ''}`;
-        }
-
-        // Handle Laytime field - ensure it exists for all events
-        const laytime = ev.Laytime || ev.laytime || ev.laytime_value || 0;
-
-        return {
-          Event: ev.event || ev.Event || ev.name || '',
-          start_time_iso: startIso,
-          end_time_iso: endIso,
-          Date: dateOnly,
-          Duration: durationVal,
-          'Raw Line': rawLine,
-          Filename: ev.filename || ev.FileName || (job && (job.filename || (job.filenames && job.filenames.join(', ')))) || '',
-          Description: ev.description || ev.Description || '',
-          Laytime: laytime
-        };
-      });
-      
-      // Helper function to format dates for raw line
-      function formatDateForRawLine(isoDate) {
-        if (!isoDate) return 'Unknown';
-        try {
-          const date = new Date(isoDate);
-          return date.toLocaleString();
-        } catch {
-          return isoDate;
-        }
-      }
+      // Edits still being saved must reach the server before it builds the export
+      await Promise.allSettled([...pendingPatchesRef.current]);
 
-      // Send normalized events to backend for export
-      const response = await axios.post(
+      // The server exports the job's events with the recorded edits applied, deriving
+      // Date, Duration, Laytime and a missing Raw Line of edited events from their times;
+      // unchanged exports are revalidated by ETag and served from its cache
+      const response = await axios.get(
         `${API_BASE_URL}/api/export/${jobId}?type=${format}`,
-        { events: exportEvents },
         {
           responseType: 'blob',
           headers: {
             'Authorization': `Bearer ${token}`,
-            'Content-Type': 'application/json',
           },
         }
       );
@@ -281,6 +382,8 @@ const Results = () => {
 
   const getStatusIcon = (status) => {
     switch (status) {
+      case 'pending':
+        return <ArrowPathIcon className="h-5 w-5 text-blue-300 animate-spin" />;
       case 'processing':
         return <ClockIcon className="h-5 w-5 text-yellow-500 animate-spin" />;
       case 'completed':
@@ -294,6 +397,8 @@ const Results = () => {
 
   const getStatusText = (status) => {
     switch (status) {
+      case 'pending':
+        return 'Upload in progress...';
       case 'processing':
         return 'Processing document...';
       case 'completed':
@@ -479,6 +584,29 @@ const Results = () => {
           )}
         </div>
 
+      {/* Upload Status */}
+      {job.status === 'pending' && (
+        <div className="bg-white/10 backdrop-blur-lg rounded-3xl p-8 text-center border border-white/20">
+          <div className="animate-pulse-slow">
+            <ArrowPathIcon className="h-16 w-16 text-blue-200 mx-auto mb-4" />
+          </div>
+          <h3 className="text-lg font-medium text-white mb-2">
+            Upload In Progress
+          </h3>
+          <p className="text-white/80 mb-4">
+            {job.total_files > 1 ? `Your ${job.total_files} documents are` : 'Your document is'} still being uploaded.
+            Processing starts as soon as the upload has finished; this page updates automatically.
+          </p>
+          {job.filenames?.length > 0 && (
+            <ul className="mt-4 max-w-md mx-auto text-left text-sm space-y-1">
+              {job.filenames.map((filename, index) => (
+                <li key={index} className="truncate text-white/80">{filename}</li>
+              ))}
+            </ul>
+          )}
+        </div>
+      )}
+
       {/* Processing Status */}
       {job.status === 'processing' && (
         <div className="bg-white/10 backdrop-blur-lg rounded-3xl p-8 text-center border border-white/20">
@@ -493,16 +621,30 @@ const Results = () => {
             This usually takes {job.total_files > 1 ? '30-60' : '15-30'} seconds.
           </p>
           <div className="bg-white/20 rounded-full h-2 max-w-md mx-auto">
-            <div className="bg-blue-300 h-2 rounded-full animate-pulse" style={{ width: '60%' }}></div>
+            <div className="bg-blue-300 h-2 rounded-full animate-pulse" style={{ width: `${progressPercent(progress)}%` }}></div>
           </div>
           <p className="text-sm text-white/60 mt-2">
-            Attempt {retryCount + 1} of {maxRetries}
+            {streamUnavailable ? `Attempt ${retryCount + 1} of ${maxRetries}` : describeProgress(progress)}
           </p>
-          {job.total_files > 1 && (
+          {job.total_files > 1 && fileResults.length === 0 && (
             <p className="text-sm text-white/60 mt-2">
               Processing multiple files may take longer
             </p>
           )}
+          {fileResults.length > 0 && (
+            <ul className="mt-4 max-w-md mx-auto text-left text-sm space-y-1">
+              {fileResults.map(file => (
+                <li key={file.index} className="flex justify-between text-white/80">
+                  <span className="truncate mr-4">{file.file}</span>
+                  {file.outcome === 'completed' ? (
+                    <span className="text-green-300">{file.event_count} events</span>
+                  ) : (
+                    <span className="text-red-300" title={file.error}>Failed</span>
+                  )}
+                </li>
+              ))}
+            </ul>
+          )}
         </div>
       )}
 